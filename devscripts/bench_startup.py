@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals, print_function
+
+import optparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = [
+    ('import youtube_dl', ['-c', 'import youtube_dl']),
+    ('youtube-dl --version', ['-m', 'youtube_dl', '--version']),
+]
+
+MODULE_COUNTS = [
+    ('import youtube_dl', 'import youtube_dl'),
+    ('all extractor classes', 'from youtube_dl.extractor import gen_extractor_classes; gen_extractor_classes()'),
+]
+
+COUNT_MODULES = '''
+import sys
+%s
+print(len(sys.modules), len([m for m in sys.modules if m.startswith('youtube_dl.extractor.')]))
+'''
+
+
+def run(args, env=None):
+    start = time.time()
+    output = subprocess.check_output([sys.executable] + args, cwd=ROOT_DIR, env=env)
+    return time.time() - start, output
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '-n', '--runs', type=int, default=10,
+        help='number of runs of every command (default: %default)')
+    parser.add_option(
+        '--no-lazy-extractors', action='store_true', default=False,
+        help='import the extractors themselves even if lazy_extractors.py exists')
+    options, _ = parser.parse_args()
+
+    env = dict(os.environ)
+    if options.no_lazy_extractors:
+        env['YOUTUBE_DL_NO_LAZY_EXTRACTORS'] = '1'
+
+    for name, args in COMMANDS:
+        # Warm up the bytecode cache and the file system
+        run(args, env)
+        times = sorted(run(args, env)[0] for _ in range(options.runs))
+        print('%-24s min %6.1fms  median %6.1fms' % (
+            name, times[0] * 1000, times[len(times) // 2] * 1000))
+
+    for name, stmt in MODULE_COUNTS:
+        _, output = run(['-c', COUNT_MODULES % stmt], env)
+        modules, extractor_modules = output.split()
+        print('%-24s %s modules, %s extractor modules' % (
+            name, modules.decode('ascii'), extractor_modules.decode('ascii')))
+
+
+if __name__ == '__main__':
+    main()
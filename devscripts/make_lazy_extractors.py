@@ -6,8 +6,6 @@ import os
 from os.path import dirname as dirn
 import sys
 
-print('WARNING: Lazy loading extractors is an experimental feature that may not always work', file=sys.stderr)
-
 sys.path.insert(0, dirn(dirn((os.path.abspath(__file__)))))
 
 lazy_extractors_filename = sys.argv[1]
@@ -16,6 +14,7 @@ if os.path.exists(lazy_extractors_filename):
 
 from youtube_dl.extractor import _ALL_CLASSES
 from youtube_dl.extractor.common import InfoExtractor, SearchInfoExtractor
+from youtube_dl.extractor.dispatch import ie_host_keys
 
 with open('devscripts/lazy_load_template.py', 'rt') as f:
     module_template = f.read()
@@ -27,6 +26,7 @@ module_contents = [
 ie_template = '''
 class {name}({bases}):
     _VALID_URL = {valid_url!r}
+    _URL_HOST_KEYS = {host_keys!r}
     _module = '{module}'
 '''
 
@@ -52,6 +52,7 @@ def build_lazy_ie(ie, name):
         name=name,
         bases=', '.join(map(get_base_name, ie.__bases__)),
         valid_url=valid_url,
+        host_keys=ie_host_keys(ie),
         module=ie.__module__)
     if ie.suitable.__func__ is not InfoExtractor.suitable.__func__:
         s += '\n' + getsource(ie.suitable)
@@ -9,9 +9,11 @@ import sys
 
 try:
     from setuptools import setup, Command
+    from setuptools.command.build_py import build_py
     setuptools_available = True
 except ImportError:
     from distutils.core import setup, Command
+    from distutils.command.build_py import build_py
     setuptools_available = False
 from distutils.spawn import spawn
 
@@ -94,11 +96,23 @@ class build_lazy_extractors(Command):
         pass
 
     def run(self):
+        if not os.path.exists('devscripts/make_lazy_extractors.py'):
+            warnings.warn('Skipping the lazy extractors since devscripts are not present')
+            return
         spawn(
             [sys.executable, 'devscripts/make_lazy_extractors.py', 'youtube_dl/extractor/lazy_extractors.py'],
             dry_run=self.dry_run,
         )
 
+
+class build_py_with_lazy_extractors(build_py):
+    # Ship the lazy extractors by default so that the extractor modules are
+    # only imported when needed
+    def run(self):
+        self.run_command('build_lazy_extractors')
+        build_py.run(self)
+
+
 setup(
     name='youtube_dl',
     version=__version__,
@@ -143,6 +157,9 @@ setup(
         'Programming Language :: Python :: Implementation :: PyPy',
     ],
 
-    cmdclass={'build_lazy_extractors': build_lazy_extractors},
+    cmdclass={
+        'build_lazy_extractors': build_lazy_extractors,
+        'build_py': build_py_with_lazy_extractors,
+    },
     **params
 )
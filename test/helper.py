@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 
+import contextlib
 import errno
 import io
 import hashlib
@@ -16,6 +17,7 @@ from youtube_dl.compat import (
     compat_os_name,
     compat_str,
 )
+from youtube_dl.downloader.common import FileDownloader
 from youtube_dl.utils import (
     preferredencoding,
     write_string,
@@ -89,6 +91,29 @@ class FakeYDL(YoutubeDL):
         self.report_warning = types.MethodType(report_warning, self)
 
 
+@contextlib.contextmanager
+def fake_downloader(real_download, **module_attrs):
+    """
+    Make YoutubeDL download the media with real_download(fd, filename,
+    info_dict) where fd is the FileDownloader. module_attrs replace other
+    names of the YoutubeDL module meanwhile (e.g. FFmpegMergerPP).
+    """
+    class FakeFD(FileDownloader):
+        def real_download(self, filename, info_dict):
+            return real_download(self, filename, info_dict)
+
+    ydl_module = sys.modules[YoutubeDL.__module__]
+    module_attrs['get_suitable_downloader'] = lambda info_dict, params: FakeFD
+    saved_attrs = dict((name, getattr(ydl_module, name)) for name in module_attrs)
+    for name, value in module_attrs.items():
+        setattr(ydl_module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved_attrs.items():
+            setattr(ydl_module, name, value)
+
+
 def gettestcases(include_onlymatching=False):
     for ie in youtube_dl.extractor.gen_extractors():
         for tc in ie.get_testcases(include_onlymatching):
@@ -4,20 +4,30 @@
 from __future__ import unicode_literals
 
 # Allow direct execution
+import io
 import os
 import sys
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import copy
+import threading
+import time
 
-from test.helper import FakeYDL, assertRegexpMatches
+from test.helper import FakeYDL, assertRegexpMatches, fake_downloader, try_rm
 from youtube_dl import YoutubeDL
 from youtube_dl.compat import compat_str, compat_urllib_error
 from youtube_dl.extractor import YoutubeIE
 from youtube_dl.extractor.common import InfoExtractor
 from youtube_dl.postprocessor.common import PostProcessor
-from youtube_dl.utils import ExtractorError, match_filter_func
+from youtube_dl.utils import (
+    DownloadCancelled,
+    DownloadError,
+    ExtractorError,
+    MaxDownloadsReached,
+    match_filter_func,
+    PostProcessingError,
+)
 
 TEST_URL = 'http://localhost/sample.mp4'
 
@@ -880,6 +890,337 @@ class TestYoutubeDL(unittest.TestCase):
         self.assertEqual(result[1]['playlist_index'], 2)
         # @}
 
+    def test_lazy_playlist(self):
+        pulled = []
+
+        def entries():
+            for i in range(1, 7):
+                pulled.append(i)
+                yield {
+                    'id': compat_str(i),
+                    'title': compat_str(i),
+                    'url': TEST_URL,
+                }
+
+        def playlist():
+            return {
+                '_type': 'playlist',
+                'id': 'test',
+                'entries': entries(),
+                'extractor': 'test:playlist',
+                'extractor_key': 'test:playlist',
+                'webpage_url': 'http://example.com',
+            }
+
+        class _YDL(YDL):
+            def process_info(self, info_dict):
+                info_dict['_pulled'] = len(pulled)
+                super(_YDL, self).process_info(info_dict)
+
+        def get_downloaded(params):
+            del pulled[:]
+            ydl = _YDL(dict(params, lazy_playlist=True))
+            ydl.process_ie_result(playlist())
+            return [
+                (int(info['id']), info['playlist_index'], info['_pulled'])
+                for info in ydl.downloaded_info_dicts]
+
+        self.assertEqual(get_downloaded({}), [(i, i, i) for i in range(1, 7)])
+        self.assertEqual(
+            get_downloaded({'playliststart': 2, 'playlistend': 3}),
+            [(2, 2, 2), (3, 3, 3)])
+        self.assertEqual(
+            get_downloaded({'playlist_items': '4,2,5,9'}),
+            [(4, 4, 4), (2, 2, 4), (5, 5, 5)])
+        self.assertEqual(len(pulled), 6)
+        # Reversing needs every entry first
+        self.assertEqual(
+            get_downloaded({'playlistreverse': True}),
+            [(i, 7 - i, 6) for i in range(6, 0, -1)])
+
+    def test_concurrent_playlist_entries(self):
+        entries = [{
+            'id': compat_str(i),
+            'title': compat_str(i),
+            'url': TEST_URL,
+        } for i in range(1, 9)]
+        playlist = {
+            '_type': 'playlist',
+            'id': 'test',
+            'entries': entries,
+            'extractor': 'test:playlist',
+            'extractor_key': 'test:playlist',
+            'webpage_url': 'http://example.com',
+        }
+
+        class _YDL(YDL):
+            def process_info(self, info_dict):
+                # Make early entries the slowest ones so that they complete
+                # out of order
+                time.sleep(0.01 * (9 - int(info_dict['id'])))
+                YoutubeDL.process_info(self, info_dict)
+                with self._num_downloads_lock:
+                    self.downloaded_info_dicts.append(info_dict)
+
+        ydl = _YDL({'concurrent_playlist_entries': 4, 'simulate': True})
+        res = ydl.process_ie_result(copy.deepcopy(playlist))
+        self.assertEqual(
+            [e['playlist_index'] for e in res['entries']], list(range(1, 9)))
+        self.assertEqual(
+            sorted(int(e['id']) for e in ydl.downloaded_info_dicts), list(range(1, 9)))
+
+        ydl = _YDL({
+            'concurrent_playlist_entries': 4,
+            'simulate': True,
+            'max_downloads': 3,
+        })
+        self.assertRaises(
+            MaxDownloadsReached, ydl.process_ie_result, copy.deepcopy(playlist))
+        self.assertEqual(ydl._num_downloads, 3)
+        self.assertEqual(len(ydl.downloaded_info_dicts), 3)
+
+        # Nested playlists are processed by the worker handling them, each
+        # of them only once
+        nested = dict(playlist, entries=[dict(
+            playlist, id='nested%d' % i, webpage_url='http://example.com/%d' % (i % 3),
+            entries=entries[2 * i:2 * i + 2]) for i in range(4)])
+        ydl = _YDL({'concurrent_playlist_entries': 4, 'simulate': True})
+        ydl.process_ie_result(copy.deepcopy(nested))
+        self.assertEqual(len(ydl.downloaded_info_dicts), 6)
+        self.assertIn(
+            sorted(int(e['id']) for e in ydl.downloaded_info_dicts),
+            ([1, 2, 3, 4, 5, 6], [3, 4, 5, 6, 7, 8]))
+        self.assertEqual(ydl._playlist_level, 0)
+        self.assertFalse(ydl._playlist_urls)
+
+    def test_concurrent_formats(self):
+        lock = threading.Lock()
+        state = {'active': 0, 'max_active': 0}
+        progress = {}
+
+        def real_download(fd, filename, info_dict):
+            format_id = info_dict['format_id']
+            progress[format_id] = 0
+            with lock:
+                state['active'] += 1
+                state['max_active'] = max(state['max_active'], state['active'])
+            try:
+                if format_id in ('bad', 'broken'):
+                    # Fail once the other format is being downloaded
+                    while len(progress) < 2:
+                        time.sleep(0.01)
+                    if format_id == 'broken':
+                        raise DownloadError('broken')
+                    return False
+                for i in range(50):
+                    try:
+                        fd._hook_progress({'status': 'downloading', 'filename': filename})
+                    except DownloadCancelled:
+                        if format_id == 'wrapped':
+                            raise DownloadError('cancelled')
+                        raise
+                    progress[format_id] += 1
+                    time.sleep(0.01)
+                with open(filename, 'w') as f:
+                    f.write(format_id)
+                return True
+            finally:
+                with lock:
+                    state['active'] -= 1
+
+        class NoMergerPP(PostProcessor):
+            available = False
+
+            def can_merge_natively(self, ext, input_exts):
+                return False
+
+        def download(format_ids, params={}):
+            state['max_active'] = 0
+            progress.clear()
+            params = dict(params, outtmpl='concurrent-formats.%(ext)s', noprogress=True, quiet=True)
+            ydl = YoutubeDL(params)
+            info_dict = _make_result([], ext='mp4', requested_formats=[{
+                'format_id': format_id,
+                'url': TEST_URL,
+                'protocol': 'http',
+                'ext': 'mp4',
+            } for format_id in format_ids])
+            ydl.process_info(info_dict)
+            return ydl
+
+        with fake_downloader(real_download, FFmpegMergerPP=NoMergerPP):
+            download(['video', 'audio'])
+            self.assertEqual(state['max_active'], 2)
+            self.assertEqual(progress, {'video': 50, 'audio': 50})
+            for format_id in ('video', 'audio'):
+                try_rm('concurrent-formats.f%s.mp4' % format_id)
+
+            download(['video', 'audio'], {'concurrent_formats': False})
+            self.assertEqual(state['max_active'], 1)
+            for format_id in ('video', 'audio'):
+                try_rm('concurrent-formats.f%s.mp4' % format_id)
+
+            # The other format is cancelled when one fails
+            ydl = download(['video', 'bad'], {'ignoreerrors': True})
+            self.assertLess(progress['video'], 50)
+            self.assertFalse(os.path.exists('concurrent-formats.fvideo.mp4'))
+            self.assertEqual(ydl._download_retcode, 0)
+
+            # The error of the failed format is reported, not the one of
+            # the cancelled format
+            with self.assertRaises(DownloadError) as cm:
+                download(['wrapped', 'broken'])
+            self.assertEqual(str(cm.exception), 'broken')
+
+    def test_sidecar_downloads(self):
+        lock = threading.Lock()
+        state = {'active': 0, 'max_active': 0, 'overlaps': []}
+        media_started = threading.Event()
+
+        class SidecarYDL(YoutubeDL):
+            def urlopen(self, req):
+                url = req if isinstance(req, compat_str) else req.get_full_url()
+                # The sidecars are downloaded along with the media
+                overlap = media_started.wait(5)
+                with lock:
+                    state['overlaps'].append(overlap)
+                    state['active'] += 1
+                    state['max_active'] = max(state['max_active'], state['active'])
+                time.sleep(0.05)
+                with lock:
+                    state['active'] -= 1
+                return io.BytesIO(url.encode('utf-8'))
+
+        def real_download(fd, filename, info_dict):
+            media_started.set()
+            with open(filename, 'w') as f:
+                f.write('media')
+            return True
+
+        subtitles = {
+            'en': {'url': 'http://localhost/en.vtt', 'ext': 'vtt'},
+            'fr': {'url': 'http://localhost/fr.vtt', 'ext': 'vtt'},
+            'de': {'data': 'WEBVTT\r\n', 'ext': 'vtt'},
+        }
+        thumbnails = [{'id': str(i), 'url': 'http://localhost/%d.jpg' % i} for i in range(3)]
+        expected = {
+            'sidecar.en.vtt': b'http://localhost/en.vtt',
+            'sidecar.fr.vtt': b'http://localhost/fr.vtt',
+            'sidecar.de.vtt': b'WEBVTT\r\n',
+        }
+        for i in range(3):
+            expected['sidecar.mp4_%d.jpg' % i] = ('http://localhost/%d.jpg' % i).encode('utf-8')
+
+        try:
+            ydl = SidecarYDL({
+                'outtmpl': 'sidecar.%(ext)s',
+                'writesubtitles': True,
+                'write_all_thumbnails': True,
+                'quiet': True,
+                'noprogress': True,
+            })
+            with fake_downloader(real_download):
+                ydl.process_info(_make_result(
+                    [], url=TEST_URL, ext='mp4', extractor='generic', extractor_key='Generic',
+                    requested_subtitles=subtitles, thumbnails=thumbnails))
+            self.assertEqual(state['overlaps'], [True] * 5)
+            self.assertGreater(state['max_active'], 1)
+            for fn, content in expected.items():
+                with open(fn, 'rb') as f:
+                    self.assertEqual(f.read(), content)
+            self.assertEqual([t['filename'] for t in thumbnails], ['sidecar.mp4_%d.jpg' % i for i in range(3)])
+            self.assertFalse([fn for fn in os.listdir('.') if fn.startswith('sidecar') and fn.endswith('.tmp')])
+        finally:
+            for fn in list(expected) + ['sidecar.mp4']:
+                try_rm(fn)
+
+    def test_pipelined_postprocessing(self):
+        events = []
+        downloading_b = threading.Event()
+        archive = 'pipelined-archive.txt'
+
+        def real_download(fd, filename, info_dict):
+            events.append(('download', info_dict['id']))
+            if info_dict['id'] == 'b':
+                # The video waiting for its post-processing counts as archived
+                events.append(('queued', fd.ydl.in_download_archive(
+                    {'id': 'a', 'extractor_key': 'TestEx'})))
+                downloading_b.set()
+            with open(filename, 'w') as f:
+                f.write(info_dict['id'])
+            return True
+
+        class SlowPP(PostProcessor):
+            def run(self, info):
+                # The next video is downloaded meanwhile
+                events.append(('pp', info['id'], downloading_b.wait(5)))
+                if info['id'] == 'bad':
+                    raise PostProcessingError('bad video')
+                with open(archive) as f:
+                    events.append(('archive', f.read().split()))
+                return [], info
+
+        try:
+            with fake_downloader(real_download):
+                with open(archive, 'w'):
+                    pass
+                ydl = YoutubeDL({
+                    'outtmpl': 'pipelined-%(id)s.%(ext)s',
+                    'postprocess_workers': 1,
+                    'download_archive': archive,
+                    'quiet': True,
+                    'noprogress': True,
+                })
+                ydl.add_post_processor(SlowPP())
+                for video_id in ('a', 'b'):
+                    ydl.process_info(_make_result([], id=video_id, url=TEST_URL, ext='mp4'))
+                ydl.wait_for_post_processing()
+                self.assertEqual(events, [
+                    ('download', 'a'), ('download', 'b'), ('queued', True),
+                    ('pp', 'a', True), ('archive', []),
+                    ('pp', 'b', True), ('archive', ['testex', 'a']),
+                ])
+                # The archive is updated once a video is post-processed
+                with open(archive) as f:
+                    self.assertEqual(f.read().split(), ['testex', 'a', 'testex', 'b'])
+
+                # Errors are raised once the post-processing is waited for
+                ydl.process_info(_make_result([], id='bad', url=TEST_URL, ext='mp4'))
+                self.assertRaises(DownloadError, ydl.wait_for_post_processing)
+                with open(archive) as f:
+                    self.assertNotIn('bad', f.read())
+                self.assertFalse(ydl._queued_archive_ids)
+
+                # or before the next download
+                del events[:]
+                ydl.process_info(_make_result([], id='bad', url=TEST_URL, ext='mp4'))
+                while ydl._pp_pipeline._pending:
+                    time.sleep(0.01)
+                self.assertRaises(
+                    DownloadError, ydl.process_info, _make_result([], id='c', url=TEST_URL, ext='mp4'))
+                self.assertNotIn(('download', 'c'), events)
+
+                # The maximum number of downloads is reached once they are
+                # post-processed
+                del events[:]
+                ydl.params['max_downloads'] = ydl._num_downloads + 1
+                self.assertRaises(
+                    MaxDownloadsReached, ydl.process_info, _make_result([], id='c', url=TEST_URL, ext='mp4'))
+                self.assertEqual(events[-1], ('archive', ['testex', 'a', 'testex', 'b']))
+
+                # The workers stop once the YoutubeDL is done with
+                threads = list(ydl._pp_pipeline._threads)
+                self.assertTrue(threads)
+                with ydl:
+                    pass
+                for thread in threads:
+                    thread.join(5)
+                    self.assertFalse(thread.is_alive())
+        finally:
+            for video_id in ('a', 'b', 'bad', 'c'):
+                try_rm('pipelined-%s.mp4' % video_id)
+            try_rm(archive)
+
     def test_urlopen_no_file_protocol(self):
         # see https://github.com/ytdl-org/youtube-dl/issues/8227
         ydl = YDL()
@@ -5,10 +5,25 @@ from __future__ import unicode_literals
 # Allow direct execution
 import os
 import sys
+import time
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from youtube_dl.aes import aes_decrypt, aes_encrypt, aes_cbc_decrypt, aes_cbc_encrypt, aes_decrypt_text, aes_ecb_encrypt
+from youtube_dl.aes import (
+    aes_cbc_decrypt,
+    aes_cbc_decrypt_bytes,
+    aes_cbc_encrypt,
+    aes_cbc_encrypt_bytes,
+    aes_ctr_decrypt,
+    aes_ctr_decrypt_bytes,
+    aes_decrypt,
+    aes_decrypt_text,
+    aes_ecb_encrypt,
+    aes_encrypt,
+    inc,
+    key_expansion,
+    xor,
+)
 from youtube_dl.utils import bytes_to_intlist, intlist_to_bytes
 import base64
 
@@ -65,6 +80,57 @@ class TestAES(unittest.TestCase):
             encrypted,
             b'\xaa\x86]\x81\x97>\x02\x92\x9d\x1bR[[L/u\xd3&\xd1(h\xde{\x81\x94\xba\x02\xae\xbd\xa6\xd0:')
 
+    def test_cbc_bytes(self):
+        data = b"\x97\x92+\xe5\x0b\xc3\x18\x91ky9m&\xb3\xb5@\xe6'\xc2\x96.\xc8u\x88\xab9-[\x9e|\xf1\xcd"
+        key = iv = intlist_to_bytes(self.key)
+        self.assertEqual(aes_cbc_decrypt_bytes(data, key, iv).rstrip(b'\x08'), self.secret_msg)
+        self.assertEqual(aes_cbc_encrypt_bytes(self.secret_msg, key, iv), data)
+
+    def test_key_sizes(self):
+        # Compare the table driven modes with the block functions
+        msg = bytes_to_intlist(self.secret_msg * 3)
+        for key_size in (16, 24, 32):
+            key = list(range(key_size))
+            expanded_key = key_expansion(key)
+
+            previous, expected = self.iv, []
+            for i in range(0, len(msg), 16):
+                block = aes_decrypt(msg[i:i + 16] + [0] * (16 - len(msg[i:i + 16])), expanded_key)
+                expected += xor(block, previous)
+                previous = msg[i:i + 16]
+            self.assertEqual(aes_cbc_decrypt(msg, key, self.iv), expected[:len(msg)])
+
+            counter, keystream = self.iv, []
+            for _ in range(0, len(msg), 16):
+                keystream += aes_encrypt(counter, expanded_key)
+                counter = inc(counter)
+            self.assertEqual(
+                aes_ctr_decrypt_bytes(intlist_to_bytes(msg), intlist_to_bytes(key), intlist_to_bytes(self.iv)),
+                intlist_to_bytes(xor(msg, keystream)))
+
+    def test_ctr_counter_wraparound(self):
+        class Counter(object):
+            value = [0xff] * 16
+
+            def next_value(self):
+                value, self.value = self.value, inc(self.value)
+                return value
+
+        data = bytes_to_intlist(self.secret_msg * 2)
+        self.assertEqual(
+            intlist_to_bytes(aes_ctr_decrypt(data, self.key, Counter())),
+            aes_ctr_decrypt_bytes(intlist_to_bytes(data), intlist_to_bytes(self.key), b'\xff' * 16))
+
+    @unittest.skipUnless(os.environ.get('YOUTUBE_DL_BENCHMARK'), 'set YOUTUBE_DL_BENCHMARK to run benchmarks')
+    def test_benchmark(self):
+        key = iv = intlist_to_bytes(self.key)
+        data = aes_cbc_encrypt_bytes(os.urandom(1 << 20), key, iv)
+        for name, func in (('cbc', aes_cbc_decrypt_bytes), ('ctr', aes_ctr_decrypt_bytes)):
+            start = time.time()
+            func(data, key, iv)
+            elapsed = time.time() - start
+            print('\n%s: 1 MiB in %.2fs (%.2f MiB/s)' % (name, elapsed, 1 / elapsed))
+
 
 if __name__ == '__main__':
     unittest.main()
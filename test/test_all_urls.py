@@ -17,6 +17,11 @@ from youtube_dl.extractor import (
     gen_extractors,
     YoutubeIE,
 )
+from youtube_dl.extractor.dispatch import (
+    ExtractorDispatchIndex,
+    url_host_keys,
+    url_keys,
+)
 
 
 class TestAllURLsMatching(unittest.TestCase):
@@ -86,6 +91,49 @@ class TestAllURLsMatching(unittest.TestCase):
                         ie.suitable(url),
                         '%s should not match URL %r . That URL belongs to %s.' % (type(ie).__name__, url, tc['name']))
 
+    def test_dispatch_index(self):
+        ies = gen_extractors()
+        index = ExtractorDispatchIndex(ies)
+        for tc in gettestcases(include_onlymatching=True):
+            url = tc['url']
+            self.assertEqual(
+                [ie.IE_NAME for ie in index.candidates(url) if ie.suitable(url)],
+                [ie.IE_NAME for ie in ies if ie.suitable(url)], url)
+        # Only a few extractors are tried for a URL
+        for url in (
+                'https://www.youtube.com/watch?v=BaW_jenozKc',
+                'https://vimeo.com/56015672',
+                'http://www.dailymotion.com/video/x5kesuj',
+                'https://foo.bandcamp.com/track/bar',
+                'http://example.com/video.mp4'):
+            self.assertLessEqual(len(index.candidates(url)), 40, url)
+
+    def test_url_host_keys(self):
+        self.assertEqual(
+            url_host_keys(r'https?://(?:(?:www|m)\.)?example\.(?:com|org)/(?P<id>\d+)'),
+            ('example.com', 'example.org'))
+        self.assertEqual(
+            url_host_keys(r'https?://(?:[^/]+\.)?Example\.com(?::\d+)?/'), ('example.com',))
+        self.assertEqual(
+            url_host_keys(r'(?:example:|https?://example\.com/v/)(?P<id>\d+)'),
+            ('^exam', 'example.com'))
+        # The host may be preceded by anything
+        self.assertEqual(
+            url_host_keys(r'https?://[^/]*example\.com/'), ('^http', 'example.com'))
+        self.assertEqual(url_host_keys(r'https?://.*example\.com/'), ('^http', 'example.com'))
+        # unless it is followed by a dot or cannot consume one
+        self.assertEqual(url_host_keys(r'https?://.+?\.example\.com/'), ('example.com',))
+        self.assertEqual(url_host_keys(r'https?://[^.]+\.example\.com/'), ('example.com',))
+        # Unknown top level domain or end of the host
+        self.assertEqual(
+            url_host_keys(r'https?://(?:www\.)?example\.[a-z]{2,3}/'), ('example.*',))
+        self.assertEqual(url_host_keys(r'https?://[^.]+\.example\.com'), ('example.*',))
+        # Bare ids
+        self.assertEqual(url_host_keys(r'(?P<id>[0-9a-z]{11})'), None)
+        self.assertEqual(
+            url_keys('https://user@www.Example.com:8080/watch?v=x'),
+            set(['^http', 'example.com', 'example.*', 'www.*']))
+
     def test_keywords(self):
         self.assertMatch(':ytsubs', ['youtube:subscriptions'])
         self.assertMatch(':ytsubscriptions', ['youtube:subscriptions'])
@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import re
+import sys
+import time
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import http_server_port, try_rm
+from youtube_dl import YoutubeDL
+from youtube_dl.aes import aes_cbc_encrypt_bytes
+from youtube_dl.compat import compat_http_server, compat_struct_pack
+from youtube_dl.downloader import fragment, get_suitable_downloader, hls, http
+from youtube_dl.downloader.external import FFmpegFD
+from youtube_dl.downloader.dash import DashSegmentsFD
+from youtube_dl.downloader.hls import HlsFD
+from youtube_dl.utils import DownloadError, encodeFilename
+import threading
+
+try:
+    from youtube_dl.downloader.aio import AsyncDashSegmentsFD, AsyncHlsFD
+except (ImportError, SyntaxError):
+    AsyncDashSegmentsFD = AsyncHlsFD = None
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+FRAGMENT_COUNT = 8
+KEY = b'0123456789abcdef'
+KEY_REQUESTS = []
+LIVE_RELOADS = []
+
+
+def fragment_content(index):
+    return ('fragment %d;' % index).encode('ascii') * 10
+
+
+def encrypted_content(index):
+    # Whole blocks so that no padding is involved
+    return aes_cbc_encrypt_bytes(
+        fragment_content(index)[:96], KEY, compat_struct_pack('>8xq', index))
+
+
+class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        mobj = re.match(r'^/frag/(\d+)$', self.path)
+        if mobj:
+            index = int(mobj.group(1))
+            # Make early fragments the slowest ones so that concurrent
+            # downloads complete out of order
+            time.sleep(0.01 * (FRAGMENT_COUNT - index))
+            self.send_body(fragment_content(index), 'video/mp4')
+        elif re.match(r'^/enc/(\d+)$', self.path):
+            self.send_body(encrypted_content(int(self.path[5:])), 'video/mp2t')
+        elif self.path == '/key':
+            KEY_REQUESTS.append(self.path)
+            self.send_body(KEY, 'application/octet-stream')
+        elif self.path == '/enc.m3u8':
+            self.send_body(''.join(
+                ['#EXTM3U\n', '#EXT-X-TARGETDURATION:10\n', '#EXT-X-KEY:METHOD=AES-128,URI="key"\n']
+                + ['#EXTINF:10,\nenc/%d\n' % i for i in range(FRAGMENT_COUNT)]
+                + ['#EXT-X-ENDLIST\n']).encode('utf-8'), 'application/vnd.apple.mpegurl')
+        elif self.path == '/live.m3u8':
+            # The live window is 4 fragments long and moves by 2 at every
+            # reload, the stream ends with the last fragment
+            start = 2 * len(LIVE_RELOADS)
+            LIVE_RELOADS.append(start)
+            self.send_body(''.join(
+                ['#EXTM3U\n', '#EXT-X-TARGETDURATION:0.05\n', '#EXT-X-MEDIA-SEQUENCE:%d\n' % start]
+                + ['#EXTINF:10,\nfrag/%d\n' % i for i in range(start, start + 4)]
+                + (['#EXT-X-ENDLIST\n'] if start + 4 >= FRAGMENT_COUNT else [])).encode('utf-8'),
+                'application/vnd.apple.mpegurl')
+        elif self.path == '/live-gap.m3u8':
+            # Fragments 2 and 3 are never listed
+            start = 4 * len(LIVE_RELOADS)
+            LIVE_RELOADS.append(start)
+            self.send_body(''.join(
+                ['#EXTM3U\n', '#EXT-X-TARGETDURATION:0.05\n', '#EXT-X-MEDIA-SEQUENCE:%d\n' % start]
+                + ['#EXTINF:10,\nfrag/%d\n' % i for i in range(start, start + (4 if start else 2))]
+                + (['#EXT-X-ENDLIST\n'] if start else [])).encode('utf-8'),
+                'application/vnd.apple.mpegurl')
+        elif self.path == '/live-reset.m3u8':
+            # The media sequence restarts from 0 at the first reload
+            reloads = len(LIVE_RELOADS)
+            LIVE_RELOADS.append(reloads)
+            self.send_body(''.join(
+                ['#EXTM3U\n', '#EXT-X-TARGETDURATION:0.05\n',
+                 '#EXT-X-MEDIA-SEQUENCE:%d\n' % (0 if reloads else 100)]
+                + ['#EXTINF:10,\nfrag/%d\n' % i for i in range(4 * reloads, 4 * reloads + 4)]
+                + (['#EXT-X-ENDLIST\n'] if reloads else [])).encode('utf-8'),
+                'application/vnd.apple.mpegurl')
+        elif self.path == '/empty.m3u8':
+            self.send_body(b'#EXTM3U\n#EXT-X-ENDLIST\n', 'application/vnd.apple.mpegurl')
+        elif self.path in ('/index.m3u8', '/no-target-duration.m3u8'):
+            self.send_body(''.join(
+                ['#EXTM3U\n']
+                + (['#EXT-X-TARGETDURATION:10\n'] if self.path == '/index.m3u8' else [])
+                + ['#EXTINF:10,\nfrag/%d\n' % i for i in range(FRAGMENT_COUNT)]
+                + ['#EXT-X-ENDLIST\n']).encode('utf-8'), 'application/vnd.apple.mpegurl')
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+
+class ThreadingHTTPServer(compat_http_server.HTTPServer):
+    def process_request(self, request, client_address):
+        t = threading.Thread(
+            target=self._process_request_thread, args=(request, client_address))
+        t.daemon = True
+        t.start()
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class FakeLogger(object):
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class TestFragmentFD(unittest.TestCase):
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(
+            ('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.filename = 'testfile.mp4'
+        try_rm(encodeFilename(self.filename))
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        try_rm(encodeFilename(self.filename))
+
+    def base_url(self):
+        return 'http://127.0.0.1:%d/' % self.port
+
+    def download(self, fd_class, params, info_dict):
+        params['logger'] = FakeLogger()
+        ydl = YoutubeDL(params)
+        downloader = fd_class(ydl, params)
+        self.assertTrue(downloader.real_download(self.filename, info_dict))
+        with open(encodeFilename(self.filename), 'rb') as f:
+            return f.read()
+
+    def dash_info(self, paths):
+        return {
+            'url': self.base_url(),
+            'fragment_base_url': self.base_url(),
+            'fragments': [{'path': path} for path in paths],
+        }
+
+    def expected_content(self, indices=None):
+        if indices is None:
+            indices = range(FRAGMENT_COUNT)
+        return b''.join(fragment_content(i) for i in indices)
+
+    def test_dash_sequential(self):
+        content = self.download(DashSegmentsFD, {}, self.dash_info(
+            ['frag/%d' % i for i in range(FRAGMENT_COUNT)]))
+        self.assertEqual(content, self.expected_content())
+
+    def test_dash_concurrent(self):
+        content = self.download(DashSegmentsFD, {
+            'concurrent_fragment_downloads': 4,
+        }, self.dash_info(['frag/%d' % i for i in range(FRAGMENT_COUNT)]))
+        self.assertEqual(content, self.expected_content())
+        self.assertFalse(os.path.exists(encodeFilename(self.filename + '.ytdl')))
+
+    def test_dash_concurrent_skip_unavailable(self):
+        paths = ['frag/%d' % i for i in range(FRAGMENT_COUNT)]
+        paths[3] = 'missing'
+        content = self.download(DashSegmentsFD, {
+            'concurrent_fragment_downloads': 3,
+            'fragment_retries': 1,
+        }, self.dash_info(paths))
+        self.assertEqual(content, self.expected_content(
+            i for i in range(FRAGMENT_COUNT) if i != 3))
+
+    def test_dash_concurrent_abort_unavailable(self):
+        paths = ['frag/%d' % i for i in range(FRAGMENT_COUNT)]
+        paths[3] = 'missing'
+        params = {
+            'concurrent_fragment_downloads': 3,
+            'fragment_retries': 0,
+            'skip_unavailable_fragments': False,
+            'logger': FakeLogger(),
+        }
+        downloader = DashSegmentsFD(YoutubeDL(params), params)
+        self.assertRaises(
+            DownloadError, downloader.real_download, self.filename, self.dash_info(paths))
+        try_rm(encodeFilename(self.filename + '.part'))
+        try_rm(encodeFilename(self.filename + '.ytdl'))
+
+    def test_dash_fragments_not_written_to_disk(self):
+        opened = []
+        real_sanitize_open = http.sanitize_open
+
+        def sanitize_open(filename, open_mode):
+            opened.append(filename)
+            return real_sanitize_open(filename, open_mode)
+
+        http.sanitize_open = fragment.sanitize_open = sanitize_open
+        try:
+            content = self.download(DashSegmentsFD, {}, self.dash_info(
+                ['frag/%d' % i for i in range(FRAGMENT_COUNT)]))
+        finally:
+            http.sanitize_open = fragment.sanitize_open = real_sanitize_open
+        self.assertEqual(content, self.expected_content())
+        self.assertFalse([f for f in opened if '-Frag' in f])
+
+    def test_dash_keep_fragments(self):
+        content = self.download(DashSegmentsFD, {
+            'keep_fragments': True,
+            'concurrent_fragment_downloads': 2,
+        }, self.dash_info(['frag/%d' % i for i in range(FRAGMENT_COUNT)]))
+        self.assertEqual(content, self.expected_content())
+        for i in range(FRAGMENT_COUNT):
+            frag_filename = encodeFilename('%s.part-Frag%d' % (self.filename, i + 1))
+            with open(frag_filename, 'rb') as f:
+                self.assertEqual(f.read(), fragment_content(i))
+            try_rm(frag_filename)
+
+    def test_hls_concurrent(self):
+        content = self.download(HlsFD, {
+            'concurrent_fragment_downloads': 4,
+        }, {'url': self.base_url() + 'index.m3u8'})
+        self.assertEqual(content, self.expected_content())
+
+    def test_hls_media_playlist_detection(self):
+        content = self.download(HlsFD, {}, {'url': self.base_url() + 'no-target-duration.m3u8'})
+        self.assertEqual(content, self.expected_content())
+        # A playlist without any segment is not an empty download
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        self.assertRaises(
+            DownloadError, HlsFD(ydl, ydl.params).real_download,
+            self.filename, {'url': self.base_url() + 'empty.m3u8'})
+
+    def test_hls_aes128_native(self):
+        can_decrypt_frag = hls.can_decrypt_frag
+        # Use youtube_dl.aes even if pycryptodome is installed
+        hls.can_decrypt_frag = False
+        del KEY_REQUESTS[:]
+        try:
+            for params in ({}, {'concurrent_fragment_downloads': 3}):
+                content = self.download(HlsFD, params, {'url': self.base_url() + 'enc.m3u8'})
+                self.assertEqual(content, b''.join(
+                    fragment_content(i)[:96] for i in range(FRAGMENT_COUNT)))
+        finally:
+            hls.can_decrypt_frag = can_decrypt_frag
+        # The key is only fetched once per download
+        self.assertEqual(len(KEY_REQUESTS), 2)
+
+    def test_hls_threads_only_to_decrypt(self):
+        threaded = []
+
+        class RecordingHlsFD(HlsFD):
+            def _download_fragments_concurrently(self, ctx, *args):
+                threaded.append(ctx['filename'])
+                return super(RecordingHlsFD, self)._download_fragments_concurrently(ctx, *args)
+
+        self.download(RecordingHlsFD, {}, {'url': self.base_url() + 'index.m3u8'})
+        self.assertFalse(threaded)
+        self.download(RecordingHlsFD, {}, {'url': self.base_url() + 'enc.m3u8'})
+        self.assertEqual(len(threaded), 1)
+
+    @unittest.skipUnless(AsyncHlsFD, 'the async engine requires python >= 3.5')
+    def test_async_engine(self):
+        paths = ['frag/%d' % i for i in range(FRAGMENT_COUNT)]
+        paths[3] = 'missing'
+        for params in ({}, {'concurrent_fragment_downloads': 3}):
+            content = self.download(AsyncDashSegmentsFD, dict(params, fragment_retries=1), self.dash_info(paths))
+            self.assertEqual(content, self.expected_content(
+                i for i in range(FRAGMENT_COUNT) if i != 3))
+            try_rm(encodeFilename(self.filename))
+        can_decrypt_frag = hls.can_decrypt_frag
+        hls.can_decrypt_frag = False
+        try:
+            content = self.download(AsyncHlsFD, {
+                'concurrent_fragment_downloads': 4,
+            }, {'url': self.base_url() + 'enc.m3u8'})
+        finally:
+            hls.can_decrypt_frag = can_decrypt_frag
+        self.assertEqual(content, b''.join(
+            fragment_content(i)[:96] for i in range(FRAGMENT_COUNT)))
+        self.assertEqual(
+            get_suitable_downloader({'url': self.base_url()}, {'async_engine': True}).__name__,
+            'AsyncHttpFD')
+
+    @unittest.skipUnless(AsyncHlsFD, 'the async engine requires python >= 3.5')
+    def test_async_engine_hooks_on_calling_thread(self):
+        # The progress hooks and the writes of the fragments do not block
+        # the event loop shared by all the downloads
+        threads = set()
+        params = {
+            'logger': FakeLogger(),
+            'concurrent_fragment_downloads': 3,
+            'keep_fragments': True,
+        }
+        downloader = AsyncDashSegmentsFD(YoutubeDL(params), params)
+        downloader.add_progress_hook(lambda status: threads.add(threading.current_thread()))
+        self.assertTrue(downloader.real_download(self.filename, self.dash_info(
+            ['frag/%d' % i for i in range(FRAGMENT_COUNT)])))
+        self.assertEqual(threads, set([threading.current_thread()]))
+        for i in range(FRAGMENT_COUNT):
+            frag_filename = encodeFilename('%s.part-Frag%d' % (self.filename, i + 1))
+            with open(frag_filename, 'rb') as f:
+                self.assertEqual(f.read(), fragment_content(i))
+            try_rm(frag_filename)
+
+    def test_hls_live(self):
+        del LIVE_RELOADS[:]
+        content = self.download(HlsFD, {}, {
+            'url': self.base_url() + 'live.m3u8',
+            'is_live': True,
+        })
+        # Fragments in several playlists are only downloaded once
+        self.assertEqual(content, self.expected_content())
+        self.assertEqual(LIVE_RELOADS, [0, 2, 4])
+
+    def test_hls_live_reload_interval(self):
+        # The reloads are timed from the previous load of the playlist, so
+        # the download of the fragments takes part of the interval
+        clock = {'now': 1000.0}
+        sleeps = []
+
+        class FakeTime(object):
+            @staticmethod
+            def time():
+                return clock['now']
+
+            @staticmethod
+            def sleep(seconds):
+                sleeps.append(seconds)
+                clock['now'] += seconds
+
+        class SlowHlsFD(HlsFD):
+            def download_and_append_fragments(self, *args, **kwargs):
+                clock['now'] += 0.03
+                return super(SlowHlsFD, self).download_and_append_fragments(*args, **kwargs)
+
+        del LIVE_RELOADS[:]
+        real_time = hls.time
+        hls.time = FakeTime
+        try:
+            content = self.download(SlowHlsFD, {}, {
+                'url': self.base_url() + 'live.m3u8',
+                'is_live': True,
+            })
+        finally:
+            hls.time = real_time
+        self.assertEqual(content, self.expected_content())
+        self.assertEqual([round(s, 6) for s in sleeps], [0.02, 0.02])
+
+    def test_hls_live_missed_segments(self):
+        warnings = []
+
+        class WarningsLogger(FakeLogger):
+            def warning(self, msg):
+                warnings.append(msg)
+
+        del LIVE_RELOADS[:]
+        params = {'logger': WarningsLogger()}
+        self.assertTrue(HlsFD(YoutubeDL(params), params).real_download(self.filename, {
+            'url': self.base_url() + 'live-gap.m3u8',
+            'is_live': True,
+        }))
+        with open(encodeFilename(self.filename), 'rb') as f:
+            self.assertEqual(f.read(), self.expected_content([0, 1, 4, 5, 6, 7]))
+        self.assertEqual(len([w for w in warnings if 'Missed 2 segments' in w]), 1)
+
+    def test_hls_live_media_sequence_reset(self):
+        del LIVE_RELOADS[:]
+        content = self.download(HlsFD, {}, {
+            'url': self.base_url() + 'live-reset.m3u8',
+            'is_live': True,
+        })
+        self.assertEqual(content, self.expected_content())
+        self.assertEqual(LIVE_RELOADS, [0, 1])
+
+    def test_hls_live_suitable_downloader(self):
+        info_dict = {'url': self.base_url() + 'live.m3u8', 'is_live': True}
+        self.assertEqual(
+            get_suitable_downloader(dict(info_dict, protocol='m3u8_native')), HlsFD)
+        self.assertEqual(
+            get_suitable_downloader(dict(info_dict, protocol='m3u8')), FFmpegFD)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@
 from __future__ import unicode_literals
 
 # Allow direct execution
+import json
 import os
 import re
 import sys
@@ -13,13 +14,21 @@ from test.helper import http_server_port, try_rm
 from youtube_dl import YoutubeDL
 from youtube_dl.compat import compat_http_server
 from youtube_dl.downloader.http import HttpFD
-from youtube_dl.utils import encodeFilename
+from youtube_dl.utils import DownloadCancelled, DownloadError, encodeFilename
 import threading
+import time
+
+try:
+    from youtube_dl.downloader.aio import AsyncHttpFD
+except (ImportError, SyntaxError):
+    AsyncHttpFD = None
 
 TEST_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
 TEST_SIZE = 10 * 1024
+TEST_DATA = bytes(bytearray(i % 251 for i in range(TEST_SIZE)))
+COOKIES = []
 
 
 class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
@@ -53,8 +62,39 @@ class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(b'#' * size)
 
+    def serve_data(self):
+        range_header = self.headers.get('Range')
+        mobj = re.search(r'^bytes=(\d+)-(\d+)', range_header or '')
+        if mobj:
+            start, end = int(mobj.group(1)), int(mobj.group(2))
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, TEST_SIZE))
+        else:
+            start, end = 0, TEST_SIZE - 1
+            self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', end - start + 1)
+        self.end_headers()
+        self.wfile.write(TEST_DATA[start:end + 1])
+
     def do_GET(self):
-        if self.path == '/regular':
+        if self.path == '/data':
+            COOKIES.append(self.headers.get('Cookie'))
+            self.serve_data()
+        elif self.path == '/first-range-only':
+            if re.match(r'bytes=0-', self.headers.get('Range') or ''):
+                self.serve_data()
+            else:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+        elif self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Set-Cookie', 'test=ytdl; path=/')
+            self.send_header('Location', '/data')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path == '/regular':
             self.serve()
         elif self.path == '/no-content-length':
             self.serve(content_length=False)
@@ -110,6 +150,125 @@ class TestHttpFD(unittest.TestCase):
             'http_chunk_size': 1000,
         })
 
+    def test_reused_buffer(self):
+        params = {'logger': FakeLogger(), 'buffersize': 1000}
+        downloader = HttpFD(YoutubeDL(params), params)
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        self.assertTrue(downloader.real_download(filename, {
+            'url': 'http://127.0.0.1:%d/data' % self.port,
+        }))
+        with open(encodeFilename(filename), 'rb') as f:
+            self.assertEqual(f.read(), TEST_DATA)
+        try_rm(encodeFilename(filename))
+
+    @unittest.skipUnless(AsyncHttpFD, 'the async engine requires python >= 3.5')
+    def test_async_engine(self):
+        params = {'logger': FakeLogger(), 'async_engine': True}
+        ydl = YoutubeDL(params)
+        downloader = AsyncHttpFD(ydl, params)
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        del COOKIES[:]
+        self.assertTrue(downloader.real_download(filename, {
+            'url': 'http://127.0.0.1:%d/redirect' % self.port,
+        }))
+        with open(encodeFilename(filename), 'rb') as f:
+            self.assertEqual(f.read(), TEST_DATA)
+        try_rm(encodeFilename(filename))
+        # The redirect is followed with the cookie it set
+        self.assertEqual(COOKIES, ['test=ytdl'])
+
+    def test_smooth_block_size(self):
+        rate, block_size = HttpFD.smooth_block_size(None, 1, 100000, 1024)
+        # The block size doubles at most
+        self.assertEqual((rate, block_size), (100000, 2048))
+        for _ in range(10):
+            rate, block_size = HttpFD.smooth_block_size(rate, 1, 100000, block_size)
+        self.assertEqual(block_size, 100000)
+        # A single slow block only halves it at most
+        rate, block_size = HttpFD.smooth_block_size(rate, 10, 1, block_size)
+        self.assertEqual(block_size, 70000)
+        rate, block_size = HttpFD.smooth_block_size(rate, 0, 10 ** 9, block_size)
+        self.assertEqual(block_size, 140000)
+        self.assertEqual(HttpFD.smooth_block_size(None, 0, 10 ** 9, 4194304)[1], 4194304)
+        self.assertEqual(HttpFD.smooth_block_size(None, 10, 1, 1024)[1], 1024)
+
+    def download_parallel(self, params):
+        params['logger'] = FakeLogger()
+        params['http_connections'] = 4
+        downloader = HttpFD(YoutubeDL(params), params)
+        downloader._MIN_RANGE_SIZE = 1000
+        filename = 'testfile.mp4'
+        self.assertTrue(downloader.real_download(filename, {
+            'url': 'http://127.0.0.1:%d/data' % self.port,
+        }))
+        self.assertFalse(os.path.exists(encodeFilename(filename + '.ytdl')))
+        with open(encodeFilename(filename), 'rb') as f:
+            content = f.read()
+        try_rm(encodeFilename(filename))
+        return content
+
+    def test_parallel_ranges(self):
+        try_rm(encodeFilename('testfile.mp4'))
+        self.assertEqual(self.download_parallel({}), TEST_DATA)
+        # Servers not supporting range requests fall back to a regular download
+        self.download({'http_connections': 4}, 'no-range')
+
+    def test_parallel_ranges_resume(self):
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        half = TEST_SIZE // 2
+        with open(encodeFilename(filename + '.part'), 'wb') as f:
+            f.write(TEST_DATA[:1000])
+            f.truncate(TEST_SIZE)
+        with open(encodeFilename(filename + '.ytdl'), 'w') as f:
+            json.dump({'downloader': {
+                'total_bytes': TEST_SIZE,
+                'ranges': [
+                    {'start': 0, 'end': half - 1, 'downloaded': 1000},
+                    {'start': half, 'end': TEST_SIZE - 1, 'downloaded': 0},
+                ],
+            }}, f)
+        self.assertEqual(self.download_parallel({}), TEST_DATA)
+
+    def test_parallel_ranges_cancel(self):
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        params = {'logger': FakeLogger(), 'http_connections': 4, 'buffersize': 100, 'noresizebuffer': True}
+        downloader = HttpFD(YoutubeDL(params), params)
+        downloader._MIN_RANGE_SIZE = 1000
+        downloader.add_progress_hook(lambda status: downloader.cancel())
+        self.assertRaises(DownloadCancelled, downloader.real_download, filename, {
+            'url': 'http://127.0.0.1:%d/data' % self.port,
+        })
+        # The download can be resumed
+        self.assertTrue(os.path.exists(encodeFilename(filename + '.ytdl')))
+        self.assertEqual(self.download_parallel({}), TEST_DATA)
+
+    def test_parallel_ranges_abort(self):
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        params = {'logger': FakeLogger(), 'http_connections': 4, 'buffersize': 100, 'noresizebuffer': True}
+        downloader = HttpFD(YoutubeDL(params), params)
+        downloader._MIN_RANGE_SIZE = 1000
+        statuses = []
+
+        def hook(status):
+            statuses.append(status)
+            time.sleep(0.02)
+
+        downloader.add_progress_hook(hook)
+        self.assertRaises(DownloadError, downloader.real_download, filename, {
+            'url': 'http://127.0.0.1:%d/first-range-only' % self.port,
+        })
+        try_rm(encodeFilename(filename + '.part'))
+        try_rm(encodeFilename(filename + '.ytdl'))
+        # The first range stops when the others fail, possibly before
+        # downloading anything
+        self.assertLess(
+            max([s['downloaded_bytes'] for s in statuses] + [0]), TEST_SIZE // 4)
+
 
 if __name__ == '__main__':
     unittest.main()
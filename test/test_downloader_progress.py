@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import io
+import json
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import try_rm
+from youtube_dl import YoutubeDL
+from youtube_dl.downloader.http import HttpFD
+
+
+class ScreenYDL(YoutubeDL):
+    def __init__(self, params):
+        super(ScreenYDL, self).__init__(params, auto_init=False)
+        self.screen = []
+
+    def to_screen(self, s, skip_eol=None):
+        self.screen.append(s)
+
+
+class TTYFile(io.StringIO):
+    def isatty(self):
+        return True
+
+
+class BareYDL(object):
+    """A ydl without a progress display"""
+
+    def __init__(self):
+        self.screen = []
+
+    def to_screen(self, s, skip_eol=None):
+        self.screen.append(s)
+
+    def to_console_title(self, message):
+        pass
+
+
+def downloading(filename, downloaded_bytes):
+    return {
+        'status': 'downloading',
+        'filename': filename,
+        'downloaded_bytes': downloaded_bytes,
+        'total_bytes': 1000,
+        'speed': 100,
+        'eta': 1,
+    }
+
+
+class TestProgressAggregator(unittest.TestCase):
+    def setUp(self):
+        self.json_filename = 'progress.jsonl'
+        try_rm(self.json_filename)
+
+    def tearDown(self):
+        try_rm(self.json_filename)
+
+    def test_throttled_rendering(self):
+        ydl = ScreenYDL({'progress_with_newline': True, 'progress_interval': 3600})
+        fd = HttpFD(ydl, ydl.params)
+        for downloaded_bytes in range(0, 1000, 10):
+            fd.report_progress(downloading('a.mp4', downloaded_bytes))
+        # Only the first status is rendered, the finished one always is
+        self.assertEqual(ydl.screen, ['[download]   0.0% of 1000.00B at  100.00B/s ETA 00:01'])
+        fd.report_progress({'status': 'finished', 'filename': 'a.mp4', 'total_bytes': 1000})
+        self.assertEqual(ydl.screen[1:], ['[download] 100% of 1000.00B'])
+
+    def test_concurrent_downloads(self):
+        ydl = ScreenYDL({'progress_with_newline': True, 'progress_interval': 0})
+        fd = HttpFD(ydl, ydl.params)
+        fd.report_progress(downloading('a.mp4', 0))
+        fd.report_progress(downloading('b.mp4', 500))
+        # Both downloads are rendered together
+        self.assertEqual(ydl.screen[1:], [
+            '[download]   0.0% of 1000.00B at  100.00B/s ETA 00:01',
+            '[download]  50.0% of 1000.00B at  100.00B/s ETA 00:01',
+        ])
+        del ydl.screen[:]
+        fd.report_progress({'status': 'finished', 'filename': 'a.mp4'})
+        self.assertEqual(ydl.screen, [
+            '[download] 100%',
+            '[download]  50.0% of 1000.00B at  100.00B/s ETA 00:01',
+        ])
+
+    def test_screen_file_terminal(self):
+        ydl = ScreenYDL({'progress_interval': 0})
+        ydl._screen_file = TTYFile()
+        fd = HttpFD(ydl, ydl.params)
+        fd.report_progress(downloading('a.mp4', 0))
+        fd.report_progress(downloading('b.mp4', 500))
+        # Both downloads get their own line, redrawn in place
+        self.assertEqual(ydl.screen[1], '\r\x1b[J' + '\n'.join([
+            '[download]   0.0% of 1000.00B at  100.00B/s ETA 00:01',
+            '[download]  50.0% of 1000.00B at  100.00B/s ETA 00:01',
+        ]))
+
+    def test_without_progress_aggregator(self):
+        ydl = BareYDL()
+        fd = HttpFD(ydl, {'progress_with_newline': True})
+        fd.report_progress(downloading('a.mp4', 0))
+        fd.report_progress({'status': 'finished', 'filename': 'a.mp4', 'total_bytes': 1000})
+        self.assertEqual(ydl.screen, [
+            '[download]   0.0% of 1000.00B at  100.00B/s ETA 00:01',
+            '[download] 100% of 1000.00B',
+        ])
+
+    def test_json_events(self):
+        ydl = ScreenYDL({
+            'noprogress': True,
+            'progress_with_newline': True,
+            'progress_interval': 3600,
+            'progress_json': self.json_filename,
+        })
+        fd = HttpFD(ydl, ydl.params)
+        fd.report_progress(downloading('a.mp4', 0))
+        fd.report_progress(downloading('a.mp4', 10))
+        fd.report_progress({'status': 'finished', 'filename': 'a.mp4', 'total_bytes': 1000})
+        ydl.progress_aggregator.close()
+        self.assertEqual(ydl.screen, ['[download] Download completed'])
+        with io.open(self.json_filename, encoding='utf-8') as f:
+            events = [json.loads(line) for line in f]
+        for event in events:
+            self.assertTrue(isinstance(event.pop('time'), float))
+        self.assertEqual(events, [{
+            'status': 'downloading',
+            'filename': 'a.mp4',
+            'downloaded_bytes': 0,
+            'total_bytes': 1000,
+            'speed': 100,
+            'eta': 1,
+        }, {
+            'status': 'finished',
+            'filename': 'a.mp4',
+            'total_bytes': 1000,
+        }])
+
+
+if __name__ == '__main__':
+    unittest.main()
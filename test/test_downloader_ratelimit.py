@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import threading
+import time
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl import YoutubeDL
+from youtube_dl.downloader.external import CurlFD
+from youtube_dl.downloader.ratelimit import RateLimiter, TokenBucket
+
+
+class TestRateLimit(unittest.TestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(10000, burst=1000)
+        # Bursts are let through up to the bucket size, then the debt has to
+        # be waited for
+        self.assertEqual(bucket.consume(1000), 0)
+        self.assertAlmostEqual(bucket.consume(1000), 0.1, delta=0.01)
+        self.assertAlmostEqual(bucket.consume(1000), 0.2, delta=0.01)
+
+    def test_shared_buckets(self):
+        rate = 123457
+        a = RateLimiter(rate, 2 * rate, 'http://a.example.com/video.mp4')
+        b = RateLimiter(rate, 2 * rate, 'https://A.example.com/other.mp4')
+        c = RateLimiter(None, 2 * rate, 'http://c.example.com/video.mp4')
+        self.assertIs(a._buckets[0], b._buckets[0])
+        self.assertIs(a._buckets[1], b._buckets[1])
+        self.assertIsNot(a._buckets[1], c._buckets[0])
+        self.assertEqual(a.rate, rate)
+        self.assertEqual(c.rate, 2 * rate)
+        self.assertFalse(RateLimiter(None, None, 'http://a.example.com/'))
+
+    def test_concurrent_throttle(self):
+        rate = 100000
+        limiters = [RateLimiter(None, rate, 'http://b.example.com/%d' % i) for i in range(4)]
+        start = time.time()
+
+        def download(limiter):
+            for _ in range(10):
+                limiter.throttle(1000)
+
+        threads = [threading.Thread(target=download, args=(l, )) for l in limiters]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # 40000 bytes at 100000 bytes/s minus the initial burst of 10000
+        self.assertGreaterEqual(time.time() - start, 0.25)
+
+    def test_external_downloader_rate(self):
+        params = {'ratelimit': 50000, 'ratelimit_per_host': 20000}
+        fd = CurlFD(YoutubeDL(params), params)
+        self.assertEqual(
+            fd._rate_limit_option('--limit-rate', {'url': 'http://example.com/'}),
+            ['--limit-rate', '20000'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -39,6 +39,20 @@ class TestExecution(unittest.TestCase):
         _, stderr = p.communicate()
         self.assertFalse(stderr)
 
+    def test_startup_does_not_import_extractors(self):
+        # Extractors are only needed once a URL is processed
+        script = (
+            'import sys\n'
+            'sys.argv = ["youtube-dl", "--version"]\n'
+            'import youtube_dl\n'
+            'try:\n'
+            '    youtube_dl.main()\n'
+            'except SystemExit:\n'
+            '    pass\n'
+            'print(sorted(m for m in sys.modules if m.startswith("youtube_dl.extractor")))\n')
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=rootDir)
+        self.assertEqual(output.decode('ascii').splitlines()[-1], '[]')
+
     def test_lazy_extractors(self):
         try:
             subprocess.check_call([sys.executable, 'devscripts/make_lazy_extractors.py', 'youtube_dl/extractor/lazy_extractors.py'], cwd=rootDir, stdout=_DEV_NULL)
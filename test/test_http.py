@@ -162,5 +162,75 @@ class TestProxy(unittest.TestCase):
         self.assertEqual(response, 'normal: http://xn--fiq228c.tw/')
 
 
+class KeepAliveRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.client_ports.append(self.client_address[1])
+        if self.path == '/chunked':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in (b'keep', b'alive'):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            body = b'keepalive' * 1000
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+class TestKeepAlive(unittest.TestCase):
+    def setUp(self):
+        self.httpd = compat_http_server.HTTPServer(
+            ('127.0.0.1', 0), KeepAliveRequestHandler)
+        self.httpd.client_ports = []
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def url(self, path):
+        return 'http://127.0.0.1:%d/%s' % (self.port, path)
+
+    @unittest.skipIf(sys.version_info < (3, 0), 'keep-alive is only supported on python 3')
+    def test_connection_reuse(self):
+        # Leaving the context closes pooled connections so that the single
+        # threaded test server can shut down
+        with YoutubeDL({'logger': FakeLogger()}) as ydl:
+            for path in ('regular', 'chunked', 'regular'):
+                self.assertTrue(ydl.urlopen(self.url(path)).read())
+            self.assertEqual(len(set(self.httpd.client_ports)), 1)
+            self.assertEqual(ydl._connection_pool.stats['opened'], 1)
+            self.assertEqual(ydl._connection_pool.stats['reused'], 2)
+            self.assertEqual(ydl.urlopen(self.url('chunked')).read(), b'keepalive')
+
+    @unittest.skipIf(sys.version_info < (3, 0), 'keep-alive is only supported on python 3')
+    def test_partially_read_response(self):
+        with YoutubeDL({'logger': FakeLogger()}) as ydl:
+            response = ydl.urlopen(self.url('regular'))
+            response.read(10)
+            response.close()
+            self.assertEqual(ydl.urlopen(self.url('regular')).read(), b'keepalive' * 1000)
+            self.assertEqual(len(set(self.httpd.client_ports)), 2)
+
+    def test_keepalive_disabled(self):
+        ydl = YoutubeDL({'logger': FakeLogger(), 'http_keepalive': False})
+        for _ in range(2):
+            self.assertTrue(ydl.urlopen(self.url('regular')).read())
+        self.assertEqual(len(set(self.httpd.client_ports)), 2)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -406,6 +406,22 @@ class TestJSInterpreter(unittest.TestCase):
         jsi = JSInterpreter('function x(){return 1236566549 << 5}')
         self.assertEqual(jsi.call_function('x'), 915423904)
 
+    def test_memoized_splits(self):
+        code = '''
+        function x(a){var b=a.split(""),c=[function(d){d.reverse()},"e"];
+        for(var i=0;i<3;i++){c[0](b);b.push(c[1])}return b.join("")}
+        '''
+        jsi = JSInterpreter(code)
+        self.assertEqual(jsi.call_function('x', 'abc'), 'ecbaee')
+        splits = jsi.dump_splits()
+        self.assertTrue(splits)
+        # Expressions that only differ by named objects share their splits
+        self.assertFalse([s for s in splits if re.search(r'__youtube_dl_jsinterp_obj[1-9]', s[0])])
+
+        jsi = JSInterpreter(code, splits=splits)
+        self.assertEqual(jsi.call_function('x', 'abc'), 'ecbaee')
+        self.assertEqual(len(jsi.dump_splits()), len(splits))
+
 
 if __name__ == '__main__':
     unittest.main()
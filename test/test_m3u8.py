@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl.m3u8 import parse_m3u8_playlist
+
+
+class TestM3U8(unittest.TestCase):
+    def test_media_playlist(self):
+        playlist = parse_m3u8_playlist('''#EXTM3U
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:7
+#EXTINF:5.5,
+seg7.ts
+#EXT-X-KEY:METHOD=AES-128,URI="/key",IV=0x1
+#EXT-X-BYTERANGE:100@50
+#EXTINF:6,
+https://cdn.example.com/seg8.ts
+#EXT-X-BYTERANGE:20
+seg8.ts
+#UPLYNK-SEGMENT:abc,00000000,ad
+ad.ts
+#UPLYNK-SEGMENT:abc,00000001,segment
+seg9.ts
+#EXT-X-ENDLIST
+''', 'http://example.com/hls/index.m3u8')
+        self.assertFalse(playlist['is_master'])
+        self.assertTrue(playlist['ended'])
+        self.assertEqual(playlist['target_duration'], 6)
+        self.assertEqual(playlist['media_sequence'], 7)
+        self.assertEqual(playlist['ad_fragments'], 1)
+        fragments = playlist['fragments']
+        self.assertEqual(
+            [(f['url'], f['media_sequence'], f['byte_range']) for f in fragments], [
+                ('http://example.com/hls/seg7.ts', 7, None),
+                ('https://cdn.example.com/seg8.ts', 8, {'start': 50, 'end': 150}),
+                ('http://example.com/hls/seg8.ts', 9, {'start': 150, 'end': 170}),
+                ('http://example.com/hls/seg9.ts', 10, {'start': 150, 'end': 170}),
+            ])
+        self.assertEqual([f['duration'] for f in fragments], [5.5, 6, None, None])
+        self.assertEqual(fragments[0]['decrypt_info'], {'METHOD': 'NONE'})
+        self.assertEqual(fragments[1]['decrypt_info'], {
+            'METHOD': 'AES-128',
+            'URI': 'http://example.com/key',
+            'IV': b'\0' * 15 + b'\1',
+        })
+        # The fragments using the same key share it
+        self.assertIs(fragments[1]['decrypt_info'], fragments[3]['decrypt_info'])
+
+    def test_media_playlist_without_target_duration(self):
+        playlist = parse_m3u8_playlist('''#EXTM3U
+#EXT-X-BYTERANGE:10
+#EXTINF:5,
+a.ts
+#EXTINF:5,
+b.ts
+#EXT-X-ENDLIST
+''', 'http://example.com/index.m3u8')
+        self.assertFalse(playlist['is_master'])
+        self.assertFalse(playlist['variants'])
+        self.assertEqual(
+            [(f['url'], f['byte_range']) for f in playlist['fragments']], [
+                ('http://example.com/a.ts', {'start': 0, 'end': 10}),
+                ('http://example.com/b.ts', {'start': 0, 'end': 10}),
+            ])
+
+    def test_master_playlist(self):
+        playlist = parse_m3u8_playlist('''#EXTM3U
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="English",URI="audio.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=1280000,RESOLUTION=640x360,AUDIO="aac"
+low/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2560000
+http://other.example.com/high.m3u8
+''', 'http://example.com/master.m3u8')
+        self.assertTrue(playlist['is_master'])
+        self.assertFalse(playlist['fragments'])
+        self.assertEqual(playlist['media'], [{
+            'TYPE': 'AUDIO',
+            'GROUP-ID': 'aac',
+            'NAME': 'English',
+            'URI': 'audio.m3u8',
+        }])
+        self.assertEqual(playlist['variants'], [{
+            'url': 'http://example.com/low/index.m3u8',
+            'stream_inf': {'BANDWIDTH': '1280000', 'RESOLUTION': '640x360', 'AUDIO': 'aac'},
+        }, {
+            'url': 'http://other.example.com/high.m3u8',
+            'stream_inf': {'BANDWIDTH': '2560000'},
+        }])
+
+
+if __name__ == '__main__':
+    unittest.main()
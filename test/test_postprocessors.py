@@ -4,14 +4,266 @@ from __future__ import unicode_literals
 
 # Allow direct execution
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from youtube_dl.postprocessor import MetadataFromTitlePP
+from test.helper import FakeYDL
+from youtube_dl.compat import compat_os_name
+from youtube_dl.downloader.ism import box, full_box, u32, u64, write_piff_header
+from youtube_dl.postprocessor import (
+    FFmpegFixupStretchedPP,
+    FFmpegFusedPP,
+    FFmpegMergerPP,
+    FFmpegMetadataPP,
+    FFmpegPostProcessor,
+    MetadataFromTitlePP,
+)
+from youtube_dl.postprocessor.mp4merge import (
+    find_box,
+    FragmentedMP4Merger,
+    iter_boxes,
+    MP4MergeError,
+)
 
 
 class TestMetadataFromTitle(unittest.TestCase):
     def test_format_to_regex(self):
         pp = MetadataFromTitlePP(None, '%(title)s - %(artist)s')
         self.assertEqual(pp._titleregex, r'(?P<title>.+)\ \-\ (?P<artist>.+)')
+
+
+@unittest.skipIf(compat_os_name == 'nt', 'shell scripts are used as executables')
+class TestFFmpegPostProcessor(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.log = os.path.join(self.tmpdir, 'log')
+        self.ffmpeg = os.path.join(self.tmpdir, 'ffmpeg')
+        self.write_ffmpeg('4.4')
+        FFmpegPostProcessor._versions_cache.clear()
+
+    def tearDown(self):
+        FFmpegPostProcessor._versions_cache.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def write_ffmpeg(self, version):
+        with open(self.ffmpeg, 'w') as f:
+            f.write('#!/bin/sh\necho run >> "%s"\necho "ffmpeg version %s"\n' % (self.log, version))
+        os.chmod(self.ffmpeg, 0o755)
+
+    def runs(self):
+        if not os.path.exists(self.log):
+            return 0
+        with open(self.log) as f:
+            return len(f.read().split())
+
+    def get_pp(self):
+        return FFmpegPostProcessor(FakeYDL({
+            'ffmpeg_location': self.ffmpeg,
+            'cachedir': os.path.join(self.tmpdir, 'cache'),
+        }))
+
+    def test_versions_cache(self):
+        self.assertEqual(self.get_pp()._versions['ffmpeg'], '4.4')
+        self.assertEqual(self.get_pp().executable, self.ffmpeg)
+        self.assertEqual(self.runs(), 1)
+
+        # A new process finds them in the cache directory
+        FFmpegPostProcessor._versions_cache.clear()
+        self.assertEqual(self.get_pp()._versions['ffmpeg'], '4.4')
+        self.assertEqual(self.runs(), 1)
+
+        # until the executable changes
+        FFmpegPostProcessor._versions_cache.clear()
+        self.write_ffmpeg('5.0')
+        os.utime(self.ffmpeg, (0, 0))
+        self.assertEqual(self.get_pp()._versions['ffmpeg'], '5.0')
+        self.assertEqual(self.runs(), 2)
+
+    def write_recording_ffmpeg(self, fail_on=None):
+        # Log the command lines and write the output file, fail after
+        # writing it if an argument is fail_on
+        with open(self.ffmpeg, 'w') as f:
+            f.write(
+                '#!/bin/sh\n'
+                'if [ "$1" = "-version" ]; then echo "ffmpeg version 4.4"; exit 0; fi\n'
+                'echo "$@" >> "%s"\n'
+                'for last; do :; done\n'
+                'echo output > "${last#file:}"\n'
+                'for arg; do if [ "$arg" = "%s" ]; then echo "Invalid $arg" >&2; exit 1; fi; done\n'
+                % (self.log, fail_on or ''))
+        os.chmod(self.ffmpeg, 0o755)
+
+    def commands(self):
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log) as f:
+            return [line.split() for line in f.read().splitlines()]
+
+    def test_fused_postprocessors(self):
+        self.write_recording_ffmpeg()
+        ydl = FakeYDL({'ffmpeg_location': self.ffmpeg})
+        filename = os.path.join(self.tmpdir, 'video.mp4')
+        files_to_merge = [os.path.join(self.tmpdir, 'video.f1.mp4'), os.path.join(self.tmpdir, 'video.f2.m4a')]
+        for path in files_to_merge:
+            with open(path, 'w') as f:
+                f.write('format')
+
+        def info():
+            return {
+                'filepath': filename,
+                'ext': 'mp4',
+                'title': 'fused',
+                'stretched_ratio': 2,
+                '__files_to_merge': files_to_merge,
+            }
+
+        pps = [FFmpegMergerPP(ydl), FFmpegFixupStretchedPP(ydl), FFmpegMetadataPP(ydl)]
+        chain = FFmpegFusedPP.fuse(ydl, [MetadataFromTitlePP(ydl, '%(title)s')] + pps)
+        self.assertEqual(len(chain), 2)
+        self.assertTrue(isinstance(chain[1], FFmpegFusedPP))
+
+        files_to_delete, _ = chain[1].run(info())
+        self.assertEqual(files_to_delete, files_to_merge)
+        commands = self.commands()
+        self.assertEqual(len(commands), 1)
+        cmd = commands[0]
+        self.assertEqual(cmd.count('-i'), 2)
+        for opt in ('0:v:0', '1:a:0', '-aspect', 'title=fused'):
+            self.assertIn(opt, cmd)
+        self.assertTrue(os.path.exists(filename))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'video.temp.mp4')))
+
+        # Unfused, each postprocessor runs its own command
+        os.remove(self.log)
+        for pp in pps:
+            pp.run(info())
+        self.assertEqual(len(self.commands()), 3)
+
+        # When the fused command fails, the passes are run one by one and
+        # only the failing one is lost
+        os.remove(self.log)
+        os.remove(filename)
+        self.write_recording_ffmpeg(fail_on='-aspect')
+        errors = []
+        ydl.report_error = errors.append
+        files_to_delete, _ = chain[1].run(info())
+        self.assertEqual(files_to_delete, files_to_merge)
+        self.assertEqual(errors, ['Invalid -aspect'])
+        commands = self.commands()
+        self.assertEqual(len(commands), 4)
+        self.assertIn('title=fused', commands[3])
+        self.assertTrue(os.path.exists(filename))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'video.temp.mp4')))
+
+
+def write_fragmented_mp4(filename, params, fragments):
+    """Write a single track file, fragments are (decode time, sample data)"""
+    with open(filename, 'wb') as f:
+        write_piff_header(f, params)
+        for n, (decode_time, data) in enumerate(fragments, 1):
+            traf_payload = full_box(b'tfhd', 0, 0x020000, u32.pack(params['track_id']))
+            traf_payload += full_box(b'tfdt', 1, 0, u64.pack(decode_time))
+            trun_size = 12 + 4 + 4 + 4
+            # data offset from the start of the moof, past the mdat header
+            data_offset = 8 + 16 + 8 + len(traf_payload) + trun_size + 8
+            traf_payload += full_box(b'trun', 0, 0x201, u32.pack(1) + u32.pack(data_offset) + u32.pack(len(data)))
+            f.write(box(b'moof', full_box(b'mfhd', 0, 0, u32.pack(n)) + box(b'traf', traf_payload)))
+            f.write(box(b'mdat', data))
+        f.write(box(b'mfra', b''))
+
+
+class TestFragmentedMP4Merger(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.video = os.path.join(self.tmpdir, 'video.f1.mp4')
+        self.audio = os.path.join(self.tmpdir, 'video.f2.m4a')
+        self.output = os.path.join(self.tmpdir, 'video.mp4')
+        write_fragmented_mp4(self.video, {
+            'track_id': 1,
+            'fourcc': 'H264',
+            'duration': 30000000,
+            'width': 640,
+            'height': 360,
+            'codec_private_data': '00000001674d401fe8802802dd80b5010101400000fa40003a9803c60c44800000000168eb8c8b',
+        }, [(0, b'video0'), (10000000, b'video1'), (20000000, b'video2')])
+        write_fragmented_mp4(self.audio, {
+            'track_id': 1,
+            'fourcc': 'AACL',
+            'duration': 144000,
+            'timescale': 48000,
+            'sampling_rate': 48000,
+        }, [(0, b'audio0'), (72000, b'audio1')])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_merge(self):
+        with FragmentedMP4Merger([self.video, self.audio]) as merger:
+            merger.write(self.output)
+        with open(self.output, 'rb') as f:
+            data = f.read()
+
+        boxes = list(iter_boxes(data))
+        self.assertEqual([b[0] for b in boxes[:2]], [b'ftyp', b'moov'])
+        self.assertNotIn(b'mfra', [b[0] for b in boxes])
+        moov = data[boxes[1][1]:boxes[1][2]]
+        traks = [b for b in iter_boxes(moov) if b[0] == b'trak']
+        self.assertEqual(
+            [moov[find_box(moov, [b'tkhd'], s, e)[0] + 20:][:4] for _, s, e in traks],
+            [u32.pack(1), u32.pack(2)])
+        mvex = find_box(moov, [b'mvex'])
+        self.assertEqual(len([b for b in iter_boxes(moov, *mvex) if b[0] == b'trex']), 2)
+
+        # Fragments interleaved by time, pointing to their own data
+        samples = []
+        for n, (_, start, end) in enumerate(b for b in boxes if b[0] == b'moof'):
+            mfhd = find_box(data, [b'mfhd'], start, end)
+            self.assertEqual(data[mfhd[0] + 4:mfhd[1]], u32.pack(n + 1))
+            tfhd = find_box(data, [b'traf', b'tfhd'], start, end)
+            trun = find_box(data, [b'traf', b'trun'], start, end)
+            sample_start = start - 8 + u32.unpack(data[trun[0] + 8:trun[0] + 12])[0]
+            sample_size = u32.unpack(data[trun[0] + 12:trun[0] + 16])[0]
+            samples.append((
+                u32.unpack(data[tfhd[0] + 4:tfhd[0] + 8])[0],
+                data[sample_start:sample_start + sample_size]))
+        self.assertEqual(samples, [
+            (1, b'video0'), (2, b'audio0'), (1, b'video1'), (2, b'audio1'), (1, b'video2')])
+
+    def test_unsupported(self):
+        with open(self.audio, 'wb') as f:
+            f.write(box(b'ftyp', b'isom') + box(b'moov', b'') + box(b'mdat', b'audio'))
+        self.assertRaises(MP4MergeError, FragmentedMP4Merger, [self.video, self.audio])
+        self.assertRaises(MP4MergeError, FragmentedMP4Merger, [self.video, self.video])
+
+    def test_merger_pp(self):
+        pp = FFmpegMergerPP(FakeYDL({'ffmpeg_location': os.path.join(self.tmpdir, 'missing')}))
+        self.assertFalse(pp.available)
+        self.assertTrue(pp.can_merge_natively('mp4', ['mp4', 'm4a']))
+        self.assertFalse(pp.can_merge_natively('mkv', ['mp4', 'm4a']))
+        info = {
+            'filepath': self.output,
+            'ext': 'mp4',
+            '__files_to_merge': [self.video, self.audio],
+        }
+        self.assertIsNone(pp.ffmpeg_pass(info))
+        files_to_delete, _ = pp.run(info)
+        self.assertEqual(files_to_delete, [self.video, self.audio])
+        self.assertTrue(os.path.exists(self.output))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'video.temp.mp4')))
+
+        # Without ffmpeg the formats that cannot be merged natively are
+        # left as they are
+        os.remove(self.output)
+        with open(self.audio, 'wb') as f:
+            f.write(box(b'ftyp', b'isom') + box(b'moov', b'') + box(b'mdat', b'audio'))
+        warnings = []
+        pp._downloader.report_warning = warnings.append
+        self.assertIsNone(pp.ffmpeg_pass(info))
+        self.assertEqual(pp.run(info), ([], info))
+        self.assertEqual(len(warnings), 1)
+        self.assertTrue(os.path.exists(self.video))
+        self.assertTrue(os.path.exists(self.audio))
+        self.assertFalse(os.path.exists(self.output))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import io
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import http_server_port, try_rm
+from youtube_dl.compat import compat_http_server
+from youtube_dl.service import DownloadService
+import threading
+
+VIDEO_DATA = b'\x00\x00\x00\x00\x20\x66\x74[video]'
+
+
+class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        if self.path.startswith('/vid'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'video/mp4')
+            self.send_header('Content-Length', '%d' % len(VIDEO_DATA))
+            self.end_headers()
+            if self.command == 'GET':
+                self.wfile.write(VIDEO_DATA)
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+
+class FakeLogger(object):
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class TestDownloadService(unittest.TestCase):
+    def setUp(self):
+        self.httpd = compat_http_server.HTTPServer(
+            ('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+
+    def test_service(self):
+        service = DownloadService({
+            'logger': FakeLogger(),
+            'outtmpl': 'service-%(id)s.%(ext)s',
+        }, workers=2)
+        base_url = 'http://127.0.0.1:%d/' % self.port
+        results = []
+        service.serve_stream(io.StringIO(
+            '# comment\n%svid1.mp4\n\n%smissing\n%svid2.mp4\n' % ((base_url, ) * 3)),
+            results.append)
+        service.close()
+        self.assertEqual(service._retcode, 1)
+
+        results = dict((r['url'], r) for r in results)
+        self.assertEqual(len(results), 3)
+        for vid in ('vid1', 'vid2'):
+            result = results[base_url + vid + '.mp4']
+            self.assertEqual(result['status'], 'finished')
+            self.assertEqual(result['retcode'], 0)
+            self.assertEqual(result['videos'], [{
+                'id': vid,
+                'title': vid,
+                'filename': 'service-%s.mp4' % vid,
+            }])
+            with open('service-%s.mp4' % vid, 'rb') as f:
+                self.assertEqual(f.read(), VIDEO_DATA)
+            try_rm('service-%s.mp4' % vid)
+        result = results[base_url + 'missing']
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(result['videos'], [])
+        self.assertTrue(result['errors'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,6 +15,7 @@ import io
 import json
 import xml.etree.ElementTree
 
+from test.helper import try_rm
 from youtube_dl.utils import (
     age_restricted,
     args_to_str,
@@ -27,6 +28,7 @@ from youtube_dl.utils import (
     detect_exe_version,
     determine_ext,
     dict_get,
+    DownloadArchive,
     encode_compat_str,
     encodeFilename,
     escape_rfc3986,
@@ -479,6 +481,31 @@ class TestUtil(unittest.TestCase):
         self.assertEqual(res_url, url)
         self.assertEqual(res_data, {'a': 'b', 'c': 'd'})
 
+    def test_download_archive(self):
+        fn = 'test_download_archive.txt'
+        try_rm(fn)
+        try:
+            archive = DownloadArchive(fn)
+            self.assertFalse('youtube abc' in archive)
+            archive.add('youtube abc')
+            self.assertTrue('youtube abc' in archive)
+            self.assertFalse('youtube ab' in archive)
+
+            # Lines appended by another process are picked up
+            with io.open(fn, 'a', encoding='utf-8') as f:
+                f.write('vimeo 123\n  youtube def  \n')
+            self.assertTrue('vimeo 123' in archive)
+            self.assertTrue('youtube def' in archive)
+            self.assertTrue('youtube def' in DownloadArchive(fn))
+
+            # As well as a rewritten archive
+            with io.open(fn, 'w', encoding='utf-8') as f:
+                f.write('x 1')
+            self.assertTrue('x 1' in archive)
+            self.assertFalse('youtube abc' in archive)
+        finally:
+            try_rm(fn)
+
     def test_shell_quote(self):
         args = ['ffmpeg', '-i', encodeFilename('ñ€ß\'.mp4')]
         self.assertEqual(
@@ -651,6 +678,17 @@ class TestUtil(unittest.TestCase):
         testPL(5, 2, (2, 99), [2, 3, 4])
         testPL(5, 2, (20, 99), [])
 
+        requested_pages = []
+
+        def get_page(pagenum):
+            requested_pages.append(pagenum)
+            return range(pagenum * 2, pagenum * 2 + 2)
+
+        it = OnDemandPagedList(get_page, 2).iterslice(1)
+        self.assertEqual(next(it), 1)
+        self.assertEqual(next(it), 2)
+        self.assertEqual(requested_pages, [0, 1])
+
     def test_read_batch_urls(self):
         f = io.StringIO('''\xef\xbb\xbf foo
             bar\r
@@ -3,11 +3,14 @@ from __future__ import unicode_literals
 
 # Allow direct execution
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+from test.helper import FakeYDL
 from youtube_dl.extractor import YoutubeIE
 
 
@@ -21,6 +24,53 @@ class TestYoutubeMisc(unittest.TestCase):
         assertExtractId('http://www.youtube.com/watch?v=BaW_jenozKcsharePLED17F32AD9753930', 'BaW_jenozKc')
         assertExtractId('BaW_jenozKc', 'BaW_jenozKc')
 
+    def test_nsig_function_cache(self):
+        player_url = 'https://www.youtube.com/s/player/0123abcd/player_ias.vflset/en_US/base.js'
+        player_code = '''
+        var nfn=function(a){var b=a.split("");b.reverse();return b.join("")};
+        c.get("n"))&&(b=nfn(c));
+        '''
+        cachedir = tempfile.mkdtemp()
+        downloads = []
+
+        def get_player_code(ie, video_id, url, player_id=None):
+            downloads.append(url)
+            return player_code
+
+        class TestIE(YoutubeIE):
+            _player_func_cache = {}
+            _player_func_lru = []
+            _get_player_code = get_player_code
+
+        try:
+            for _ in range(2):
+                ie = TestIE(FakeYDL({'cachedir': cachedir}))
+                self.assertEqual(ie._n_descramble('abc', player_url, 'x'), 'cba')
+            # Compiled once for the whole process
+            self.assertEqual(len(downloads), 1)
+            ie = TestIE(FakeYDL({'cachedir': cachedir}))
+            cache = ie._downloader.cache
+            self.assertTrue(cache.load('youtube-nsig', '0123abcd'))
+            self.assertTrue(cache.load('youtube-nsig-splits', '0123abcd'))
+
+            # A new process only loads the cached code and splits
+            TestIE._player_func_cache.clear()
+            del TestIE._player_func_lru[:]
+            self.assertEqual(ie._n_descramble('def', player_url, 'x'), 'fed')
+            self.assertEqual(len(downloads), 1)
+        finally:
+            shutil.rmtree(cachedir)
+
+    def test_player_func_cache_size(self):
+        class TestIE(YoutubeIE):
+            _PLAYER_FUNC_CACHE_SIZE = 2
+            _player_func_cache = {}
+            _player_func_lru = []
+
+        for key in ('a', 'b', 'a', 'c'):
+            TestIE._cached_player_func(key, lambda: key)
+        self.assertEqual(sorted(TestIE._player_func_cache), ['a', 'c'])
+
 
 if __name__ == '__main__':
     unittest.main()
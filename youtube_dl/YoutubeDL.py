@@ -9,6 +9,7 @@ import copy
 import datetime
 import errno
 import fileinput
+import functools
 import io
 import itertools
 import json
@@ -21,6 +22,7 @@ import shutil
 import subprocess
 import socket
 import sys
+import threading
 import time
 import tokenize
 import traceback
@@ -51,6 +53,8 @@ from .utils import (
     DEFAULT_OUTTMPL, # %(title)s-%(id)s.%(ext)s 정규식
     determine_ext, # 확장자 반환
     determine_protocol, # # url의 통신 프로토콜 반환
+    DownloadArchive,
+    DownloadCancelled,
     DownloadError, # youtube_dl 다운로드 중 에러 발생시 예외
     encode_compat_str, # compat_str 인코딩
     encodeFilename, # 파일 이름을 반환 
@@ -60,9 +64,9 @@ from .utils import (
     format_bytes, # 
     formatSeconds, # 시간 단위 출력 
     GeoRestrictedError, # 이용자가 이용자의 국가에서 허가되지 않는 사이트를 추출하려 할때 발생하는 예외
+    HTTPConnectionPool,
     int_or_none, # 이름 그대로 
     ISO3166Utils, # {kr : korean} 처럼 국가 이름과 iso명의 디렉토리 
-    locked_file, # 
     make_HTTPS_handler, # https 핸들러를 만듦
     MaxDownloadsReached, # 다운로드를 최대한 하면 발생하는 예외
     orderedSet, # 입력 가능한 항목에서 모든 중복 항목 제거하는 메소드 
@@ -88,6 +92,7 @@ from .utils import (
     UnavailableVideoError, # 이용 불가한 영상을 추출할때 발생
     url_basename,  # url의 마지막 부분
     version_tuple, # 버전 튜플
+    write_file_atomically,
     write_json_file, # json 파일을 쓰도록 함 
     write_string, # 파일에 s나 out을 적는다
     YoutubeDLCookieJar, # 쿠키를 저장, 로드하는 클래스 
@@ -96,18 +101,19 @@ from .utils import (
     YoutubeDLRedirectHandler, # https 재응답 클래스
 )
 from .cache import Cache
-from .extractor import get_info_extractor, gen_extractor_classes, _LAZY_LOADER
-from .extractor.openload import PhantomJSwrapper
 from .downloader import get_suitable_downloader
+from .downloader.progress import ProgressAggregator
 from .downloader.rtmp import rtmpdump_version
 from .postprocessor import (
     FFmpegFixupM3u8PP,
     FFmpegFixupM4aPP,
     FFmpegFixupStretchedPP,
+    FFmpegFusedPP,
     FFmpegMergerPP,
     FFmpegPostProcessor,
     get_postprocessor,
 )
+from .postprocessor.pipeline import PostProcessingPipeline
 from .version import __version__
 
 if compat_os_name == 'nt':
@@ -174,6 +180,17 @@ class YoutubeDL(object):
     playlist_items:    Specific indices of playlist to download.
     playlistreverse:   Download playlist items in reverse order.
     playlistrandom:    Download playlist items in random order.
+    lazy_playlist:     Process playlist entries as they are received from the
+                       extractor instead of collecting all of them first.
+                       playlistreverse and playlistrandom disable it for
+                       playlists that are not lists.
+    concurrent_playlist_entries: Number of playlist entries to process
+                       (extract and download) at the same time.
+    sidecar_downloads: Number of threads downloading the subtitles and the
+                       thumbnails during the media download (default is 4),
+                       0 to download them one after the other first.
+    concurrent_formats: Download the formats of a video to be merged (e.g.
+                       bestvideo+bestaudio) at the same time, True by default.
     matchtitle:        Download only matching titles.
     rejecttitle:       Reject downloads for matching titles.
     logger:            Log messages to a logging.Logger instance.
@@ -218,6 +235,12 @@ class YoutubeDL(object):
     geo_verification_proxy:  URL of the proxy to use for IP address verification
                        on geo-restricted sites.
     socket_timeout:    Time to wait for unresponsive hosts, in seconds
+    http_keepalive:    Keep HTTP(S) connections alive and reuse them for
+                       further requests to the same host (default True)
+    keepalive_max_per_host: Maximum number of idle connections kept per
+                       host (default 6)
+    keepalive_idle_timeout: Seconds after which an idle connection is
+                       closed instead of reused (default 30)
     bidi_workaround:   Work around buggy terminals without bidirectional text
                        support, using fridibi
     debug_printtraffic:Print out sent and received HTTP traffic
@@ -257,6 +280,10 @@ class YoutubeDL(object):
 
                        Progress hooks are guaranteed to be called at least once
                        (with status "finished") if the download is successful.
+    progress_interval: Minimum number of seconds between two renderings of
+                       the progress of the downloads (default 0.1)
+    progress_json:     File to write the progress hook statuses to as JSON
+                       lines, "-" for stdout
     merge_output_format: Extension to use when merging formats.
     fixup:             Automatically correct known faults of the file.
                        One of:
@@ -301,17 +328,31 @@ class YoutubeDL(object):
     hls_prefer_native: Use the native HLS downloader instead of ffmpeg/avconv
                        if True, otherwise use ffmpeg/avconv if False, otherwise
                        use downloader suggested by extractor if None.
+    async_engine:      Download over HTTP, DASH and native HLS with coroutines
+                       multiplexed on a single asyncio event loop instead of
+                       threads (python >= 3.5, not through a proxy).
 
     The following parameters are not used by YoutubeDL itself, they are used by
     the downloader (see youtube_dl/downloader/common.py):
-    nopart, updatetime, buffersize, ratelimit, min_filesize, max_filesize, test,
-    noresizebuffer, retries, continuedl, noprogress, consoletitle,
+    nopart, updatetime, buffersize, ratelimit, ratelimit_per_host, min_filesize,
+    max_filesize, test, noresizebuffer, retries, continuedl, noprogress, consoletitle,
     xattr_set_filesize, external_downloader_args, hls_use_mpegts,
-    http_chunk_size.
+    http_chunk_size, concurrent_fragment_downloads, http_connections.
 
     The following options are used by the post processors:
     prefer_ffmpeg:     If False, use avconv instead of ffmpeg if both are available,
                        otherwise prefer ffmpeg.
+    postprocess_workers: Number of threads post-processing the finished
+                       downloads while the next ones are downloaded (the
+                       download archive is updated once a video is
+                       post-processed), 0 (default) to post-process each
+                       download before starting the next one. max_downloads
+                       still counts the videos once downloaded, not once
+                       post-processed.
+    native_merge:      Merge fragmented MP4 formats without ffmpeg when
+                       possible, True by default.
+    fuse_postprocessors: Run consecutive ffmpeg based postprocessors with a
+                       single ffmpeg command when possible, True by default.
     ffmpeg_location:   Location of the ffmpeg/avconv binary; either the path
                        to the binary or its containing directory.
     postprocessor_args: A list of additional command-line arguments for the
@@ -340,9 +381,10 @@ class YoutubeDL(object):
     _pps = []
     _download_retcode = None
     _num_downloads = None
-    _playlist_level = 0
     _playlist_urls = set()
     _screen_file = None
+    _download_archive = None
+    _ie_dispatch_index = None
 
     def __init__(self, params=None, auto_init=True):
         """Create a FileDownloader object with the given options."""
@@ -354,6 +396,15 @@ class YoutubeDL(object):
         self._progress_hooks = []
         self._download_retcode = 0
         self._num_downloads = 0
+        self._num_downloads_lock = threading.Lock()
+        self._pp_pipeline = None
+        # Archive IDs of the downloads waiting for their post-processing
+        self._queued_archive_ids = set()
+        # The playlist nesting level is tracked per thread since the entries
+        # of a playlist may be processed concurrently
+        self._playlist_state = threading.local()
+        self._playlist_urls = set()
+        self._playlist_urls_lock = threading.Lock()
         self._screen_file = [sys.stdout, sys.stderr][params.get('logtostderr', False)]
         self._err_file = sys.stderr
         self.params = {
@@ -362,6 +413,9 @@ class YoutubeDL(object):
         }
         self.params.update(params)
         self.cache = Cache(self)
+        self.progress_aggregator = ProgressAggregator(self)
+        if self.params.get('postprocess_workers'):
+            self._pp_pipeline = PostProcessingPipeline(self.params['postprocess_workers'])
 
         def check_deprecated(param, option, suggestion): # param의 아이템이 없으면 다른 옵션을 사용하라는 경고를 띄움
             if self.params.get(param) is not None:
@@ -438,6 +492,14 @@ class YoutubeDL(object):
 
         register_socks_protocols()
 
+    @property
+    def _playlist_level(self):
+        return getattr(self._playlist_state, 'level', 0)
+
+    @_playlist_level.setter
+    def _playlist_level(self, level):
+        self._playlist_state.level = level
+
     def warn_if_short_id(self, argv): # id가 짧으면 경고
         # short YouTube ID starting with dash?
         idxs = [
@@ -469,14 +531,28 @@ class YoutubeDL(object):
         """
         ie = self._ies_instances.get(ie_key) 
         if ie is None:
-            ie = get_info_extractor(ie_key)()  
+            from .extractor import get_info_extractor
+            ie = get_info_extractor(ie_key)()
             self.add_info_extractor(ie)
         return ie
 
+    def _candidate_ies(self, url):
+        """
+        Return the extractors that may be suitable for url, in the order
+        they were added
+        """
+        if self._ie_dispatch_index is None:
+            from .extractor.dispatch import ExtractorDispatchIndex
+            self._ie_dispatch_index = ExtractorDispatchIndex()
+        # Extractors may have been added since the last call
+        self._ie_dispatch_index.update(self._ies)
+        return self._ie_dispatch_index.candidates(url)
+
     def add_default_info_extractors(self):
         """
         Add the InfoExtractors returned by gen_extractors to the end of the list
         """
+        from .extractor import gen_extractor_classes
         for ie in gen_extractor_classes():
             self.add_info_extractor(ie)
 
@@ -564,7 +640,23 @@ class YoutubeDL(object):
         return self
 
     def __exit__(self, *args):
+        try:
+            self.wait_for_post_processing()
+        except DownloadError:
+            # Already reported
+            pass
+        if self._pp_pipeline is not None:
+            self._pp_pipeline.close()
         self.restore_console_title()
+        self.progress_aggregator.close()
+
+        connection_pool = getattr(self, '_connection_pool', None)
+        if connection_pool is not None:
+            if self.params.get('verbose'):
+                self._write_string(
+                    '[debug] HTTP connections: %(opened)d opened, %(reused)d reused, '
+                    '%(expired)d expired\n' % connection_pool.stats)
+            connection_pool.close()
 
         if self.params.get('cookiefile') is not None:
             self.cookiejar.save(ignore_discard=True, ignore_expires=True)
@@ -795,7 +887,7 @@ class YoutubeDL(object):
         if ie_key:
             ies = [self.get_info_extractor(ie_key)] # ie 값 저장
         else:
-            ies = self._ies
+            ies = self._candidate_ies(url)
 
         for ie in ies:
             if not ie.suitable(url):
@@ -922,20 +1014,23 @@ class YoutubeDL(object):
             # Protect from infinite recursion due to recursively nested playlists
             # (see https://github.com/ytdl-org/youtube-dl/issues/27833)
             webpage_url = ie_result['webpage_url']
-            if webpage_url in self._playlist_urls:
+            with self._playlist_urls_lock:
+                seen = webpage_url in self._playlist_urls
+                self._playlist_urls.add(webpage_url)
+            if seen:
                 self.to_screen(
                     '[download] Skipping already downloaded playlist: %s'
                     % ie_result.get('title') or ie_result.get('id'))
                 return
 
             self._playlist_level += 1
-            self._playlist_urls.add(webpage_url)
             try:
                 return self.__process_playlist(ie_result, download)
             finally:
                 self._playlist_level -= 1
                 if not self._playlist_level:
-                    self._playlist_urls.clear()
+                    with self._playlist_urls_lock:
+                        self._playlist_urls.clear()
         elif result_type == 'compat_list':
             self.report_warning(
                 'Extractor %s returned a compat_list result. '
@@ -995,53 +1090,112 @@ class YoutubeDL(object):
                 list_ie_entries[i - 1] for i in playlistitems
                 if -num_entries <= i - 1 < num_entries]
 
+        def iter_playlistitems_entries(ie_entries):
+            # Yield (index, entry) in the order of playlistitems while only
+            # keeping entries that come too early in memory
+            items = collections.deque(playlistitems)
+            wanted = set(playlistitems)
+            last_item = max(playlistitems)
+            pending = {}
+            for i, entry in enumerate(ie_entries, 1):
+                if i in wanted:
+                    pending[i] = entry
+                while items and items[0] in pending:
+                    item = items.popleft()
+                    yield item, pending.pop(item)
+                if i >= last_item:
+                    break
+            # Items beyond the end of the playlist are skipped
+            for item in items:
+                if item in pending:
+                    yield item, pending.pop(item)
+
         def report_download(num_entries):
             self.to_screen(
                 '[%s] playlist %s: Downloading %d videos' %
                 (ie_result['extractor'], playlist, num_entries))
 
-        if isinstance(ie_entries, list):
-            n_all_entries = len(ie_entries)
-            if playlistitems:
-                entries = make_playlistitems_entries(ie_entries)
-            else:
-                entries = ie_entries[playliststart:playlistend]
-            n_entries = len(entries)
+        lazy = (
+            self.params.get('lazy_playlist', False)
+            and not isinstance(ie_entries, list))
+        if lazy and (self.params.get('playlistreverse', False)
+                     or self.params.get('playlistrandom', False)):
+            self.report_warning(
+                'Playlist entries can only be reordered when all of them are '
+                'known; not streaming the playlist')
+            lazy = False
+
+        if lazy:
+            # Entries are pulled one by one as they are processed, so the
+            # number of entries is not known in advance
+            n_entries = None
             self.to_screen(
-                '[%s] playlist %s: Collected %d video ids (downloading %d of them)' %
-                (ie_result['extractor'], playlist, n_all_entries, n_entries))
-        elif isinstance(ie_entries, PagedList):
-            if playlistitems:
-                entries = []
-                for item in playlistitems:
-                    entries.extend(ie_entries.getslice(
-                        item - 1, item
-                    ))
-            else:
-                entries = ie_entries.getslice(
-                    playliststart, playlistend)
-            n_entries = len(entries)
-            report_download(n_entries)
-        else:  # iterable
-            if playlistitems:
-                entries = make_playlistitems_entries(list(itertools.islice(
-                    ie_entries, 0, max(playlistitems))))
-            else:
-                entries = list(itertools.islice(
-                    ie_entries, playliststart, playlistend))
-            n_entries = len(entries)
-            report_download(n_entries)
+                '[%s] playlist %s: Streaming video ids' % (ie_result['extractor'], playlist))
+            if isinstance(ie_entries, PagedList):
+                if playlistitems:
+                    entries = (
+                        (item, entry) for item in playlistitems
+                        for entry in ie_entries.getslice(item - 1, item))
+                else:
+                    entries = enumerate(
+                        ie_entries.iterslice(playliststart, playlistend),
+                        playliststart + 1)
+            else:  # iterable
+                if playlistitems:
+                    entries = iter_playlistitems_entries(ie_entries)
+                else:
+                    entries = enumerate(itertools.islice(
+                        ie_entries, playliststart, playlistend), playliststart + 1)
+        else:
+            if isinstance(ie_entries, list):
+                n_all_entries = len(ie_entries)
+                if playlistitems:
+                    entries = make_playlistitems_entries(ie_entries)
+                else:
+                    entries = ie_entries[playliststart:playlistend]
+                n_entries = len(entries)
+                self.to_screen(
+                    '[%s] playlist %s: Collected %d video ids (downloading %d of them)' %
+                    (ie_result['extractor'], playlist, n_all_entries, n_entries))
+            elif isinstance(ie_entries, PagedList):
+                if playlistitems:
+                    entries = []
+                    for item in playlistitems:
+                        entries.extend(ie_entries.getslice(
+                            item - 1, item
+                        ))
+                else:
+                    entries = ie_entries.getslice(
+                        playliststart, playlistend)
+                n_entries = len(entries)
+                report_download(n_entries)
+            else:  # iterable
+                if playlistitems:
+                    entries = make_playlistitems_entries(list(itertools.islice(
+                        ie_entries, 0, max(playlistitems))))
+                else:
+                    entries = list(itertools.islice(
+                        ie_entries, playliststart, playlistend))
+                n_entries = len(entries)
+                report_download(n_entries)
+
+            if self.params.get('playlistreverse', False):
+                entries = entries[::-1]
 
-        if self.params.get('playlistreverse', False):
-            entries = entries[::-1]
+            if self.params.get('playlistrandom', False):
+                random.shuffle(entries)
 
-        if self.params.get('playlistrandom', False):
-            random.shuffle(entries)
+            entries = (
+                (playlistitems[i - 1] if playlistitems else i + playliststart, entry)
+                for i, entry in enumerate(entries, 1))
 
         x_forwarded_for = ie_result.get('__x_forwarded_for_ip')
 
-        for i, entry in enumerate(entries, 1):
-            self.to_screen('[download] Downloading video %s of %s' % (i, n_entries))
+        def process_entry(i, playlist_index, entry):
+            if n_entries is None:
+                self.to_screen('[download] Downloading video %s' % i)
+            else:
+                self.to_screen('[download] Downloading video %s of %s' % (i, n_entries))
             # This __x_forwarded_for_ip thing is a bit ugly but requires
             # minimal changes
             if x_forwarded_for:
@@ -1053,7 +1207,7 @@ class YoutubeDL(object):
                 'playlist_title': ie_result.get('title'),
                 'playlist_uploader': ie_result.get('uploader'),
                 'playlist_uploader_id': ie_result.get('uploader_id'),
-                'playlist_index': playlistitems[i - 1] if playlistitems else i + playliststart,
+                'playlist_index': playlist_index,
                 'extractor': ie_result['extractor'],
                 'webpage_url': ie_result['webpage_url'],
                 'webpage_url_basename': url_basename(ie_result['webpage_url']),
@@ -1063,15 +1217,89 @@ class YoutubeDL(object):
             reason = self._match_entry(entry, incomplete=True)
             if reason is not None:
                 self.to_screen('[download] ' + reason)
-                continue
+                return []
 
-            entry_result = self.__process_iterable_entry(entry, download, extra)
             # TODO: skip failed (empty) entries?
-            playlist_results.append(entry_result)
+            return [self.__process_iterable_entry(entry, download, extra)]
+
+        max_workers = int_or_none(self.params.get('concurrent_playlist_entries')) or 1
+        # Only entries of the outermost playlist are processed concurrently,
+        # nested playlists are processed serially by the worker handling them
+        if max_workers > 1 and n_entries != 1 and self._playlist_level == 1:
+            entries_results = self.__process_entries_concurrently(
+                process_entry, entries, max_workers)
+        else:
+            entries_results = (
+                process_entry(i, playlist_index, entry)
+                for i, (playlist_index, entry) in enumerate(entries, 1))
+        for entry_results in entries_results:
+            playlist_results.extend(entry_results)
         ie_result['entries'] = playlist_results
         self.to_screen('[download] Finished downloading playlist: %s' % playlist)
         return ie_result
 
+    def __process_entries_concurrently(self, process_entry, entries, max_workers):
+        # entries is an iterator of (playlist_index, entry) which may pull
+        # entries lazily from the extractor, so it is only advanced under the lock
+        entries = iter(entries)
+        playlist_level = self._playlist_level
+        lock = threading.Lock()
+        results = {}
+        errors = {}
+        state = {
+            'next_scheduled': 0,
+            'abort': False,
+        }
+
+        def worker():
+            # Entries of nested playlists are processed by this thread
+            self._playlist_level = playlist_level
+            while True:
+                with lock:
+                    if state['abort']:
+                        return
+                    pos = state['next_scheduled']
+                    try:
+                        playlist_index, entry = next(entries)
+                    except StopIteration:
+                        return
+                    except Exception:
+                        errors[pos] = sys.exc_info()
+                        state['abort'] = True
+                        return
+                    state['next_scheduled'] += 1
+                try:
+                    result = process_entry(pos + 1, playlist_index, entry)
+                except Exception:
+                    # Do not start any further entries (e.g. after
+                    # MaxDownloadsReached), the ones in progress are finished
+                    with lock:
+                        errors[pos] = sys.exc_info()
+                        state['abort'] = True
+                    return
+                with lock:
+                    results[pos] = result
+
+        threads = [threading.Thread(target=worker) for _ in range(max_workers)]
+        for t in threads:
+            t.daemon = True
+            t.start()
+
+        try:
+            for t in threads:
+                while t.is_alive():
+                    # Join with a timeout so that KeyboardInterrupt is
+                    # delivered on python 2 as well
+                    t.join(1)
+        except BaseException:
+            with lock:
+                state['abort'] = True
+            raise
+
+        if errors:
+            raise errors[min(errors)][1]
+        return [results[pos] for pos in sorted(results)]
+
     @__handle_extraction_exceptions
     def __process_iterable_entry(self, entry, download, extra_info):
         return self.process_ie_result(
@@ -1776,7 +2004,15 @@ class YoutubeDL(object):
 
     def process_info(self, info_dict):
         """Process a single resolved IE result."""
+        sidecar_threads = []
+        try:
+            self.__process_info(info_dict, sidecar_threads)
+        finally:
+            # The sidecar downloads are not left behind if the media
+            # download fails
+            self.__wait_for_threads(sidecar_threads)
 
+    def __process_info(self, info_dict, sidecar_threads):
         assert info_dict.get('_type', 'video') == 'video'
 
         max_downloads = int_or_none(self.params.get('max_downloads')) or float('inf')
@@ -1794,9 +2030,13 @@ class YoutubeDL(object):
             self.to_screen('[download] ' + reason)
             return
 
-        self._num_downloads += 1
-
-        info_dict['_filename'] = filename = self.prepare_filename(info_dict)
+        # Playlist entries may be processed concurrently, so the limit is
+        # checked again and the autonumber taken under the lock
+        with self._num_downloads_lock:
+            if self._num_downloads >= max_downloads:
+                raise MaxDownloadsReached()
+            self._num_downloads += 1
+            info_dict['_filename'] = filename = self.prepare_filename(info_dict)
 
         # Forced printings
         self.__forced_printings(info_dict, filename, incomplete=False)
@@ -1808,6 +2048,10 @@ class YoutubeDL(object):
         if filename is None:
             return
 
+        if self._pp_pipeline is not None:
+            # Do not start another download after a post-processing failure
+            self._pp_pipeline.raise_error()
+
         def ensure_dir_exists(path):
             try:
                 dn = os.path.dirname(path)
@@ -1855,6 +2099,8 @@ class YoutubeDL(object):
                     self.report_error('Cannot write annotations file: ' + annofn)
                     return
 
+        # The subtitles and the thumbnails are downloaded along with the media
+        sidecar_tasks = []
         subtitles_are_requested = any([self.params.get('writesubtitles', False),
                                        self.params.get('writeautomaticsub')])
 
@@ -1872,23 +2118,16 @@ class YoutubeDL(object):
                     self.to_screen('[info] Writing video subtitles to: ' + sub_filename)
                     if sub_info.get('data') is not None:
                         try:
-                            # Use newline='' to prevent conversion of newline characters
+                            # Write bytes to prevent conversion of newline characters
                             # See https://github.com/ytdl-org/youtube-dl/issues/10268
-                            with io.open(encodeFilename(sub_filename), 'w', encoding='utf-8', newline='') as subfile:
-                                subfile.write(sub_info['data'])
+                            sub_data = sub_info['data'].encode('utf-8')
+                            write_file_atomically(sub_filename, lambda subfile: subfile.write(sub_data))
                         except (OSError, IOError):
                             self.report_error('Cannot write subtitles file ' + sub_filename)
                             return
                     else:
-                        try:
-                            sub_data = ie._request_webpage(
-                                sub_info['url'], info_dict['id'], note=False).read()
-                            with io.open(encodeFilename(sub_filename), 'wb') as subfile:
-                                subfile.write(sub_data)
-                        except (ExtractorError, IOError, OSError, ValueError) as err:
-                            self.report_warning('Unable to download subtitle for "%s": %s' %
-                                                (sub_lang, error_to_compat_str(err)))
-                            continue
+                        sidecar_tasks.append(functools.partial(
+                            self.__download_subtitle, ie, info_dict['id'], sub_lang, sub_info['url'], sub_filename))
 
         if self.params.get('writeinfojson', False):
             infofn = replace_extension(filename, 'info.json', info_dict.get('ext'))
@@ -1902,7 +2141,8 @@ class YoutubeDL(object):
                     self.report_error('Cannot write metadata to JSON file ' + infofn)
                     return
 
-        self._write_thumbnails(info_dict, filename)
+        sidecar_tasks.extend(self._thumbnail_tasks(info_dict, filename))
+        sidecar_threads.extend(self.__start_sidecar_downloads(sidecar_tasks))
 
         if not self.params.get('skip_download', False):
             try:
@@ -1915,10 +2155,14 @@ class YoutubeDL(object):
                                             'ignoring --external-downloader-args.')
                     return dler
 
-                def dl(name, info):
+                def get_fd(info):
                     fd = checked_get_suitable_downloader(info, self.params)(self, self.params)
                     for ph in self._progress_hooks:
                         fd.add_progress_hook(ph)
+                    return fd
+
+                def dl(name, info, fd=None):
+                    fd = fd or get_fd(info)
                     if self.params.get('verbose'):
                         self.to_screen('[debug] Invoking downloader on %r' % info.get('url'))
                     return fd.download(name, info)
@@ -1926,14 +2170,6 @@ class YoutubeDL(object):
                 if info_dict.get('requested_formats') is not None:
                     downloaded = []
                     success = True
-                    merger = FFmpegMergerPP(self)
-                    if not merger.available:
-                        postprocessors = []
-                        self.report_warning('You have requested multiple '
-                                            'formats but ffmpeg or avconv are not installed.'
-                                            ' The formats won\'t be merged.')
-                    else:
-                        postprocessors = [merger]
 
                     def compatible_formats(formats):
                         video, audio = formats
@@ -1960,6 +2196,15 @@ class YoutubeDL(object):
                         info_dict['ext'] = 'mkv'
                         self.report_warning(
                             'Requested formats are incompatible for merge and will be merged into mkv.')
+                    merger = FFmpegMergerPP(self)
+                    if not merger.available and not merger.can_merge_natively(
+                            info_dict['ext'], [f.get('ext') for f in requested_formats]):
+                        postprocessors = []
+                        self.report_warning('You have requested multiple '
+                                            'formats but ffmpeg or avconv are not installed.'
+                                            ' The formats won\'t be merged.')
+                    else:
+                        postprocessors = [merger]
                     # Ensure filename always has a correct extension for successful merge
                     filename = '%s.%s' % (filename_wo_ext, info_dict['ext'])
                     if os.path.exists(encodeFilename(filename)):
@@ -1967,6 +2212,7 @@ class YoutubeDL(object):
                             '[download] %s has already been downloaded and '
                             'merged' % filename)
                     else:
+                        downloads = []
                         for f in requested_formats:
                             new_info = dict(info_dict)
                             new_info.update(f)
@@ -1976,8 +2222,13 @@ class YoutubeDL(object):
                             if not ensure_dir_exists(fname):
                                 return
                             downloaded.append(fname)
-                            partial_success = dl(fname, new_info)
-                            success = success and partial_success
+                            downloads.append((get_fd(new_info), fname, new_info))
+                        if self.params.get('concurrent_formats', True) and len(downloads) > 1:
+                            success = self.__download_concurrently(dl, downloads)
+                        else:
+                            for fd, fname, new_info in downloads:
+                                partial_success = dl(fname, new_info, fd)
+                                success = success and partial_success
                         info_dict['__postprocessors'] = postprocessors
                         info_dict['__files_to_merge'] = downloaded
                 else:
@@ -1992,6 +2243,9 @@ class YoutubeDL(object):
                 self.report_error('content too short (expected %s bytes and served %s)' % (err.expected, err.downloaded))
                 return
 
+            # The postprocessors may need the subtitles and the thumbnails
+            self.__wait_for_threads(sidecar_threads)
+
             if success and filename != '-':
                 # Fixup content
                 fixup_policy = self.params.get('fixup')
@@ -2055,16 +2309,149 @@ class YoutubeDL(object):
                     else:
                         assert fixup_policy in ('ignore', 'never')
 
-                try:
-                    self.post_process(filename, info_dict)
-                except (PostProcessingError) as err:
-                    self.report_error('postprocessing: %s' % error_to_compat_str(err))
+                if self._pp_pipeline is not None:
+                    # The next download starts right away, see wait_for_post_processing()
+                    archive_id = self._make_archive_id(info_dict)
+                    self._queued_archive_ids.add(archive_id)
+                    self._pp_pipeline.submit(
+                        self.__post_process_queued_download, filename, info_dict, archive_id)
+                elif not self.__post_process_download(filename, info_dict):
                     return
-                self.record_download_archive(info_dict)
                 # avoid possible nugatory search for further items (PR #26638)
                 if self._num_downloads >= max_downloads:
+                    # The limit is only reached once the last downloads
+                    # are post-processed
+                    self.wait_for_post_processing()
                     raise MaxDownloadsReached()
 
+    def __download_subtitle(self, ie, video_id, sub_lang, sub_url, sub_filename):
+        try:
+            sub_data = ie._request_webpage(sub_url, video_id, note=False).read()
+            write_file_atomically(sub_filename, lambda subfile: subfile.write(sub_data))
+        except (ExtractorError, IOError, OSError, ValueError) as err:
+            self.report_warning('Unable to download subtitle for "%s": %s' %
+                                (sub_lang, error_to_compat_str(err)))
+
+    def __start_sidecar_downloads(self, tasks):
+        """
+        Start the threads running the sidecar downloads (subtitles,
+        thumbnails) during the media download and return them, the tasks
+        are run right away if sidecar_downloads is 0
+        """
+        workers = int_or_none(self.params.get('sidecar_downloads'))
+        if workers is None:
+            workers = 4
+        if not workers:
+            for task in tasks:
+                task()
+            return []
+
+        tasks = collections.deque(tasks)
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    if not tasks:
+                        return
+                    task = tasks.popleft()
+                task()
+
+        threads = [threading.Thread(target=worker) for _ in range(min(workers, len(tasks)))]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        return threads
+
+    @staticmethod
+    def __wait_for_threads(threads):
+        while threads:
+            t = threads.pop()
+            while t.is_alive():
+                # Join with a timeout so that KeyboardInterrupt is
+                # delivered on python 2 as well
+                t.join(1)
+
+    def __post_process_download(self, filename, info_dict):
+        try:
+            self.post_process(filename, info_dict)
+        except (PostProcessingError) as err:
+            self.report_error('postprocessing: %s' % error_to_compat_str(err))
+            return False
+        self.record_download_archive(info_dict)
+        return True
+
+    def __post_process_queued_download(self, filename, info_dict, archive_id):
+        try:
+            self.__post_process_download(filename, info_dict)
+        finally:
+            # By now the video is in the archive, unless it failed
+            self._queued_archive_ids.discard(archive_id)
+
+    def wait_for_post_processing(self):
+        """
+        Wait for the post-processing of the downloads in pipelined mode
+        (postprocess_workers), raise the error of the first failed one
+        """
+        if self._pp_pipeline is not None:
+            self._pp_pipeline.wait()
+
+    def __download_concurrently(self, dl, downloads):
+        # downloads is a list of (fd, filename, info); when one of them fails
+        # the others are cancelled, their .part files are kept for resuming
+        lock = threading.Lock()
+        results = {}
+        # The failures in the order they happened, the first one cancels
+        # the other downloads which may fail in turn
+        failures = []
+
+        def cancel_others(pos):
+            for other_pos, (fd, _, _) in enumerate(downloads):
+                if other_pos != pos:
+                    fd.cancel()
+
+        def worker(pos, fd, name, info):
+            try:
+                result = dl(name, info, fd)
+            except DownloadCancelled:
+                with lock:
+                    results[pos] = False
+                return
+            except Exception:
+                with lock:
+                    failures.append(sys.exc_info())
+                cancel_others(pos)
+                return
+            with lock:
+                results[pos] = result
+                if not result:
+                    failures.append(None)
+            if not result:
+                cancel_others(pos)
+
+        threads = [
+            threading.Thread(target=worker, args=(pos, ) + download)
+            for pos, download in enumerate(downloads)]
+        for t in threads:
+            t.daemon = True
+            t.start()
+
+        try:
+            for t in threads:
+                while t.is_alive():
+                    # Join with a timeout so that KeyboardInterrupt is
+                    # delivered on python 2 as well
+                    t.join(1)
+        except BaseException:
+            cancel_others(None)
+            raise
+
+        if failures:
+            if failures[0] is not None:
+                raise failures[0][1]
+            return False
+        return all(results.values())
+
     def download(self, url_list):
         """Download a given list of URLs."""
         outtmpl = self.params.get('outtmpl', DEFAULT_OUTTMPL) # 저장 경로 템플릿
@@ -2082,12 +2469,15 @@ class YoutubeDL(object):
             except UnavailableVideoError:
                 self.report_error('unable to download video')
             except MaxDownloadsReached:
+                # The limit is reached once the last downloads are post-processed
+                self.wait_for_post_processing()
                 self.to_screen('[info] Maximum number of downloaded files reached.')
                 raise
             else:
                 if self.params.get('dump_single_json', False):
                     self.to_stdout(json.dumps(res))
 
+        self.wait_for_post_processing()
         return self._download_retcode
 
     def download_with_info_file(self, info_filename):
@@ -2101,6 +2491,7 @@ class YoutubeDL(object):
             # 새 딕셔너리에 저장하고 반환
         try:
             self.process_ie_result(info, download=True) # info를 토대로 다운로드를 진행한다
+            self.wait_for_post_processing()
         except DownloadError: # 오류 발생시 딕셔너리를 통해 url을 얻고 url download를 진행
             webpage_url = info.get('webpage_url')
             if webpage_url is not None:
@@ -2124,6 +2515,8 @@ class YoutubeDL(object):
         if ie_info.get('__postprocessors') is not None:
             pps_chain.extend(ie_info['__postprocessors'])
         pps_chain.extend(self._pps)
+        if self.params.get('fuse_postprocessors', True):
+            pps_chain = FFmpegFusedPP.fuse(self, pps_chain)
         for pp in pps_chain:
             files_to_delete = []
             try:
@@ -2150,7 +2543,7 @@ class YoutubeDL(object):
             if not url:
                 return
             # Try to find matching extractor for the URL and take its ie_key
-            for ie in self._ies:
+            for ie in self._candidate_ies(url):
                 if ie.suitable(url):
                     extractor = ie.ie_key()
                     break
@@ -2158,33 +2551,32 @@ class YoutubeDL(object):
                 return
         return extractor.lower() + ' ' + video_id
 
-    def in_download_archive(self, info_dict):
+    def _get_download_archive(self):
         fn = self.params.get('download_archive')
         if fn is None:
+            return None
+        if self._download_archive is None or self._download_archive.filename != fn:
+            self._download_archive = DownloadArchive(fn)
+        return self._download_archive
+
+    def in_download_archive(self, info_dict):
+        archive = self._get_download_archive()
+        if archive is None:
             return False
 
         vid_id = self._make_archive_id(info_dict)
         if not vid_id:
             return False  # Incomplete video information
 
-        try:
-            with locked_file(fn, 'r', encoding='utf-8') as archive_file:
-                for line in archive_file:
-                    if line.strip() == vid_id:
-                        return True
-        except IOError as ioe:
-            if ioe.errno != errno.ENOENT:
-                raise
-        return False
+        return vid_id in archive or vid_id in self._queued_archive_ids
 
     def record_download_archive(self, info_dict):
-        fn = self.params.get('download_archive')
-        if fn is None:
+        archive = self._get_download_archive()
+        if archive is None:
             return
         vid_id = self._make_archive_id(info_dict)
         assert vid_id
-        with locked_file(fn, 'a', encoding='utf-8') as archive_file:
-            archive_file.write(vid_id + '\n')
+        archive.add(vid_id)
 
     @staticmethod
     def format_resolution(format, default='unknown'):
@@ -2321,6 +2713,10 @@ class YoutubeDL(object):
                 self.get_encoding()))
         write_string(encoding_str, encoding=None)
 
+        # Extractors are only imported once they are needed
+        from .extractor import _LAZY_LOADER
+        from .extractor.openload import PhantomJSwrapper
+
         self._write_string('[debug] youtube-dl version ' + __version__ + '\n')
         if _LAZY_LOADER:
             self._write_string('[debug] Lazy loading extractors enabled' + '\n')
@@ -2406,9 +2802,17 @@ class YoutubeDL(object):
                 proxies['https'] = proxies['http']
         proxy_handler = PerRequestProxyHandler(proxies)
 
+        self._connection_pool = None
+        if self.params.get('http_keepalive', True):
+            self._connection_pool = HTTPConnectionPool(
+                max_per_host=self.params.get('keepalive_max_per_host', 6),
+                idle_timeout=self.params.get('keepalive_idle_timeout', 30))
+
         debuglevel = 1 if self.params.get('debug_printtraffic') else 0
-        https_handler = make_HTTPS_handler(self.params, debuglevel=debuglevel)
-        ydlh = YoutubeDLHandler(self.params, debuglevel=debuglevel)
+        https_handler = make_HTTPS_handler(
+            self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
+        ydlh = YoutubeDLHandler(
+            self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
         redirect_handler = YoutubeDLRedirectHandler()
         data_handler = compat_urllib_request_DataHandler()
 
@@ -2448,6 +2852,11 @@ class YoutubeDL(object):
         return encoding
 
     def _write_thumbnails(self, info_dict, filename):
+        for task in self._thumbnail_tasks(info_dict, filename):
+            task()
+
+    def _thumbnail_tasks(self, info_dict, filename):
+        """Return the functions downloading the requested thumbnails"""
         if self.params.get('writethumbnail', False):
             thumbnails = info_dict.get('thumbnails')
             if thumbnails:
@@ -2455,12 +2864,13 @@ class YoutubeDL(object):
         elif self.params.get('write_all_thumbnails', False):
             thumbnails = info_dict.get('thumbnails')
         else:
-            return
+            return []
 
         if not thumbnails:
             # No thumbnails present, so return immediately
-            return
+            return []
 
+        tasks = []
         for t in thumbnails:
             thumb_ext = determine_ext(t['url'], 'jpg')
             suffix = '_%s' % t['id'] if len(thumbnails) > 1 else ''
@@ -2471,14 +2881,18 @@ class YoutubeDL(object):
                 self.to_screen('[%s] %s: Thumbnail %sis already present' %
                                (info_dict['extractor'], info_dict['id'], thumb_display_id))
             else:
-                self.to_screen('[%s] %s: Downloading thumbnail %s...' %
-                               (info_dict['extractor'], info_dict['id'], thumb_display_id))
-                try:
-                    uf = self.urlopen(t['url'])
-                    with open(encodeFilename(thumb_filename), 'wb') as thumbf:
-                        shutil.copyfileobj(uf, thumbf)
-                    self.to_screen('[%s] %s: Writing thumbnail %sto: %s' %
-                                   (info_dict['extractor'], info_dict['id'], thumb_display_id, thumb_filename))
-                except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error) as err:
-                    self.report_warning('Unable to download thumbnail "%s": %s' %
-                                        (t['url'], error_to_compat_str(err)))
+                tasks.append(functools.partial(
+                    self.__download_thumbnail, info_dict, t['url'], thumb_filename, thumb_display_id))
+        return tasks
+
+    def __download_thumbnail(self, info_dict, thumb_url, thumb_filename, thumb_display_id):
+        self.to_screen('[%s] %s: Downloading thumbnail %s...' %
+                       (info_dict['extractor'], info_dict['id'], thumb_display_id))
+        try:
+            uf = self.urlopen(thumb_url)
+            write_file_atomically(thumb_filename, lambda thumbf: shutil.copyfileobj(uf, thumbf))
+            self.to_screen('[%s] %s: Writing thumbnail %sto: %s' %
+                           (info_dict['extractor'], info_dict['id'], thumb_display_id, thumb_filename))
+        except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error) as err:
+            self.report_warning('Unable to download thumbnail "%s": %s' %
+                                (thumb_url, error_to_compat_str(err)))
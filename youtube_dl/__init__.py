@@ -9,6 +9,7 @@ import codecs
 import io
 import os
 import random
+import socket
 import sys
 
 
@@ -40,11 +41,21 @@ from .update import update_self
 from .downloader import (
     FileDownloader,
 )
-from .extractor import gen_extractors, list_extractors
-from .extractor.adobepass import MSO_INFO
 from .YoutubeDL import YoutubeDL
 
 
+# The extractors are only imported when they are needed so that e.g.
+# --version does not have to load all of them
+def gen_extractors():
+    from .extractor import gen_extractors
+    return gen_extractors()
+
+
+def list_extractors(age_limit):
+    from .extractor import list_extractors
+    return list_extractors(age_limit)
+
+
 def _real_main(argv=None):
     # Compatibility fixes for Windows
     if sys.platform == 'win32':
@@ -121,6 +132,7 @@ def _real_main(argv=None):
             write_string(desc + '\n', out=sys.stdout)
         sys.exit(0)
     if opts.ap_list_mso:
+        from .extractor.adobepass import MSO_INFO
         table = [[mso_id, mso_info['name']] for mso_id, mso_info in MSO_INFO.items()]
         write_string('Supported TV Providers:\n' + render_table(['mso', 'mso name'], table) + '\n', out=sys.stdout)
         sys.exit(0)
@@ -151,6 +163,11 @@ def _real_main(argv=None):
         if numeric_limit is None:
             parser.error('invalid rate limit specified')
         opts.ratelimit = numeric_limit
+    if opts.ratelimit_per_host is not None:
+        numeric_limit = FileDownloader.parse_bytes(opts.ratelimit_per_host)
+        if numeric_limit is None:
+            parser.error('invalid rate limit per host specified')
+        opts.ratelimit_per_host = numeric_limit
     if opts.min_filesize is not None:
         numeric_limit = FileDownloader.parse_bytes(opts.min_filesize)
         if numeric_limit is None:
@@ -161,6 +178,8 @@ def _real_main(argv=None):
         if numeric_limit is None:
             parser.error('invalid max_filesize specified')
         opts.max_filesize = numeric_limit
+    if opts.progress_interval is not None and opts.progress_interval < 0:
+        parser.error('progress interval must be positive or 0')
     if opts.sleep_interval is not None:
         if opts.sleep_interval < 0:
             parser.error('sleep interval must be positive or 0')
@@ -173,6 +192,8 @@ def _real_main(argv=None):
             parser.error('max sleep interval must be greater than or equal to min sleep interval')
     else:
         opts.max_sleep_interval = opts.sleep_interval
+    if opts.ap_mso:
+        from .extractor.adobepass import MSO_INFO
     if opts.ap_mso and opts.ap_mso not in MSO_INFO:
         parser.error('Unsupported TV Provider, use --ap-list-mso to get a list of supported TV Providers')
 
@@ -189,6 +210,25 @@ def _real_main(argv=None):
         opts.retries = parse_retries(opts.retries)
     if opts.fragment_retries is not None:
         opts.fragment_retries = parse_retries(opts.fragment_retries)
+    if opts.concurrent_fragment_downloads <= 0:
+        parser.error('concurrent fragments must be positive')
+    if opts.http_connections <= 0:
+        parser.error('http connections must be positive')
+    if opts.concurrent_playlist_entries <= 0:
+        parser.error('concurrent playlist entries must be positive')
+    if opts.postprocess_workers < 0:
+        parser.error('postprocess workers must be positive or 0')
+    if opts.sidecar_downloads < 0:
+        parser.error('sidecar downloads must be positive or 0')
+    if opts.service_workers <= 0:
+        parser.error('service workers must be positive')
+    if opts.service is not None:
+        if opts.service == '-' and opts.batchfile == '-':
+            parser.error('the batch file and the service cannot both read stdin')
+        if opts.service.startswith('unix:') and not hasattr(socket, 'AF_UNIX'):
+            parser.error('unix sockets are not supported on this platform')
+        if opts.load_info_filename is not None:
+            parser.error('loading info JSON files conflicts with the service mode')
     if opts.buffersize is not None:
         numeric_buffersize = FileDownloader.parse_bytes(opts.buffersize)
         if numeric_buffersize is None:
@@ -372,21 +412,31 @@ def _real_main(argv=None):
         'ignoreerrors': opts.ignoreerrors,
         'force_generic_extractor': opts.force_generic_extractor,
         'ratelimit': opts.ratelimit,
+        'ratelimit_per_host': opts.ratelimit_per_host,
         'nooverwrites': opts.nooverwrites,
         'retries': opts.retries,
         'fragment_retries': opts.fragment_retries,
         'skip_unavailable_fragments': opts.skip_unavailable_fragments,
         'keep_fragments': opts.keep_fragments,
+        'concurrent_fragment_downloads': opts.concurrent_fragment_downloads,
+        'http_connections': opts.http_connections,
+        'async_engine': opts.async_engine,
         'buffersize': opts.buffersize,
         'noresizebuffer': opts.noresizebuffer,
         'http_chunk_size': opts.http_chunk_size,
         'continuedl': opts.continue_dl,
         'noprogress': opts.noprogress,
         'progress_with_newline': opts.progress_with_newline,
+        'progress_interval': opts.progress_interval,
+        'progress_json': opts.progress_json,
         'playliststart': opts.playliststart,
         'playlistend': opts.playlistend,
         'playlistreverse': opts.playlist_reverse,
         'playlistrandom': opts.playlist_random,
+        'lazy_playlist': opts.lazy_playlist,
+        'concurrent_playlist_entries': opts.concurrent_playlist_entries,
+        'sidecar_downloads': opts.sidecar_downloads,
+        'concurrent_formats': opts.concurrent_formats,
         'noplaylist': opts.noplaylist,
         'logtostderr': opts.outtmpl == '-',
         'consoletitle': opts.consoletitle,
@@ -426,6 +476,7 @@ def _real_main(argv=None):
         'prefer_insecure': opts.prefer_insecure,
         'proxy': opts.proxy,
         'socket_timeout': opts.socket_timeout,
+        'http_keepalive': opts.http_keepalive,
         'bidi_workaround': opts.bidi_workaround,
         'debug_printtraffic': opts.debug_printtraffic,
         'prefer_ffmpeg': opts.prefer_ffmpeg,
@@ -449,6 +500,9 @@ def _real_main(argv=None):
         'match_filter': match_filter,
         'no_color': opts.no_color,
         'ffmpeg_location': opts.ffmpeg_location,
+        'postprocess_workers': opts.postprocess_workers,
+        'native_merge': opts.native_merge,
+        'fuse_postprocessors': opts.fuse_postprocessors,
         'hls_prefer_native': opts.hls_prefer_native,
         'hls_use_mpegts': opts.hls_use_mpegts,
         'external_downloader_args': external_downloader_args,
@@ -464,6 +518,14 @@ def _real_main(argv=None):
         'usetitle': opts.usetitle if opts.usetitle is True else None,
     }
 
+    if opts.service is not None:
+        from .service import DownloadService
+        if not opts.service.startswith('unix:'):
+            # stdout is for the results
+            ydl_opts['logtostderr'] = True
+        service = DownloadService(ydl_opts, opts.service_workers)
+        sys.exit(service.serve(opts.service, all_urls))
+
     with YoutubeDL(ydl_opts) as ydl:
         # Update version
         if opts.update_self: # 옵션이 업데이트일 경우
@@ -1,8 +1,13 @@
 from __future__ import unicode_literals
 
+import binascii
 from math import ceil
 
-from .compat import compat_b64decode
+from .compat import (
+    compat_b64decode,
+    compat_struct_pack,
+    compat_struct_unpack,
+)
 from .utils import bytes_to_intlist, intlist_to_bytes
 
 BLOCK_SIZE_BYTES = 16
@@ -30,20 +35,14 @@ def aes_ctr_decrypt(data, key, counter):
                                returns the next counter block
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
     block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
+    counter_blocks = []
+    for _ in range(block_count):
+        counter_blocks += counter.next_value()
 
-    decrypted_data = []
-    for i in range(block_count):
-        counter_block = counter.next_value()
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
-
-        cipher_counter_block = aes_encrypt(counter_block, expanded_key)
-        decrypted_data += xor(block, cipher_counter_block)
-    decrypted_data = decrypted_data[:len(data)]
-
-    return decrypted_data
+    keystream = _encrypt_blocks(
+        _bytes_to_words(intlist_to_bytes(counter_blocks)), _round_keys(intlist_to_bytes(key)))
+    return xor(data, bytes_to_intlist(_words_to_bytes(keystream)))
 
 
 def aes_cbc_decrypt(data, key, iv):
@@ -55,21 +54,8 @@ def aes_cbc_decrypt(data, key, iv):
     @param {int[]} iv          16-Byte IV
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
-
-    decrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
-
-        decrypted_block = aes_decrypt(block, expanded_key)
-        decrypted_data += xor(decrypted_block, previous_cipher_block)
-        previous_cipher_block = block
-    decrypted_data = decrypted_data[:len(data)]
-
-    return decrypted_data
+    return bytes_to_intlist(aes_cbc_decrypt_bytes(
+        intlist_to_bytes(data), intlist_to_bytes(key), intlist_to_bytes(iv)))
 
 
 def aes_cbc_encrypt(data, key, iv):
@@ -81,22 +67,8 @@ def aes_cbc_encrypt(data, key, iv):
     @param {int[]} iv          16-Byte IV
     @returns {int[]}           encrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
-
-    encrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block = pkcs7_padding(block)
-        mixed_block = xor(block, previous_cipher_block)
-
-        encrypted_block = aes_encrypt(mixed_block, expanded_key)
-        encrypted_data += encrypted_block
-
-        previous_cipher_block = encrypted_block
-
-    return encrypted_data
+    return bytes_to_intlist(aes_cbc_encrypt_bytes(
+        intlist_to_bytes(data), intlist_to_bytes(key), intlist_to_bytes(iv)))
 
 
 def aes_ecb_encrypt(data, key):
@@ -107,18 +79,66 @@ def aes_ecb_encrypt(data, key):
     @param {int[]} key         16/24/32-Byte cipher key
     @returns {int[]}           encrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
+    remaining_length = -len(data) % BLOCK_SIZE_BYTES
+    data = intlist_to_bytes(data + [remaining_length] * remaining_length)
+    return bytes_to_intlist(_words_to_bytes(_encrypt_blocks(
+        _bytes_to_words(data), _round_keys(intlist_to_bytes(key)))))
 
-    encrypted_data = []
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block = pkcs7_padding(block)
 
-        encrypted_block = aes_encrypt(block, expanded_key)
-        encrypted_data += encrypted_block
+def aes_cbc_decrypt_bytes(data, key, iv):
+    """
+    Decrypt with aes in CBC mode
+
+    @param {bytes} data        cipher
+    @param {bytes} key         16/24/32-Byte cipher key
+    @param {bytes} iv          16-Byte IV
+    @returns {bytes}           decrypted data
+    """
+    data_len = len(data)
+    data = _zero_pad(data)
+    words = _bytes_to_words(data)
+    decrypted = _decrypt_blocks(words, _decryption_round_keys(key))
+    # Every block is xored with the previous cipher block
+    previous = _bytes_to_words(iv) + words[:-4]
+    return _words_to_bytes([x ^ y for x, y in zip(decrypted, previous)])[:data_len]
 
-    return encrypted_data
+
+def aes_cbc_encrypt_bytes(data, key, iv):
+    """
+    Encrypt with aes in CBC mode. Using PKCS#7 padding
+
+    @param {bytes} data        cleartext
+    @param {bytes} key         16/24/32-Byte cipher key
+    @param {bytes} iv          16-Byte IV
+    @returns {bytes}           encrypted data
+    """
+    # Like aes_cbc_encrypt(), only a partial last block is padded
+    remaining_length = -len(data) % BLOCK_SIZE_BYTES
+    data = data + compat_struct_pack('B', remaining_length) * remaining_length
+    return _words_to_bytes(_encrypt_blocks(
+        _bytes_to_words(data), _round_keys(key), _bytes_to_words(iv)))
+
+
+def aes_ctr_decrypt_bytes(data, key, iv):
+    """
+    Decrypt with aes in counter mode, the counter being the whole block
+
+    @param {bytes} data        cipher
+    @param {bytes} key         16/24/32-Byte cipher key
+    @param {bytes} iv          16-Byte initial counter block
+    @returns {bytes}           decrypted data
+    """
+    data_len = len(data)
+    data = _zero_pad(data)
+    # Generate the keystream for all the counter blocks at once
+    counter = int(binascii.hexlify(iv), 16)
+    counter_words = []
+    for i in range(len(data) // BLOCK_SIZE_BYTES):
+        value = (counter + i) & 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF
+        counter_words += (value >> 96, (value >> 64) & 0xFFFFFFFF, (value >> 32) & 0xFFFFFFFF, value & 0xFFFFFFFF)
+    keystream = _encrypt_blocks(counter_words, _round_keys(key))
+    return _words_to_bytes([
+        x ^ y for x, y in zip(_bytes_to_words(data), keystream)])[:data_len]
 
 
 def key_expansion(data):
@@ -391,4 +411,128 @@ def inc(data):
     return data
 
 
-__all__ = ['aes_encrypt', 'key_expansion', 'aes_ctr_decrypt', 'aes_cbc_decrypt', 'aes_decrypt_text']
+# Table driven implementation working on 32-bit big-endian words, a round
+# of a column is four table lookups (see "The Design of Rijndael", 4.2)
+_TABLES = []
+
+
+def _tables():
+    if not _TABLES:
+        def rotations(word):
+            return [((word >> (8 * i)) | (word << (32 - 8 * i))) & 0xFFFFFFFF for i in range(4)]
+
+        te, td = [], []
+        for x in range(256):
+            s, si = SBOX[x], SBOX_INV[x]
+            te.append(rotations(
+                (rijndael_mul(s, 2) << 24) | (s << 16) | (s << 8) | rijndael_mul(s, 3)))
+            td.append(rotations(
+                (rijndael_mul(si, 14) << 24) | (rijndael_mul(si, 9) << 16)
+                | (rijndael_mul(si, 13) << 8) | rijndael_mul(si, 11)))
+        _TABLES.extend(tuple(tuple(w[i] for w in t) for i in range(4)) for t in (te, td))
+    return _TABLES
+
+
+def _zero_pad(data):
+    return data + b'\0' * (-len(data) % BLOCK_SIZE_BYTES)
+
+
+def _bytes_to_words(data):
+    return list(compat_struct_unpack('>%dI' % (len(data) // 4), data))
+
+
+def _words_to_bytes(words):
+    return compat_struct_pack('>%dI' % len(words), *words)
+
+
+def _round_keys(key):
+    return _bytes_to_words(intlist_to_bytes(key_expansion(bytes_to_intlist(key))))
+
+
+def _inverse_round_keys(round_keys):
+    """Round keys of the equivalent inverse cipher, in decryption order"""
+    td0, td1, td2, td3 = _tables()[1]
+    rounds = len(round_keys) // 4 - 1
+    inverse = []
+    for r in range(rounds, -1, -1):
+        words = round_keys[4 * r: 4 * r + 4]
+        if 0 < r < rounds:
+            words = [
+                td0[SBOX[w >> 24]] ^ td1[SBOX[(w >> 16) & 0xFF]]
+                ^ td2[SBOX[(w >> 8) & 0xFF]] ^ td3[SBOX[w & 0xFF]]
+                for w in words]
+        inverse.extend(words)
+    return inverse
+
+
+def _decryption_round_keys(key):
+    return _inverse_round_keys(_round_keys(key))
+
+
+def _encrypt_blocks(words, round_keys, iv=None):
+    """
+    Encrypt the blocks of words (four per block) with the round keys,
+    chaining them in CBC mode if an iv is given
+    """
+    te0, te1, te2, te3 = _tables()[0]
+    sbox = SBOX
+    rounds = len(round_keys) // 4 - 1
+    k0, k1, k2, k3 = round_keys[:4]
+    middle_keys = [round_keys[4 * r: 4 * r + 4] for r in range(1, rounds)]
+    l0, l1, l2, l3 = round_keys[-4:]
+    c0, c1, c2, c3 = iv or (0, 0, 0, 0)
+    out = []
+    for i in range(0, len(words), 4):
+        s0 = words[i] ^ c0 ^ k0
+        s1 = words[i + 1] ^ c1 ^ k1
+        s2 = words[i + 2] ^ c2 ^ k2
+        s3 = words[i + 3] ^ c3 ^ k3
+        for r0, r1, r2, r3 in middle_keys:
+            s0, s1, s2, s3 = (
+                te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xFF] ^ te2[(s2 >> 8) & 0xFF] ^ te3[s3 & 0xFF] ^ r0,
+                te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xFF] ^ te2[(s3 >> 8) & 0xFF] ^ te3[s0 & 0xFF] ^ r1,
+                te0[s2 >> 24] ^ te1[(s3 >> 16) & 0xFF] ^ te2[(s0 >> 8) & 0xFF] ^ te3[s1 & 0xFF] ^ r2,
+                te0[s3 >> 24] ^ te1[(s0 >> 16) & 0xFF] ^ te2[(s1 >> 8) & 0xFF] ^ te3[s2 & 0xFF] ^ r3)
+        block = (
+            ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16) | (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ l0,
+            ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 0xFF] << 16) | (sbox[(s3 >> 8) & 0xFF] << 8) | sbox[s0 & 0xFF]) ^ l1,
+            ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 0xFF] << 16) | (sbox[(s0 >> 8) & 0xFF] << 8) | sbox[s1 & 0xFF]) ^ l2,
+            ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 0xFF] << 16) | (sbox[(s1 >> 8) & 0xFF] << 8) | sbox[s2 & 0xFF]) ^ l3)
+        out.extend(block)
+        if iv is not None:
+            c0, c1, c2, c3 = block
+    return out
+
+
+def _decrypt_blocks(words, inverse_round_keys):
+    """Decrypt the blocks of words (four per block) with the keys of _inverse_round_keys()"""
+    td0, td1, td2, td3 = _tables()[1]
+    sbox = SBOX_INV
+    rounds = len(inverse_round_keys) // 4 - 1
+    k0, k1, k2, k3 = inverse_round_keys[:4]
+    middle_keys = [inverse_round_keys[4 * r: 4 * r + 4] for r in range(1, rounds)]
+    l0, l1, l2, l3 = inverse_round_keys[-4:]
+    out = []
+    for i in range(0, len(words), 4):
+        s0 = words[i] ^ k0
+        s1 = words[i + 1] ^ k1
+        s2 = words[i + 2] ^ k2
+        s3 = words[i + 3] ^ k3
+        for r0, r1, r2, r3 in middle_keys:
+            s0, s1, s2, s3 = (
+                td0[s0 >> 24] ^ td1[(s3 >> 16) & 0xFF] ^ td2[(s2 >> 8) & 0xFF] ^ td3[s1 & 0xFF] ^ r0,
+                td0[s1 >> 24] ^ td1[(s0 >> 16) & 0xFF] ^ td2[(s3 >> 8) & 0xFF] ^ td3[s2 & 0xFF] ^ r1,
+                td0[s2 >> 24] ^ td1[(s1 >> 16) & 0xFF] ^ td2[(s0 >> 8) & 0xFF] ^ td3[s3 & 0xFF] ^ r2,
+                td0[s3 >> 24] ^ td1[(s2 >> 16) & 0xFF] ^ td2[(s1 >> 8) & 0xFF] ^ td3[s0 & 0xFF] ^ r3)
+        out.extend((
+            ((sbox[s0 >> 24] << 24) | (sbox[(s3 >> 16) & 0xFF] << 16) | (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s1 & 0xFF]) ^ l0,
+            ((sbox[s1 >> 24] << 24) | (sbox[(s0 >> 16) & 0xFF] << 16) | (sbox[(s3 >> 8) & 0xFF] << 8) | sbox[s2 & 0xFF]) ^ l1,
+            ((sbox[s2 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16) | (sbox[(s0 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ l2,
+            ((sbox[s3 >> 24] << 24) | (sbox[(s2 >> 16) & 0xFF] << 16) | (sbox[(s1 >> 8) & 0xFF] << 8) | sbox[s0 & 0xFF]) ^ l3))
+    return out
+
+
+__all__ = [
+    'aes_encrypt', 'key_expansion', 'aes_ctr_decrypt', 'aes_cbc_decrypt', 'aes_decrypt_text',
+    'aes_cbc_decrypt_bytes', 'aes_cbc_encrypt_bytes', 'aes_ctr_decrypt_bytes',
+]
@@ -8,7 +8,10 @@ from ..utils import (
 def get_suitable_downloader(info_dict, params={}): 
     info_dict['protocol'] = determine_protocol(info_dict) # info_dict의 파일형 반환
     info_copy = info_dict.copy() # 복사
-    return _get_suitable_downloader(info_copy, params) 
+    fd = _get_suitable_downloader(info_copy, params)
+    if params.get('async_engine'):
+        fd = _get_async_downloader(fd)
+    return fd
 
 
 # Some of these require get_suitable_downloader
@@ -55,9 +58,6 @@ def _get_suitable_downloader(info_dict, params={}):
             params['external_downloader_args'] = None
 
     protocol = info_dict['protocol']
-    if protocol.startswith('m3u8') and info_dict.get('is_live'):
-        return FFmpegFD
-
     if protocol == 'm3u8' and params.get('hls_prefer_native') is True:
         return HlsFD
 
@@ -67,6 +67,16 @@ def _get_suitable_downloader(info_dict, params={}):
     return PROTOCOL_MAP.get(protocol, HttpFD) 
 
 
+def _get_async_downloader(fd):
+    """Get the async engine counterpart of fd, if any."""
+    try:
+        # The async engine requires python >= 3.5
+        from .aio import ASYNC_DOWNLOADERS
+    except (ImportError, SyntaxError):
+        return fd
+    return ASYNC_DOWNLOADERS.get(fd, fd)
+
+
 __all__ = [
     'get_suitable_downloader',
     'FileDownloader',
@@ -0,0 +1,590 @@
+from __future__ import unicode_literals
+
+# Requires python >= 3.5, only imported if the async_engine option is set
+import asyncio
+import collections
+import io
+import queue
+import socket
+import ssl
+import threading
+import time
+import weakref
+
+from .dash import DashSegmentsFD
+from .hls import HlsFD
+from .http import HttpFD
+from ..compat import (
+    compat_http_client,
+    compat_urllib_error,
+    compat_urllib_request,
+    compat_urlparse,
+)
+from ..utils import (
+    ContentTooShortError,
+    DownloadError,
+    encodeFilename,
+    sanitize_open,
+    sanitized_Request,
+)
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop():
+    """Return the event loop of the async engine, run by a daemon thread"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name='youtube-dl-asyncio')
+            thread.daemon = True
+            thread.start()
+        return _loop
+
+
+def run_coroutine(coro):
+    """Run coro on the event loop of the async engine and wait for its result"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+async def _new_semaphore(value):
+    # Created by the event loop thread for python < 3.10
+    return asyncio.Semaphore(value)
+
+
+class _CookieResponse(object):
+    # What CookieJar.extract_cookies() needs from a response
+    def __init__(self, headers):
+        self._headers = headers
+
+    def info(self):
+        return self._headers
+
+
+class AsyncResponse(object):
+    """
+    Response of AsyncHTTPClient.open(), with the attributes of the responses
+    of ydl.urlopen() but coroutines to read its body and close it
+    """
+
+    def __init__(self, client, key, reader, writer, url, status, reason, headers, version, method):
+        self._client = client
+        self._key = key
+        self._reader = reader
+        self._writer = writer
+        self.url = url
+        self.code = self.status = status
+        self.msg = self.reason = reason
+        self.headers = headers
+        self._done = False
+        self._chunked = 'chunked' in (headers.get('Transfer-Encoding') or '').lower()
+        self._chunk_left = 0
+        self._length = None
+        if method == 'HEAD' or status in (204, 304):
+            self._length = 0
+        elif not self._chunked:
+            try:
+                self._length = int(headers.get('Content-Length'))
+            except (TypeError, ValueError):
+                pass
+        connection = (headers.get('Connection') or '').lower()
+        self._will_close = (
+            'close' in connection
+            or version == 'HTTP/1.0' and 'keep-alive' not in connection
+            or not self._chunked and self._length is None)
+        if self._length == 0:
+            self._finish()
+
+    def info(self):
+        return self.headers
+
+    def geturl(self):
+        return self.url
+
+    def getcode(self):
+        return self.code
+
+    async def _wait(self, coro):
+        try:
+            return await asyncio.wait_for(coro, self._client.timeout)
+        except asyncio.TimeoutError:
+            raise socket.timeout('timed out')
+
+    def _finish(self):
+        self._done = True
+        self._client._release(self._key, self._reader, self._writer, not self._will_close)
+
+    async def read(self, size=-1):
+        """Read up to size bytes of the body, all of it if size is negative"""
+        if size < 0:
+            chunks = []
+            while True:
+                chunk = await self.read(1024 * 1024)
+                if not chunk:
+                    return b''.join(chunks)
+                chunks.append(chunk)
+        if self._done or size == 0:
+            return b''
+        if self._chunked:
+            if not self._chunk_left:
+                line = await self._wait(self._reader.readline())
+                try:
+                    self._chunk_left = int(line.split(b';', 1)[0], 16)
+                except ValueError:
+                    raise compat_http_client.IncompleteRead(b'')
+                if not self._chunk_left:
+                    # Trailers
+                    while (await self._wait(self._reader.readline())) not in (b'\r\n', b'\n', b''):
+                        pass
+                    self._finish()
+                    return b''
+            data = await self._wait(self._reader.read(min(size, self._chunk_left)))
+            if not data:
+                raise compat_http_client.IncompleteRead(b'')
+            self._chunk_left -= len(data)
+            if not self._chunk_left:
+                await self._wait(self._reader.readline())
+            return data
+        if self._length is None:
+            data = await self._wait(self._reader.read(size))
+            if not data:
+                self._finish()
+            return data
+        data = await self._wait(self._reader.read(min(size, self._length)))
+        if not data:
+            raise compat_http_client.IncompleteRead(b'', self._length)
+        self._length -= len(data)
+        if not self._length:
+            self._finish()
+        return data
+
+    async def close(self):
+        if not self._done:
+            self._done = True
+            self._client._release(self._key, self._reader, self._writer, False)
+
+
+class _BlockingResponse(object):
+    """AsyncResponse for the code expecting a response of ydl.urlopen()"""
+
+    def __init__(self, response):
+        self._response = response
+        self.url = response.url
+        self.code = self.status = response.code
+        self.msg = self.reason = response.reason
+        self.headers = response.headers
+
+    def info(self):
+        return self.headers
+
+    def geturl(self):
+        return self.url
+
+    def getcode(self):
+        return self.code
+
+    def read(self, size=-1):
+        return run_coroutine(self._response.read(-1 if size is None else size))
+
+    def close(self):
+        run_coroutine(self._response.close())
+
+
+class AsyncHTTPClient(object):
+    """
+    HTTP/1.1 client of the async engine, running on its event loop.
+
+    Requests go through the request processors of the opener of the ydl,
+    so they get the same headers and cookies as with ydl.urlopen(); the
+    cookies of the responses are stored in its cookie jar and redirects are
+    handled by its redirect handler. Idle connections are kept alive and
+    reused. Requests through a proxy are not supported (see supports()).
+    """
+
+    _MAX_REDIRECTS = 10
+
+    _clients = weakref.WeakKeyDictionary()
+    _clients_lock = threading.Lock()
+
+    def __init__(self, ydl):
+        self.ydl = ydl
+        self.timeout = getattr(ydl, '_socket_timeout', None) or 600
+        self._max_idle = ydl.params.get('keepalive_max_per_host', 6)
+        self._idle_timeout = ydl.params.get('keepalive_idle_timeout', 30)
+        if not ydl.params.get('http_keepalive', True):
+            self._max_idle = 0
+        # Idle connections by (scheme, host, port)
+        self._idle = {}
+        self._proxies = {}
+        self._redirect_handler = compat_urllib_request.HTTPRedirectHandler()
+        self._ssl_context = None
+        for handler in ydl._opener.handlers:
+            if isinstance(handler, compat_urllib_request.ProxyHandler):
+                self._proxies = handler.proxies
+            elif isinstance(handler, compat_urllib_request.HTTPRedirectHandler):
+                self._redirect_handler = handler
+            elif isinstance(handler, compat_urllib_request.HTTPSHandler):
+                self._ssl_context = getattr(handler, '_context', None)
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+
+    @classmethod
+    def get(cls, ydl):
+        """Return the client of ydl"""
+        with cls._clients_lock:
+            client = cls._clients.get(ydl)
+            if client is None:
+                client = cls._clients[ydl] = cls(ydl)
+            return client
+
+    def supports(self, url, headers=None):
+        scheme = compat_urlparse.urlparse(url).scheme.lower()
+        if scheme not in ('http', 'https') or self._proxies.get(scheme):
+            return False
+        return not any(h.lower() == 'ytdl-request-proxy' for h in headers or {})
+
+    def _prepare(self, req):
+        req.timeout = self.timeout
+        protocol = req.type
+        for processor in self.ydl._opener.process_request.get(protocol, []):
+            req = getattr(processor, protocol + '_request')(req)
+        return req
+
+    def _release(self, key, reader, writer, reusable):
+        idle = self._idle.setdefault(key, collections.deque())
+        if reusable and len(idle) < self._max_idle and not reader.at_eof():
+            idle.append((reader, writer, time.time()))
+        else:
+            writer.close()
+
+    def _acquire(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer, since = idle.pop()
+            if (time.time() - since < self._idle_timeout
+                    and not reader.at_eof() and not writer.is_closing()):
+                return reader, writer
+            writer.close()
+        return None
+
+    async def _connect(self, scheme, host, port):
+        kwargs = {}
+        if scheme == 'https':
+            kwargs.update({'ssl': self._ssl_context, 'server_hostname': host})
+        source_address = self.ydl.params.get('source_address')
+        if source_address:
+            kwargs['local_addr'] = (source_address, 0)
+        try:
+            return await asyncio.wait_for(
+                asyncio.open_connection(host, port, **kwargs), self.timeout)
+        except asyncio.TimeoutError:
+            raise compat_urllib_error.URLError(socket.timeout('timed out'))
+        except (OSError, ssl.SSLError) as err:
+            raise compat_urllib_error.URLError(err)
+
+    async def _send(self, req, key, reader, writer):
+        url = req.get_full_url()
+        parsed = compat_urlparse.urlparse(url)
+        headers = dict(req.unredirected_hdrs)
+        headers.update(dict(
+            (k, v) for k, v in req.headers.items() if k not in headers))
+        headers = dict((name.title(), val) for name, val in headers.items())
+        headers.setdefault('Host', parsed.netloc.rpartition('@')[2])
+        # The body is streamed as it is received, it can't be decompressed
+        headers['Accept-Encoding'] = 'identity'
+        data = req.data
+        if data is not None:
+            headers['Content-Length'] = '%d' % len(data)
+        method = req.get_method()
+        head = '%s %s HTTP/1.1\r\n%s\r\n' % (
+            method, req.selector,
+            ''.join('%s: %s\r\n' % (k, v) for k, v in headers.items()))
+        writer.write(head.encode('latin-1'))
+        if data is not None:
+            writer.write(data)
+        await asyncio.wait_for(writer.drain(), self.timeout)
+
+        while True:
+            status_line = await asyncio.wait_for(reader.readline(), self.timeout)
+            if not status_line:
+                raise compat_http_client.RemoteDisconnected(
+                    'Remote end closed connection without response')
+            try:
+                version, status, reason = (status_line.decode('latin-1').rstrip('\r\n').split(None, 2) + [''])[:3]
+                status = int(status)
+            except ValueError:
+                raise compat_http_client.BadStatusLine(status_line)
+            header_lines = []
+            while True:
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                header_lines.append(line)
+            if not 100 <= status < 200:
+                break
+        response_headers = compat_http_client.parse_headers(io.BytesIO(b''.join(header_lines) + b'\r\n'))
+        return AsyncResponse(
+            self, key, reader, writer, url, status, reason, response_headers, version, method)
+
+    async def _open_once(self, req):
+        parsed = compat_urlparse.urlparse(req.get_full_url())
+        scheme = parsed.scheme.lower()
+        port = parsed.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parsed.hostname, port)
+        can_resend = req.data is None or isinstance(req.data, bytes)
+        while True:
+            conn = self._acquire(key)
+            reused = conn is not None
+            if not reused:
+                conn = await self._connect(scheme, parsed.hostname, port)
+            reader, writer = conn
+            try:
+                return await self._send(req, key, reader, writer)
+            except asyncio.TimeoutError:
+                writer.close()
+                raise socket.timeout('timed out')
+            except (OSError, compat_http_client.HTTPException) as err:
+                writer.close()
+                # The server may have closed the idle connection meanwhile
+                if reused and can_resend:
+                    continue
+                if isinstance(err, OSError):
+                    raise compat_urllib_error.URLError(err)
+                raise
+            except BaseException:
+                writer.close()
+                raise
+
+    async def open(self, req):
+        """Return the AsyncResponse to req (a URL or a Request)"""
+        if not isinstance(req, compat_urllib_request.Request):
+            req = sanitized_Request(req)
+        for _ in range(self._MAX_REDIRECTS + 1):
+            req = self._prepare(req)
+            response = await self._open_once(req)
+            self.ydl.cookiejar.extract_cookies(_CookieResponse(response.headers), req)
+            if response.code < 300 or response.code >= 400 or response.code in (304, 305, 306):
+                break
+            location = response.headers.get('Location') or response.headers.get('URI')
+            if not location:
+                break
+            await response.read()
+            new_req = self._redirect_handler.redirect_request(
+                req, None, response.code, response.reason, response.headers,
+                compat_urlparse.urljoin(response.url, location))
+            if new_req is None:
+                break
+            req = new_req
+        else:
+            raise compat_urllib_error.HTTPError(
+                response.url, response.code, 'The HTTP server returned a redirect error that would lead to an infinite loop',
+                response.headers, None)
+        if response.code >= 400:
+            body = await response.read()
+            raise compat_urllib_error.HTTPError(
+                response.url, response.code, response.reason, response.headers, io.BytesIO(body))
+        return response
+
+
+class AsyncHttpFD(HttpFD):
+    """
+    HttpFD transferring the data on the event loop of the async engine, the
+    calling thread only writes it
+    """
+
+    def _urlopen(self, request):
+        client = AsyncHTTPClient.get(self.ydl)
+        if not client.supports(request.get_full_url(), request.headers):
+            return super(AsyncHttpFD, self)._urlopen(request)
+        return _BlockingResponse(run_coroutine(client.open(request)))
+
+
+class _AsyncFragmentMixin(object):
+    """
+    Fetch the fragments as coroutines multiplexed on the event loop of the
+    async engine rather than with a thread per concurrent download, at most
+    concurrent_fragment_downloads at once. The calling thread appends them.
+
+    The event loop is shared by all the downloads, so the coroutines never
+    run the progress hooks or write to the screen: they pass these calls to
+    notify() and the calling thread makes them.
+    """
+
+    def download_and_append_fragments(self, ctx, fragments, info_dict, pack_func=None, overlap_pack=False):
+        client = AsyncHTTPClient.get(self.ydl)
+        if ctx['live'] or not all(
+                client.supports(f['url'], f.get('headers') or info_dict.get('http_headers'))
+                for f in fragments):
+            return super(_AsyncFragmentMixin, self).download_and_append_fragments(
+                ctx, fragments, info_dict, pack_func, overlap_pack)
+
+        pending = self._pending_fragments(ctx, fragments)
+        max_workers = self.params.get('concurrent_fragment_downloads') or 1
+        loop = get_event_loop()
+        semaphore = run_coroutine(_new_semaphore(max_workers))
+        scheduled = collections.deque()
+        pending = collections.deque(pending)
+        # Calls queued by the coroutines, None when a fragment is done
+        notices = queue.Queue()
+
+        def notify(func, *args):
+            notices.put((func, args))
+
+        def schedule():
+            # Bound the number of downloaded but not yet appended fragments
+            while pending and len(scheduled) < max_workers * 2:
+                fragment, fatal = pending.popleft()
+                future = asyncio.run_coroutine_threadsafe(
+                    self._fetch_fragment_async(ctx, fragment, info_dict, fatal, semaphore, notify), loop)
+                future.add_done_callback(lambda _: notices.put(None))
+                scheduled.append((fragment, future))
+
+        def wait_for(future):
+            while True:
+                try:
+                    # Wait with a timeout so that KeyboardInterrupt is
+                    # delivered as well
+                    notice = notices.get(not future.done(), 1)
+                except queue.Empty:
+                    if future.done():
+                        return
+                    continue
+                if notice is not None:
+                    func, args = notice
+                    func(*args)
+
+        ctx['concurrent'] = True
+        try:
+            schedule()
+            while scheduled:
+                fragment, future = scheduled.popleft()
+                wait_for(future)
+                frag_content = future.result()
+                schedule()
+                if frag_content is False:
+                    return False
+                if frag_content is not None:
+                    ctx['fragment_index'] = fragment['frag_index']
+                    if pack_func:
+                        frag_content = pack_func(frag_content, fragment)
+                    self._append_fragment(ctx, frag_content)
+            return True
+        finally:
+            for _, future in scheduled:
+                future.cancel()
+            del ctx['concurrent']
+
+    async def _fetch_fragment_async(self, ctx, fragment, info_dict, fatal, semaphore, notify):
+        # Same as FragmentFD._fetch_fragment()
+        async with semaphore:
+            fragment_retries = self.params.get('fragment_retries', 0)
+            count = 0
+            while count <= fragment_retries:
+                try:
+                    return await self._download_fragment_async(ctx, fragment, info_dict, notify)
+                except compat_urllib_error.HTTPError as err:
+                    count += 1
+                    if count <= fragment_retries:
+                        notify(self.report_retry_fragment, err, fragment['frag_index'], count, fragment_retries)
+                except DownloadError:
+                    if not fatal:
+                        notify(self.report_skip_fragment, fragment['frag_index'])
+                        return None
+                    raise
+            if not fatal:
+                notify(self.report_skip_fragment, fragment['frag_index'])
+                return None
+            notify(self.report_error, 'giving up after %s fragment retries' % fragment_retries)
+            return False
+
+    async def _download_fragment_async(self, ctx, fragment, info_dict, notify):
+        # Retries server and connection errors like HttpFD
+        retries = self.params.get('retries', 0)
+        count = 0
+        while True:
+            try:
+                return await self._download_fragment_once(ctx, fragment, info_dict, notify)
+            except compat_urllib_error.HTTPError as err:
+                if err.code < 500 or err.code >= 600:
+                    raise
+                error = err
+            except (compat_urllib_error.URLError, compat_http_client.HTTPException,
+                    OSError, ContentTooShortError) as err:
+                error = err
+            count += 1
+            if count > retries:
+                raise DownloadError('giving up after %s retries' % retries)
+            notify(self.report_retry, error, count, retries)
+
+    async def _download_fragment_once(self, ctx, fragment, info_dict, notify):
+        frag_filename = '%s-Frag%d' % (ctx['tmpfilename'], fragment['frag_index'])
+        headers = dict(fragment.get('headers') or info_dict.get('http_headers') or {})
+        headers['Youtubedl-no-compression'] = 'True'
+        client = AsyncHTTPClient.get(self.ydl)
+        limiter = self.rate_limiter(fragment['url'])
+        is_test = self.params.get('test', False)
+        response = await client.open(sanitized_Request(fragment['url'], None, headers))
+        try:
+            total_bytes = response._length
+            chunks = []
+            downloaded = 0
+            while not (is_test and downloaded >= self._TEST_FILE_SIZE):
+                chunk = await response.read(limiter.max_block_size or 1024 * 1024)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                downloaded += len(chunk)
+                wait = limiter.delay(len(chunk))
+                if wait:
+                    await asyncio.sleep(wait)
+                notify(ctx['frag_progress_hook'], {
+                    'status': 'downloading',
+                    'filename': frag_filename,
+                    'downloaded_bytes': downloaded,
+                    'total_bytes': total_bytes,
+                })
+        finally:
+            await response.close()
+        if not is_test and total_bytes is not None and downloaded < total_bytes:
+            raise ContentTooShortError(downloaded, total_bytes)
+        frag_content = b''.join(chunks)
+        if is_test:
+            frag_content = frag_content[:self._TEST_FILE_SIZE]
+        notify(ctx['frag_progress_hook'], {
+            'status': 'finished',
+            'filename': frag_filename,
+            'downloaded_bytes': len(frag_content),
+            'total_bytes': len(frag_content),
+        })
+        if self.params.get('keep_fragments', False):
+            def write_fragment():
+                stream, _ = sanitize_open(encodeFilename(frag_filename), 'wb')
+                with stream:
+                    stream.write(frag_content)
+            # Not on the event loop thread, like the progress hooks
+            await get_event_loop().run_in_executor(None, write_fragment)
+        return frag_content
+
+
+class AsyncHlsFD(_AsyncFragmentMixin, HlsFD):
+    pass
+
+
+class AsyncDashSegmentsFD(_AsyncFragmentMixin, DashSegmentsFD):
+    pass
+
+
+# The downloaders replaced by the async engine
+ASYNC_DOWNLOADERS = {
+    HttpFD: AsyncHttpFD,
+    HlsFD: AsyncHlsFD,
+    DashSegmentsFD: AsyncDashSegmentsFD,
+}
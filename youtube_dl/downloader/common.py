@@ -6,9 +6,11 @@ import sys
 import time
 import random
 
+from .ratelimit import RateLimiter
 from ..compat import compat_os_name
 from ..utils import (
     decodeArgument,
+    DownloadCancelled,
     encodeFilename,
     error_to_compat_str,
     format_bytes,
@@ -31,7 +33,10 @@ class FileDownloader(object):
 
     verbose:            Print additional info to stdout.
     quiet:              Do not print messages to stdout.
-    ratelimit:          Download speed limit, in bytes/sec.
+    ratelimit:          Download speed limit, in bytes/sec, shared by all the
+                        downloads of the process.
+    ratelimit_per_host: Download speed limit from a single host, in bytes/sec,
+                        shared by all the downloads of the process.
     retries:            Number of times to retry for HTTP error 5xx
     buffersize:         Size of download buffer in bytes.
     noresizebuffer:     Do not automatically resize the download buffer.
@@ -56,6 +61,9 @@ class FileDownloader(object):
     """
 
     _TEST_FILE_SIZE = 10241
+    # Bounds of the block sizes picked by smooth_block_size()
+    _MIN_BLOCK_SIZE = 1024
+    _MAX_BLOCK_SIZE = 4194304
     params = None
 
     def __init__(self, ydl, params): # 생성자
@@ -63,6 +71,7 @@ class FileDownloader(object):
         self.ydl = ydl
         self._progress_hooks = []
         self.params = params
+        self._cancelled = False
         self.add_progress_hook(self.report_progress)
 
     @staticmethod
@@ -136,6 +145,19 @@ class FileDownloader(object):
             return int(new_min)
         return int(rate)
 
+    @classmethod
+    def smooth_block_size(cls, rate, elapsed_time, bytes, block_size):
+        """
+        Update rate, the moving average of the throughput in bytes/s (None
+        at first), with a block of bytes read in elapsed_time seconds and
+        return it along with the size of the next block: about one second
+        worth of data, but at most twice or half block_size
+        """
+        sample = bytes / max(elapsed_time, 0.001)
+        rate = sample if rate is None else rate + 0.3 * (sample - rate)
+        new_size = max(min(rate, block_size * 2.0), block_size / 2.0)
+        return rate, int(min(max(new_size, cls._MIN_BLOCK_SIZE), cls._MAX_BLOCK_SIZE))
+
     @staticmethod
     def parse_bytes(bytestr):
         """Parse a string indicating a byte quantity into an integer."""
@@ -164,6 +186,11 @@ class FileDownloader(object):
     def report_error(self, *args, **kargs):
         self.ydl.report_error(*args, **kargs)
 
+    def rate_limiter(self, url):
+        """Return the RateLimiter to download from url with"""
+        return RateLimiter(
+            self.params.get('ratelimit'), self.params.get('ratelimit_per_host'), url)
+
     def slow_down(self, start_time, now, byte_counter):
         """Sleep if the download speed is over the rate limit."""
         rate_limit = self.params.get('ratelimit')
@@ -246,26 +273,37 @@ class FileDownloader(object):
         self.to_console_title('youtube-dl ' + msg)
 
     def report_progress(self, s):
+        """
+        Report a progress hook status to the progress display of the ydl, or
+        render it directly if the ydl has none (e.g. not a YoutubeDL)
+        """
+        noprogress = self.params.get('noprogress', False)
         if s['status'] == 'finished':
-            if self.params.get('noprogress', False):
-                self.to_screen('[download] Download completed')
-            else:
-                msg_template = '100%%'
-                if s.get('total_bytes') is not None:
-                    s['_total_bytes_str'] = format_bytes(s['total_bytes'])
-                    msg_template += ' of %(_total_bytes_str)s'
-                if s.get('elapsed') is not None:
-                    s['_elapsed_str'] = self.format_seconds(s['elapsed'])
-                    msg_template += ' in %(_elapsed_str)s'
-                self._report_progress_status(
-                    msg_template % s, is_last_line=True)
-
-        if self.params.get('noprogress'):
-            return
-
-        if s['status'] != 'downloading':
-            return
+            formatter = (
+                (lambda s: 'Download completed') if noprogress
+                else self._format_finished_progress)
+        elif s['status'] == 'downloading' and not noprogress:
+            formatter = self._format_progress
+        else:
+            formatter = None
+        progress_aggregator = getattr(self.ydl, 'progress_aggregator', None)
+        if progress_aggregator is not None:
+            progress_aggregator.update(s, formatter)
+        elif formatter is not None:
+            self._report_progress_status(
+                formatter(s), is_last_line=s['status'] == 'finished')
+
+    def _format_finished_progress(self, s):
+        msg_template = '100%%'
+        if s.get('total_bytes') is not None:
+            s['_total_bytes_str'] = format_bytes(s['total_bytes'])
+            msg_template += ' of %(_total_bytes_str)s'
+        if s.get('elapsed') is not None:
+            s['_elapsed_str'] = self.format_seconds(s['elapsed'])
+            msg_template += ' in %(_elapsed_str)s'
+        return msg_template % s
 
+    def _format_progress(self, s):
         if s.get('eta') is not None:
             s['_eta_str'] = self.format_eta(s['eta'])
         else:
@@ -303,7 +341,7 @@ class FileDownloader(object):
             else:
                 msg_template = '%(_percent_str)s % at %(_speed_str)s ETA %(_eta_str)s'
 
-        self._report_progress_status(msg_template % s)
+        return msg_template % s
 
     def report_resuming_byte(self, resume_len):
         """Report attempt to resume at given byte."""
@@ -369,7 +407,16 @@ class FileDownloader(object):
         """Real download process. Redefine in subclasses."""
         raise NotImplementedError('This method must be implemented by subclasses')
 
+    def cancel(self):
+        """
+        Cancel the download running in another thread: it raises
+        DownloadCancelled the next time it reports its progress
+        """
+        self._cancelled = True
+
     def _hook_progress(self, status):
+        if self._cancelled:
+            raise DownloadCancelled('download of %s cancelled' % status.get('filename'))
         for ph in self._progress_hooks:
             ph(status)
 
@@ -94,6 +94,12 @@ class ExternalFD(FileDownloader):
     def _valueless_option(self, command_option, param, expected_value=True):
         return cli_valueless_option(self.params, command_option, param, expected_value)
 
+    def _rate_limit_option(self, command_option, info_dict):
+        # The external downloader can't draw from the shared buckets, it
+        # gets the lowest of the limits applying to the download instead
+        rate = self.rate_limiter(info_dict['url']).rate
+        return [command_option, '%d' % rate] if rate else []
+
     def _configuration_args(self, default=[]):
         return cli_configuration_args(self.params, 'external_downloader_args', default)
 
@@ -121,7 +127,7 @@ class CurlFD(ExternalFD):
         cmd += self._bool_option('--continue-at', 'continuedl', '-', '0')
         cmd += self._valueless_option('--silent', 'noprogress')
         cmd += self._valueless_option('--verbose', 'verbose')
-        cmd += self._option('--limit-rate', 'ratelimit')
+        cmd += self._rate_limit_option('--limit-rate', info_dict)
         retry = self._option('--retry', 'retries')
         if len(retry) == 2:
             if retry[1] in ('inf', 'infinite'):
@@ -165,7 +171,7 @@ class WgetFD(ExternalFD):
         cmd = [self.exe, '-O', tmpfilename, '-nv', '--no-cookies']
         for key, val in info_dict['http_headers'].items():
             cmd += ['--header', '%s: %s' % (key, val)]
-        cmd += self._option('--limit-rate', 'ratelimit')
+        cmd += self._rate_limit_option('--limit-rate', info_dict)
         retry = self._option('--tries', 'retries')
         if len(retry) == 2:
             if retry[1] in ('inf', 'infinite'):
@@ -194,6 +200,7 @@ class Aria2cFD(ExternalFD):
             cmd += ['--header', '%s: %s' % (key, val)]
         cmd += self._option('--interface', 'source_address')
         cmd += self._option('--all-proxy', 'proxy')
+        cmd += self._rate_limit_option('--max-download-limit', info_dict)
         cmd += self._bool_option('--check-certificate', 'nocheckcertificate', 'false', 'true', '=')
         cmd += self._bool_option('--remote-time', 'updatetime', 'true', 'false', '=')
         cmd += ['--', info_dict['url']]
@@ -1,12 +1,17 @@
 from __future__ import division, unicode_literals
 
+import io
 import os
+import sys
 import time
 import json
+import threading
 
 from .common import FileDownloader
 from .http import HttpFD
+from ..compat import compat_urllib_error
 from ..utils import (
+    DownloadError,
     error_to_compat_str,
     encodeFilename,
     sanitize_open,
@@ -18,6 +23,9 @@ class HttpQuietDownloader(HttpFD):
     def to_screen(self, *args, **kargs):
         pass
 
+    def report_progress(self, s):
+        pass
+
 
 class FragmentFD(FileDownloader):
     """
@@ -30,7 +38,12 @@ class FragmentFD(FileDownloader):
     skip_unavailable_fragments:
                         Skip unavailable fragments (DASH and hlsnative only)
     keep_fragments:     Keep downloaded fragments on disk after downloading is
-                        finished
+                        finished. Otherwise fragments are downloaded into
+                        memory and never written to disk on their own.
+    concurrent_fragment_downloads:
+                        Number of fragments to download in parallel (DASH,
+                        hlsnative and ISM only). Fragments are still appended
+                        to the output file in order.
 
     For each incomplete fragment download youtube-dl keeps on disk a special
     bookkeeping file with download state and metadata (in future such files will
@@ -95,20 +108,34 @@ class FragmentFD(FileDownloader):
         frag_index_stream.write(json.dumps({'downloader': downloader}))
         frag_index_stream.close()
 
-    def _download_fragment(self, ctx, frag_url, info_dict, headers=None): 
-        fragment_filename = '%s-Frag%d' % (ctx['tmpfilename'], ctx['fragment_index'])
+    def _download_fragment(self, ctx, frag_url, info_dict, headers=None, frag_index=None, dl=None):
+        if frag_index is None:
+            frag_index = ctx['fragment_index']
+        fragment_filename = '%s-Frag%d' % (ctx['tmpfilename'], frag_index)
         fragment_info_dict = {
             'url': frag_url,
             'http_headers': headers or info_dict.get('http_headers'),
         }
-        # info_dict의 내용을 통해 filename을 다운로드
-        success = ctx['dl'].download(fragment_filename, fragment_info_dict) #
+        dl = dl or ctx['dl']
+        keep_fragments = self.params.get('keep_fragments', False)
+        if keep_fragments:
+            # info_dict의 내용을 통해 filename을 다운로드
+            success = dl.download(fragment_filename, fragment_info_dict) #
+        else:
+            # Fragments that are not kept are never written to disk, the
+            # HTTP body is collected in memory instead. download() is
+            # bypassed since its "already downloaded" check only makes sense
+            # for files.
+            frag_stream = io.BytesIO()
+            fragment_info_dict['_dest_stream'] = frag_stream
+            success = dl.real_download(fragment_filename, fragment_info_dict)
         if not success:
             return False, None
         if fragment_info_dict.get('filetime'):
             ctx['fragment_filetime'] = fragment_info_dict.get('filetime')
-        down, frag_sanitized = sanitize_open(fragment_filename, 'rb') # filename 파일을 읽기 모드로 연다
-        ctx['fragment_filename_sanitized'] = frag_sanitized
+        if not keep_fragments:
+            return True, frag_stream.getvalue()
+        down, _ = sanitize_open(fragment_filename, 'rb') # filename 파일을 읽기 모드로 연다
         frag_content = down.read() # filename 파일을 읽어서 frag_content 변수에 저장하는 식으로 다운로드를 한다
         down.close()
         return True, frag_content
@@ -120,9 +147,174 @@ class FragmentFD(FileDownloader):
         finally:
             if self.__do_ytdl_file(ctx):
                 self._write_ytdl_file(ctx)
-            if not self.params.get('keep_fragments', False):
-                os.remove(encodeFilename(ctx['fragment_filename_sanitized']))
-            del ctx['fragment_filename_sanitized']
+
+    def _fetch_fragment(self, ctx, fragment, info_dict, fatal, frag_index=None, dl=None):
+        """
+        Download a single fragment honouring fragment_retries.
+
+        Returns the fragment content, None if the fragment was skipped or
+        False if the download must be aborted.
+        """
+        fragment_retries = self.params.get('fragment_retries', 0)
+        count = 0
+        while count <= fragment_retries:
+            try:
+                success, frag_content = self._download_fragment(
+                    ctx, fragment['url'], info_dict, fragment.get('headers'),
+                    frag_index=frag_index, dl=dl)
+                if not success:
+                    return False
+                return frag_content
+            except compat_urllib_error.HTTPError as err:
+                # Unavailable (possibly temporary) fragments may be served.
+                # First we try to retry then either skip or abort.
+                # See https://github.com/ytdl-org/youtube-dl/issues/10165,
+                # https://github.com/ytdl-org/youtube-dl/issues/10448).
+                count += 1
+                if count <= fragment_retries:
+                    self.report_retry_fragment(err, fragment['frag_index'], count, fragment_retries)
+            except DownloadError:
+                # Don't retry fragment if error occurred during HTTP downloading
+                # itself since it has own retry settings
+                if not fatal:
+                    self.report_skip_fragment(fragment['frag_index'])
+                    return None
+                raise
+        if not fatal:
+            self.report_skip_fragment(fragment['frag_index'])
+            return None
+        self.report_error('giving up after %s fragment retries' % fragment_retries)
+        return False
+
+    def _pending_fragments(self, ctx, fragments):
+        """Return the (fragment, fatal) pairs of the fragments left to download"""
+        skip_unavailable_fragments = self.params.get('skip_unavailable_fragments', True)
+        pending = []
+        for fragment in fragments:
+            if fragment['frag_index'] <= ctx['fragment_index']:
+                continue
+            fatal = fragment.get('fatal')
+            if fatal is None:
+                fatal = not skip_unavailable_fragments
+            pending.append((fragment, fatal))
+        return pending
+
+    def download_and_append_fragments(self, ctx, fragments, info_dict, pack_func=None, overlap_pack=False):
+        """
+        Download fragments and append them to ctx['dest_stream'] in order.
+
+        fragments is a list of dicts with at least frag_index (1-based) and
+        url, and optionally headers and fatal. pack_func, if given, is called
+        as pack_func(frag_content, fragment) and returns the data to append.
+        With overlap_pack, for an expensive pack_func (e.g. decrypting), the
+        next fragments are downloaded meanwhile even without concurrent
+        fragment downloads.
+        Fragments already downloaded according to the .ytdl file are skipped.
+        """
+        pending = self._pending_fragments(ctx, fragments)
+
+        def append_fragment(fragment, frag_content):
+            if pack_func:
+                frag_content = pack_func(frag_content, fragment)
+            self._append_fragment(ctx, frag_content)
+
+        max_workers = self.params.get('concurrent_fragment_downloads') or 1
+        if (max_workers > 1 or overlap_pack) and len(pending) > 1 and not ctx['live']:
+            return self._download_fragments_concurrently(
+                ctx, pending, info_dict, max_workers, append_fragment)
+
+        for fragment, fatal in pending:
+            frag_content = self._fetch_fragment(ctx, fragment, info_dict, fatal)
+            if frag_content is False:
+                return False
+            if frag_content is not None:
+                append_fragment(fragment, frag_content)
+        return True
+
+    def _download_fragments_concurrently(self, ctx, pending, info_dict, max_workers, append_fragment):
+        ctx['concurrent'] = True
+        # Bound the number of downloaded but not yet appended fragments so
+        # that a single slow fragment does not make memory usage grow
+        # without limit
+        window = max_workers * 2
+        cond = threading.Condition()
+        results = {}
+        state = {
+            'next_scheduled': 0,
+            'next_appended': 0,
+            'abort': False,
+        }
+
+        def worker():
+            dl = self._make_frag_downloader(ctx)
+            while True:
+                with cond:
+                    while (not state['abort']
+                           and state['next_scheduled'] - state['next_appended'] >= window):
+                        cond.wait()
+                    if state['abort'] or state['next_scheduled'] >= len(pending):
+                        return
+                    pos = state['next_scheduled']
+                    state['next_scheduled'] += 1
+                fragment, fatal = pending[pos]
+                try:
+                    result = (self._fetch_fragment(
+                        ctx, fragment, info_dict, fatal,
+                        frag_index=fragment['frag_index'], dl=dl), None)
+                except Exception:
+                    result = (False, sys.exc_info())
+                with cond:
+                    results[pos] = result
+                    cond.notify_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(min(max_workers, len(pending)))]
+        for t in threads:
+            t.daemon = True
+            t.start()
+
+        try:
+            for pos, (fragment, _) in enumerate(pending):
+                with cond:
+                    while pos not in results:
+                        # Wait with a timeout so that KeyboardInterrupt is
+                        # delivered on python 2 as well
+                        cond.wait(1)
+                    frag_content, exc_info = results.pop(pos)
+                    state['next_appended'] = pos + 1
+                    cond.notify_all()
+                if exc_info:
+                    raise exc_info[1]
+                if frag_content is False:
+                    return False
+                if frag_content is not None:
+                    ctx['fragment_index'] = fragment['frag_index']
+                    append_fragment(fragment, frag_content)
+            return True
+        finally:
+            with cond:
+                state['abort'] = True
+                cond.notify_all()
+            for t in threads:
+                t.join()
+            del ctx['concurrent']
+
+    def _make_frag_downloader(self, ctx):
+        dl = HttpQuietDownloader(
+            self.ydl,
+            {
+                'continuedl': True,
+                'quiet': True,
+                'noprogress': True,
+                'ratelimit': self.params.get('ratelimit'),
+                'ratelimit_per_host': self.params.get('ratelimit_per_host'),
+                'retries': self.params.get('retries', 0),
+                'nopart': self.params.get('nopart', False),
+                'test': self.params.get('test', False),
+            }
+        )
+        if 'frag_progress_hook' in ctx:
+            dl.add_progress_hook(ctx['frag_progress_hook'])
+        return dl
 
     def _prepare_frag_download(self, ctx):
         if 'live' not in ctx:
@@ -137,18 +329,7 @@ class FragmentFD(FileDownloader):
         self.to_screen(
             '[%s] Total fragments: %s' % (self.FD_NAME, total_frags_str))
         self.report_destination(ctx['filename'])
-        dl = HttpQuietDownloader(
-            self.ydl,
-            {
-                'continuedl': True,
-                'quiet': True,
-                'noprogress': True,
-                'ratelimit': self.params.get('ratelimit'),
-                'retries': self.params.get('retries', 0),
-                'nopart': self.params.get('nopart', False),
-                'test': self.params.get('test', False),
-            }
-        )
+        dl = self._make_frag_downloader(ctx)
         tmpfilename = self.temp_name(ctx['filename'])
         open_mode = 'wb'
         resume_len = 0
@@ -210,42 +391,56 @@ class FragmentFD(FileDownloader):
         start = time.time()
         ctx.update({
             'started': start,
-            # Amount of fragment's bytes downloaded by the time of the previous
-            # frag progress hook invocation
-            'prev_frag_downloaded_bytes': 0,
+            # Amount of each fragment's bytes downloaded by the time of the
+            # previous frag progress hook invocation, keyed by fragment
+            # filename since several fragments may be in flight at once
+            'prev_frag_downloaded_bytes': {},
         })
+        # Fragment downloaders may report progress from several threads
+        lock = threading.Lock()
 
         def frag_progress_hook(s):
             if s['status'] not in ('downloading', 'finished'):
                 return
 
-            time_now = time.time()
-            state['elapsed'] = time_now - start
-            frag_total_bytes = s.get('total_bytes') or 0
-            if not ctx['live']:
-                estimated_size = (
-                    (ctx['complete_frags_downloaded_bytes'] + frag_total_bytes)
-                    / (state['fragment_index'] + 1) * total_frags)
-                state['total_bytes_estimate'] = estimated_size
-
-            if s['status'] == 'finished':
-                state['fragment_index'] += 1
-                ctx['fragment_index'] = state['fragment_index']
-                state['downloaded_bytes'] += frag_total_bytes - ctx['prev_frag_downloaded_bytes']
-                ctx['complete_frags_downloaded_bytes'] = state['downloaded_bytes']
-                ctx['prev_frag_downloaded_bytes'] = 0
-            else:
-                frag_downloaded_bytes = s['downloaded_bytes']
-                state['downloaded_bytes'] += frag_downloaded_bytes - ctx['prev_frag_downloaded_bytes']
+            with lock:
+                time_now = time.time()
+                state['elapsed'] = time_now - start
+                frag_total_bytes = s.get('total_bytes') or 0
                 if not ctx['live']:
-                    state['eta'] = self.calc_eta(
-                        start, time_now, estimated_size - resume_len,
-                        state['downloaded_bytes'] - resume_len)
-                state['speed'] = s.get('speed') or ctx.get('speed')
-                ctx['speed'] = state['speed']
-                ctx['prev_frag_downloaded_bytes'] = frag_downloaded_bytes
-            self._hook_progress(state)
-
+                    estimated_size = (
+                        (ctx['complete_frags_downloaded_bytes'] + frag_total_bytes)
+                        / (state['fragment_index'] + 1) * total_frags)
+                    state['total_bytes_estimate'] = estimated_size
+
+                prev_frag_downloaded_bytes = ctx['prev_frag_downloaded_bytes']
+                frag_filename = s.get('filename')
+                if s['status'] == 'finished':
+                    state['fragment_index'] += 1
+                    if not ctx.get('concurrent'):
+                        # In concurrent mode fragment_index is only advanced
+                        # once the fragment is actually appended
+                        ctx['fragment_index'] = state['fragment_index']
+                    state['downloaded_bytes'] += frag_total_bytes - prev_frag_downloaded_bytes.pop(frag_filename, 0)
+                    ctx['complete_frags_downloaded_bytes'] = state['downloaded_bytes']
+                else:
+                    frag_downloaded_bytes = s['downloaded_bytes']
+                    state['downloaded_bytes'] += frag_downloaded_bytes - prev_frag_downloaded_bytes.get(frag_filename, 0)
+                    if not ctx['live']:
+                        state['eta'] = self.calc_eta(
+                            start, time_now, estimated_size - resume_len,
+                            state['downloaded_bytes'] - resume_len)
+                    if ctx.get('concurrent'):
+                        # Per-fragment speeds do not add up to the overall one
+                        state['speed'] = self.calc_speed(
+                            start, time_now, state['downloaded_bytes'] - resume_len)
+                    else:
+                        state['speed'] = s.get('speed') or ctx.get('speed')
+                    ctx['speed'] = state['speed']
+                    prev_frag_downloaded_bytes[frag_filename] = frag_downloaded_bytes
+                self._hook_progress(state)
+
+        ctx['frag_progress_hook'] = frag_progress_hook
         ctx['dl'].add_progress_hook(frag_progress_hook)
 
         return start
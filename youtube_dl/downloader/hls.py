@@ -1,23 +1,27 @@
 from __future__ import unicode_literals
 
 import re
-import binascii
+import threading
+import time
 try:
     from Crypto.Cipher import AES
     can_decrypt_frag = True
 except ImportError:
+    # Much slower, youtube_dl.aes is used instead
     can_decrypt_frag = False
 
 from .fragment import FragmentFD
 from .external import FFmpegFD
 
+from ..aes import aes_cbc_decrypt_bytes
 from ..compat import (
     compat_urllib_error,
     compat_urlparse,
     compat_struct_pack,
 )
+from ..m3u8 import parse_m3u8_playlist
 from ..utils import (
-    parse_m3u8_attributes,
+    error_to_compat_str,
     update_url_query,
 )
 
@@ -52,22 +56,49 @@ class HlsFD(FragmentFD):
         )
         check_results = [not re.search(feature, manifest) for feature in UNSUPPORTED_FEATURES]
         is_aes128_enc = '#EXT-X-KEY:METHOD=AES-128' in manifest
-        check_results.append(can_decrypt_frag or not is_aes128_enc)
         check_results.append(not (is_aes128_enc and r'#EXT-X-BYTERANGE' in manifest))
-        check_results.append(not info_dict.get('is_live'))
         return all(check_results)
 
+    def _parse_playlist(self, s, man_url, info_dict):
+        """
+        Parse the playlist s (see parse_m3u8_playlist) and complete its
+        fragments with the query and headers to download them with
+        """
+        playlist = parse_m3u8_playlist(s, man_url)
+        extra_query = None
+        extra_param_to_segment_url = info_dict.get('extra_param_to_segment_url')
+        if extra_param_to_segment_url:
+            extra_query = compat_urlparse.parse_qs(extra_param_to_segment_url)
+        http_headers = info_dict.get('http_headers') or {}
+        # The decrypt_info of a key is shared by the fragments using it
+        keys_updated = set()
+        for fragment in playlist['fragments']:
+            headers = dict(http_headers)
+            byte_range = fragment['byte_range']
+            if byte_range:
+                headers['Range'] = 'bytes=%d-%d' % (byte_range['start'], byte_range['end'] - 1)
+            fragment['headers'] = headers
+            if extra_query:
+                fragment['url'] = update_url_query(fragment['url'], extra_query)
+                decrypt_info = fragment['decrypt_info']
+                if decrypt_info['METHOD'] == 'AES-128' and id(decrypt_info) not in keys_updated:
+                    decrypt_info['URI'] = update_url_query(decrypt_info['URI'], extra_query)
+                    keys_updated.add(id(decrypt_info))
+        return playlist
+
+    def _download_manifest(self, info_dict, man_url):
+        urlh = self.ydl.urlopen(self._prepare_url(info_dict, man_url))
+        return urlh.geturl(), urlh.read().decode('utf-8', 'ignore')
+
     def real_download(self, filename, info_dict):
         man_url = info_dict['url']
         self.to_screen('[%s] Downloading m3u8 manifest' % self.FD_NAME)
 
-        urlh = self.ydl.urlopen(self._prepare_url(info_dict, man_url))
-        man_url = urlh.geturl()
-        s = urlh.read().decode('utf-8', 'ignore')
+        man_url, s = self._download_manifest(info_dict, man_url)
 
         if not self.can_download(s, info_dict):
             if info_dict.get('extra_param_to_segment_url') or info_dict.get('_decryption_key_url'):
-                self.report_error('pycrypto not found. Please install it.')
+                self.report_error('this stream is not supported by hlsnative and cannot be delegated to ffmpeg')
                 return False
             self.report_warning(
                 'hlsnative has detected features it does not support, '
@@ -77,140 +108,139 @@ class HlsFD(FragmentFD):
                 fd.add_progress_hook(ph)
             return fd.real_download(filename, info_dict)
 
-        def is_ad_fragment_start(s):
-            return (s.startswith('#ANVATO-SEGMENT-INFO') and 'type=ad' in s
-                    or s.startswith('#UPLYNK-SEGMENT') and s.endswith(',ad'))
-
-        def is_ad_fragment_end(s):
-            return (s.startswith('#ANVATO-SEGMENT-INFO') and 'type=master' in s
-                    or s.startswith('#UPLYNK-SEGMENT') and s.endswith(',segment'))
-
-        media_frags = 0
-        ad_frags = 0
-        ad_frag_next = False
-        for line in s.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('#'):
-                if is_ad_fragment_start(line):
-                    ad_frag_next = True
-                elif is_ad_fragment_end(line):
-                    ad_frag_next = False
-                continue
-            if ad_frag_next:
-                ad_frags += 1
-                continue
-            media_frags += 1
+        playlist = self._parse_playlist(s, man_url, info_dict)
+        fragments = playlist['fragments']
+        # Live playlists are reloaded until they end
+        live = bool(info_dict.get('is_live')) and not playlist['ended']
+        if not live and not fragments:
+            self.report_error('the m3u8 playlist has no media segments')
+            return False
 
         ctx = {
             'filename': filename,
-            'total_frags': media_frags,
-            'ad_frags': ad_frags,
+            'total_frags': None if live else len(fragments),
+            'ad_frags': playlist['ad_fragments'],
+            'live': live,
         }
 
         self._prepare_and_start_frag_download(ctx)
 
-        fragment_retries = self.params.get('fragment_retries', 0)
-        skip_unavailable_fragments = self.params.get('skip_unavailable_fragments', True)
         test = self.params.get('test', False)
 
-        extra_query = None
-        extra_param_to_segment_url = info_dict.get('extra_param_to_segment_url')
-        if extra_param_to_segment_url:
-            extra_query = compat_urlparse.parse_qs(extra_param_to_segment_url)
-        i = 0
-        media_sequence = 0
-        decrypt_info = {'METHOD': 'NONE'}
-        byte_range = {}
-        frag_index = 0
-        ad_frag_next = False
-        for line in s.splitlines():
-            line = line.strip()
-            if line:
-                if not line.startswith('#'):
-                    if ad_frag_next:
-                        continue
-                    frag_index += 1
-                    if frag_index <= ctx['fragment_index']:
-                        continue
-                    frag_url = (
-                        line
-                        if re.match(r'^https?://', line)
-                        else compat_urlparse.urljoin(man_url, line))
-                    if extra_query:
-                        frag_url = update_url_query(frag_url, extra_query)
-                    count = 0
-                    headers = info_dict.get('http_headers', {})
-                    if byte_range:
-                        headers['Range'] = 'bytes=%d-%d' % (byte_range['start'], byte_range['end'] - 1)
-                    while count <= fragment_retries:
-                        try:
-                            success, frag_content = self._download_fragment(
-                                ctx, frag_url, info_dict, headers)
-                            if not success:
-                                return False
-                            break
-                        except compat_urllib_error.HTTPError as err:
-                            # Unavailable (possibly temporary) fragments may be served.
-                            # First we try to retry then either skip or abort.
-                            # See https://github.com/ytdl-org/youtube-dl/issues/10165,
-                            # https://github.com/ytdl-org/youtube-dl/issues/10448).
-                            count += 1
-                            if count <= fragment_retries:
-                                self.report_retry_fragment(err, frag_index, count, fragment_retries)
-                    if count > fragment_retries:
-                        if skip_unavailable_fragments:
-                            i += 1
-                            media_sequence += 1
-                            self.report_skip_fragment(frag_index)
-                            continue
-                        self.report_error(
-                            'giving up after %s fragment retries' % fragment_retries)
-                        return False
-                    if decrypt_info['METHOD'] == 'AES-128':
-                        iv = decrypt_info.get('IV') or compat_struct_pack('>8xq', media_sequence)
-                        decrypt_info['KEY'] = decrypt_info.get('KEY') or self.ydl.urlopen(
-                            self._prepare_url(info_dict, info_dict.get('_decryption_key_url') or decrypt_info['URI'])).read()
-                        # Don't decrypt the content in tests since the data is explicitly truncated and it's not to a valid block
-                        # size (see https://github.com/ytdl-org/youtube-dl/pull/27660). Tests only care that the correct data downloaded,
-                        # not what it decrypts to.
-                        if not test:
-                            frag_content = AES.new(
-                                decrypt_info['KEY'], AES.MODE_CBC, iv).decrypt(frag_content)
-                    self._append_fragment(ctx, frag_content)
-                    # We only download the first fragment during the test
-                    if test:
-                        break
-                    i += 1
-                    media_sequence += 1
-                elif line.startswith('#EXT-X-KEY'):
-                    decrypt_url = decrypt_info.get('URI')
-                    decrypt_info = parse_m3u8_attributes(line[11:])
-                    if decrypt_info['METHOD'] == 'AES-128':
-                        if 'IV' in decrypt_info:
-                            decrypt_info['IV'] = binascii.unhexlify(decrypt_info['IV'][2:].zfill(32))
-                        if not re.match(r'^https?://', decrypt_info['URI']):
-                            decrypt_info['URI'] = compat_urlparse.urljoin(
-                                man_url, decrypt_info['URI'])
-                        if extra_query:
-                            decrypt_info['URI'] = update_url_query(decrypt_info['URI'], extra_query)
-                        if decrypt_url != decrypt_info['URI']:
-                            decrypt_info['KEY'] = None
-                elif line.startswith('#EXT-X-MEDIA-SEQUENCE'):
-                    media_sequence = int(line[22:])
-                elif line.startswith('#EXT-X-BYTERANGE'):
-                    splitted_byte_range = line[17:].split('@')
-                    sub_range_start = int(splitted_byte_range[1]) if len(splitted_byte_range) == 2 else byte_range['end']
-                    byte_range = {
-                        'start': sub_range_start,
-                        'end': sub_range_start + int(splitted_byte_range[0]),
-                    }
-                elif is_ad_fragment_start(line):
-                    ad_frag_next = True
-                elif is_ad_fragment_end(line):
-                    ad_frag_next = False
+        # Keys are fetched lazily and shared by all fragments referencing the
+        # same key URI
+        keys = {}
+        keys_lock = threading.Lock()
+
+        def decrypt_fragment(frag_content, fragment):
+            decrypt_info = fragment['decrypt_info']
+            if decrypt_info['METHOD'] != 'AES-128':
+                return frag_content
+            iv = decrypt_info.get('IV') or compat_struct_pack('>8xq', fragment['media_sequence'])
+            key_url = info_dict.get('_decryption_key_url') or decrypt_info['URI']
+            with keys_lock:
+                if key_url not in keys:
+                    keys[key_url] = self.ydl.urlopen(
+                        self._prepare_url(info_dict, key_url)).read()
+            # Don't decrypt the content in tests since the data is explicitly truncated and it's not to a valid block
+            # size (see https://github.com/ytdl-org/youtube-dl/pull/27660). Tests only care that the correct data downloaded,
+            # not what it decrypts to.
+            if test:
+                return frag_content
+            if can_decrypt_frag:
+                return AES.new(keys[key_url], AES.MODE_CBC, iv).decrypt(frag_content)
+            return aes_cbc_decrypt_bytes(frag_content, keys[key_url], iv)
+
+        if live:
+            if not self._download_live_fragments(ctx, playlist, man_url, info_dict, decrypt_fragment):
+                return False
+        else:
+            for frag_index, fragment in enumerate(fragments, 1):
+                fragment['frag_index'] = frag_index
+            # We only download the first fragment during the test, when
+            # resuming the fragments already downloaded are skipped
+            fragments = fragments[:1] if test else fragments[ctx['fragment_index']:]
+            encrypted = any(f['decrypt_info']['METHOD'] == 'AES-128' for f in fragments)
+            # Decrypting a fragment overlaps with the download of the next ones
+            if not self.download_and_append_fragments(
+                    ctx, fragments, info_dict, decrypt_fragment if encrypted else None,
+                    overlap_pack=encrypted):
+                return False
 
         self._finish_frag_download(ctx)
 
         return True
+
+    def _download_live_fragments(self, ctx, playlist, man_url, info_dict, pack_func):
+        """
+        Download the fragments of a live playlist, reloading it to get the
+        new ones (those with a higher media sequence number) until it ends
+        """
+        test = self.params.get('test', False)
+        fragment_retries = self.params.get('fragment_retries', 0)
+        last_media_sequence = None
+        frag_index = 0
+        reload_errors = 0
+        # The playlist has just been loaded by real_download()
+        loaded_at = time.time()
+        try:
+            while True:
+                fragments = playlist['fragments']
+                new_fragments = [
+                    fragment for fragment in fragments
+                    if last_media_sequence is None or fragment['media_sequence'] > last_media_sequence]
+                if (not new_fragments and fragments
+                        and fragments[-1]['media_sequence'] < last_media_sequence):
+                    # The media sequence has been reset (e.g. the encoder
+                    # restarted), resume from the new window
+                    self.report_warning(
+                        'The media sequence of the live playlist has been reset, '
+                        'resuming from its current segments')
+                    new_fragments = fragments
+                elif (new_fragments and last_media_sequence is not None
+                        and new_fragments[0]['media_sequence'] > last_media_sequence + 1):
+                    self.report_warning(
+                        'Missed %d segments of the live playlist, they were removed '
+                        'from it before it was reloaded' % (
+                            new_fragments[0]['media_sequence'] - last_media_sequence - 1))
+                if new_fragments:
+                    last_media_sequence = new_fragments[-1]['media_sequence']
+                    if test:
+                        new_fragments = new_fragments[:1]
+                    for fragment in new_fragments:
+                        frag_index += 1
+                        fragment['frag_index'] = frag_index
+                    if not self.download_and_append_fragments(ctx, new_fragments, info_dict, pack_func):
+                        return False
+                if test or playlist['ended']:
+                    return True
+
+                # Reload the target duration after the previous load, or half
+                # of it if the playlist has not changed (RFC 8216, 6.3.4)
+                target_duration = playlist['target_duration']
+                if target_duration is None:
+                    target_duration = 10
+                interval = target_duration if new_fragments else target_duration / 2
+                time.sleep(max(0, interval - (time.time() - loaded_at)))
+                loaded_at = time.time()
+                try:
+                    man_url, s = self._download_manifest(info_dict, man_url)
+                except compat_urllib_error.URLError as err:
+                    reload_errors += 1
+                    if reload_errors > fragment_retries:
+                        self.report_warning(
+                            'Unable to reload the live playlist (%s), stopping' % error_to_compat_str(err))
+                        return True
+                    self.report_warning(
+                        'Unable to reload the live playlist (%s), retrying (%d/%d)...' % (
+                            error_to_compat_str(err), reload_errors, fragment_retries))
+                    continue
+                reload_errors = 0
+                playlist = self._parse_playlist(s, man_url, info_dict)
+        except KeyboardInterrupt:
+            if not frag_index:
+                raise
+            # Like with ffmpeg, stopping the recording of a live stream is
+            # an expected way to end the download
+            self.to_screen('[%s] Interrupted by user' % self.FD_NAME)
+            return True
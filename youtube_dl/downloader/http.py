@@ -1,8 +1,10 @@
 from __future__ import unicode_literals
 
 import errno
+import json
 import os
 import socket
+import threading
 import time
 import random
 import re
@@ -14,17 +16,54 @@ from ..compat import (
 )
 from ..utils import (
     ContentTooShortError,
+    DownloadCancelled,
+    DownloadError,
     encodeFilename,
     int_or_none,
     sanitize_open,
     sanitized_Request,
+    timeconvert,
     write_xattr,
     XAttrMetadataError,
     XAttrUnavailableError,
 )
 
 
+class _BlockReader(object):
+    """
+    Read the blocks of a response into a reused buffer if it supports
+    readinto(), a block is only valid until the next one is read
+    """
+
+    def __init__(self, data):
+        self._read = data.read
+        self._readinto = getattr(data, 'readinto', None)
+        self._buf = None
+
+    def read(self, size):
+        if self._readinto is None:
+            return self._read(size)
+        if self._buf is None or len(self._buf) < size:
+            self._buf = memoryview(bytearray(size))
+        return self._buf[:self._readinto(self._buf[:size])]
+
+
 class HttpFD(FileDownloader):
+    """
+    Available options (in addition to those of FileDownloader):
+
+    http_connections:   Number of connections to download a file over. Each
+                        connection fetches its own byte range into a
+                        preallocated .part file. Only used if the server
+                        supports range requests.
+    """
+
+    # Ranges smaller than this are not worth an extra connection
+    _MIN_RANGE_SIZE = 1024 * 1024
+
+    def _urlopen(self, request):
+        return self.ydl.urlopen(request)
+
     def real_download(self, filename, info_dict):
         url = info_dict['url']
 
@@ -37,6 +76,9 @@ class HttpFD(FileDownloader):
         ctx.filename = filename
         ctx.tmpfilename = self.temp_name(filename)
         ctx.stream = None
+        # An already opened binary stream to write the data to instead of
+        # the file (used for fragments that are not kept on disk)
+        ctx.dest_stream = info_dict.get('_dest_stream')
 
         # Do not include the Accept-Encoding header
         headers = {'Youtubedl-no-compression': 'True'}
@@ -45,6 +87,16 @@ class HttpFD(FileDownloader):
             headers.update(add_headers)
 
         is_test = self.params.get('test', False)
+
+        if ctx.dest_stream is None and filename != '-' and not is_test:
+            connections = self.params.get('http_connections') or 1
+            # An interrupted parallel download has to be resumed as such
+            # since its .part file is preallocated
+            if connections > 1 or self._read_ranges_state(filename) is not None:
+                result = self._download_parallel_ranges(filename, info_dict, headers, connections)
+                if result is not None:
+                    return result
+
         chunk_size = self._TEST_FILE_SIZE if is_test else (
             info_dict.get('downloader_options', {}).get('http_chunk_size')
             or self.params.get('http_chunk_size') or 0)
@@ -56,7 +108,7 @@ class HttpFD(FileDownloader):
         ctx.start_time = time.time()
         ctx.chunk_size = None
 
-        if self.params.get('continuedl', True):
+        if self.params.get('continuedl', True) and ctx.dest_stream is None:
             # Establish possible resume length
             if os.path.isfile(encodeFilename(ctx.tmpfilename)):
                 ctx.resume_len = os.path.getsize(
@@ -107,7 +159,7 @@ class HttpFD(FileDownloader):
             # Establish connection
             try:
                 try:
-                    ctx.data = self.ydl.urlopen(request)
+                    ctx.data = self._urlopen(request)
                 except (compat_urllib_error.URLError, ) as err:
                     # reason may not be available, e.g. for urllib2.HTTPError on python 2.6
                     reason = getattr(err, 'reason', None)
@@ -151,7 +203,7 @@ class HttpFD(FileDownloader):
                     # Unable to resume (requested range not satisfiable)
                     try:
                         # Open the connection again without the range header
-                        ctx.data = self.ydl.urlopen(
+                        ctx.data = self._urlopen(
                             sanitized_Request(url, None, headers))
                         content_length = ctx.data.info()['Content-Length']
                     except (compat_urllib_error.HTTPError, ) as err:
@@ -169,7 +221,8 @@ class HttpFD(FileDownloader):
                             # completely downloaded if the file size differs less than 100 bytes from
                             # the one in the hard drive.
                             self.report_file_already_downloaded(ctx.filename)
-                            self.try_rename(ctx.tmpfilename, ctx.filename)
+                            if ctx.dest_stream is None:
+                                self.try_rename(ctx.tmpfilename, ctx.filename)
                             self._hook_progress({
                                 'filename': ctx.filename,
                                 'status': 'finished',
@@ -217,25 +270,29 @@ class HttpFD(FileDownloader):
 
             byte_counter = 0 + ctx.resume_len
             block_size = ctx.block_size
+            rate = None
+            reader = _BlockReader(ctx.data)
+            limiter = self.rate_limiter(url)
             start = time.time()
 
-            # measure time over whole while-loop, so slow_down() and best_block_size() work together properly
+            # measure time over whole while-loop, so throttle() and smooth_block_size() work together properly
             now = None  # needed for slow_down() in the first loop run
             before = start  # start measuring
 
             def retry(e):
                 to_stdout = ctx.tmpfilename == '-'
+                to_stream = to_stdout or ctx.dest_stream is not None
                 if ctx.stream is not None:
-                    if not to_stdout:
+                    if not to_stream:
                         ctx.stream.close()
                     ctx.stream = None
-                ctx.resume_len = byte_counter if to_stdout else os.path.getsize(encodeFilename(ctx.tmpfilename))
+                ctx.resume_len = byte_counter if to_stream else os.path.getsize(encodeFilename(ctx.tmpfilename))
                 raise RetryDownload(e)
 
             while True:
                 try:
                     # Download and write
-                    data_block = ctx.data.read(block_size if data_len is None else min(block_size, data_len - byte_counter))
+                    data_block = reader.read(block_size if data_len is None else min(block_size, data_len - byte_counter))
                 # socket.timeout is a subclass of socket.error but may not have
                 # errno set
                 except socket.timeout as e:
@@ -254,7 +311,13 @@ class HttpFD(FileDownloader):
                     break
 
                 # Open destination file just in time
-                if ctx.stream is None:
+                if ctx.stream is None and ctx.dest_stream is not None:
+                    ctx.stream = ctx.dest_stream
+                    if ctx.open_mode == 'wb':
+                        # Resuming is not possible, drop what was received so far
+                        ctx.stream.seek(0)
+                        ctx.stream.truncate()
+                elif ctx.stream is None:
                     try:
                         ctx.stream, ctx.tmpfilename = sanitize_open(
                             ctx.tmpfilename, ctx.open_mode)
@@ -279,7 +342,7 @@ class HttpFD(FileDownloader):
                     return False
 
                 # Apply rate limit
-                self.slow_down(start, now, byte_counter - ctx.resume_len)
+                limiter.throttle(len(data_block))
 
                 # end measuring of one loop run
                 now = time.time()
@@ -287,7 +350,9 @@ class HttpFD(FileDownloader):
 
                 # Adjust block size
                 if not self.params.get('noresizebuffer', False):
-                    block_size = self.best_block_size(after - before, len(data_block))
+                    rate, block_size = self.smooth_block_size(rate, after - before, len(data_block), block_size)
+                    if limiter:
+                        block_size = min(block_size, limiter.max_block_size)
 
                 before = after
 
@@ -321,7 +386,7 @@ class HttpFD(FileDownloader):
                 self.to_stderr('\n')
                 self.report_error('Did not get any data blocks')
                 return False
-            if ctx.tmpfilename != '-':
+            if ctx.tmpfilename != '-' and ctx.dest_stream is None:
                 ctx.stream.close()
 
             if data_len is not None and byte_counter != data_len:
@@ -330,11 +395,15 @@ class HttpFD(FileDownloader):
                     retry(err)
                 raise err
 
-            self.try_rename(ctx.tmpfilename, ctx.filename)
+            last_modified = ctx.data.info().get('last-modified', None)
+            if ctx.dest_stream is None:
+                self.try_rename(ctx.tmpfilename, ctx.filename)
 
-            # Update file modification time
-            if self.params.get('updatetime', True):
-                info_dict['filetime'] = self.try_utime(ctx.filename, ctx.data.info().get('last-modified', None))
+                # Update file modification time
+                if self.params.get('updatetime', True):
+                    info_dict['filetime'] = self.try_utime(ctx.filename, last_modified)
+            elif self.params.get('updatetime', True) and last_modified:
+                info_dict['filetime'] = timeconvert(last_modified)
 
             self._hook_progress({
                 'downloaded_bytes': byte_counter,
@@ -362,3 +431,251 @@ class HttpFD(FileDownloader):
 
         self.report_error('giving up after %s retries' % retries)
         return False
+
+    def _read_ranges_state(self, filename):
+        """Return the state of an interrupted parallel download or None"""
+        ytdl_filename = encodeFilename(self.ytdl_filename(filename))
+        if (not self.params.get('continuedl', True)
+                or not os.path.isfile(encodeFilename(self.temp_name(filename)))
+                or not os.path.isfile(ytdl_filename)):
+            return None
+        try:
+            with open(ytdl_filename, 'r') as f:
+                downloader = json.loads(f.read())['downloader']
+            total_bytes = downloader['total_bytes']
+            ranges = [{
+                'start': int(r['start']),
+                'end': int(r['end']),
+                'downloaded': int(r['downloaded']),
+            } for r in downloader['ranges']]
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+        return {
+            'total_bytes': total_bytes,
+            'ranges': ranges,
+        }
+
+    def _write_ranges_state(self, filename, state):
+        stream, _ = sanitize_open(self.ytdl_filename(filename), 'w')
+        stream.write(json.dumps({'downloader': state}))
+        stream.close()
+
+    def _download_parallel_ranges(self, filename, info_dict, headers, connections):
+        """
+        Download the file over several connections at once.
+
+        Returns None if the server does not support range requests, in that
+        case the regular download should be used.
+        """
+        url = info_dict['url']
+        tmpfilename = self.temp_name(filename)
+        ytdl_filename = encodeFilename(self.ytdl_filename(filename))
+        state = self._read_ranges_state(filename)
+        if (state is None and self.params.get('continuedl', True)
+                and os.path.isfile(encodeFilename(tmpfilename))):
+            # Resume a regular download as such
+            return None
+
+        def discard_state():
+            for fn in (encodeFilename(tmpfilename), ytdl_filename):
+                if os.path.isfile(fn):
+                    os.remove(fn)
+
+        request = sanitized_Request(url, None, headers)
+        request.add_header('Range', 'bytes=0-0')
+        try:
+            probe = self._urlopen(request)
+        except (compat_urllib_error.URLError, socket.error):
+            # Let the regular download deal with the error
+            probe = None
+        content_range_m = None
+        if probe is not None:
+            content_range_m = re.match(
+                r'bytes 0-0/(\d+)$', probe.headers.get('Content-Range') or '')
+            last_modified = probe.headers.get('Last-Modified')
+            # Read the body so that the connection may be reused
+            probe.read()
+            probe.close()
+        if not content_range_m:
+            if state is not None:
+                self.report_warning(
+                    'Unable to resume parallel download. Restarting from the beginning...')
+                discard_state()
+            return None
+        total_bytes = int(content_range_m.group(1))
+
+        min_data_len = self.params.get('min_filesize')
+        max_data_len = self.params.get('max_filesize')
+        if min_data_len is not None and total_bytes < min_data_len:
+            self.to_screen('\r[download] File is smaller than min-filesize (%s bytes < %s bytes). Aborting.' % (total_bytes, min_data_len))
+            return False
+        if max_data_len is not None and total_bytes > max_data_len:
+            self.to_screen('\r[download] File is larger than max-filesize (%s bytes > %s bytes). Aborting.' % (total_bytes, max_data_len))
+            return False
+
+        if state is not None and state['total_bytes'] != total_bytes:
+            self.report_warning(
+                'File size has changed since the download was interrupted. Restarting from the beginning...')
+            discard_state()
+            state = None
+
+        if state is None:
+            connections = min(connections, total_bytes // self._MIN_RANGE_SIZE)
+            if connections <= 1:
+                return None
+            range_size = -(-total_bytes // connections)
+            state = {
+                'total_bytes': total_bytes,
+                'ranges': [{
+                    'start': start,
+                    'end': min(start + range_size, total_bytes) - 1,
+                    'downloaded': 0,
+                } for start in range(0, total_bytes, range_size)],
+            }
+            try:
+                stream, tmpfilename = sanitize_open(tmpfilename, 'wb')
+                stream.truncate(total_bytes)
+                stream.close()
+            except (OSError, IOError) as err:
+                self.report_error('unable to open for writing: %s' % str(err))
+                return False
+        else:
+            self.report_resuming_byte(sum(r['downloaded'] for r in state['ranges']))
+        self._write_ranges_state(filename, state)
+        self.report_destination(filename)
+
+        retries = self.params.get('retries', 0)
+        lock = threading.Lock()
+        # Set when a connection fails or the download is cancelled, the
+        # other connections stop at their next block
+        abort = threading.Event()
+        start_time = time.time()
+        progress = {
+            'downloaded_bytes': sum(r['downloaded'] for r in state['ranges']),
+            'state_written': start_time,
+        }
+        resume_len = progress['downloaded_bytes']
+
+        limiter = self.rate_limiter(url)
+
+        def report_block(r, block_len):
+            with lock:
+                r['downloaded'] += block_len
+                progress['downloaded_bytes'] += block_len
+                now = time.time()
+                if now - progress['state_written'] >= 1:
+                    self._write_ranges_state(filename, state)
+                    progress['state_written'] = now
+                downloaded_bytes = progress['downloaded_bytes']
+                self._hook_progress({
+                    'status': 'downloading',
+                    'downloaded_bytes': downloaded_bytes,
+                    'total_bytes': total_bytes,
+                    'tmpfilename': tmpfilename,
+                    'filename': filename,
+                    'eta': self.calc_eta(start_time, now, total_bytes - resume_len, downloaded_bytes - resume_len),
+                    'speed': self.calc_speed(start_time, now, downloaded_bytes - resume_len),
+                    'elapsed': now - start_time,
+                })
+            limiter.throttle(block_len)
+
+        def download_range(r, stream):
+            count = 0
+            block_size = self.params.get('buffersize', 1024)
+            rate = None
+            while r['start'] + r['downloaded'] <= r['end'] and not abort.is_set():
+                offset = r['start'] + r['downloaded']
+                request = sanitized_Request(url, None, headers)
+                request.add_header('Range', 'bytes=%d-%d' % (offset, r['end']))
+                try:
+                    data = self._urlopen(request)
+                    if not (data.headers.get('Content-Range') or '').startswith('bytes %d-' % offset):
+                        data.close()
+                        raise DownloadError('server ignored the requested range %d-%d' % (offset, r['end']))
+                    stream.seek(offset)
+                    reader = _BlockReader(data)
+                    before = time.time()
+                    while True:
+                        left = r['end'] + 1 - (r['start'] + r['downloaded'])
+                        if left <= 0 or abort.is_set():
+                            break
+                        data_block = reader.read(min(block_size, left))
+                        if not data_block:
+                            break
+                        stream.write(data_block)
+                        report_block(r, len(data_block))
+                        after = time.time()
+                        if not self.params.get('noresizebuffer', False):
+                            rate, block_size = self.smooth_block_size(rate, after - before, len(data_block), block_size)
+                            if limiter:
+                                block_size = min(block_size, limiter.max_block_size)
+                        before = after
+                    data.close()
+                    if abort.is_set():
+                        return
+                    if r['start'] + r['downloaded'] <= r['end']:
+                        raise ContentTooShortError(
+                            r['start'] + r['downloaded'] - offset, r['end'] + 1 - offset)
+                except compat_urllib_error.HTTPError as err:
+                    if err.code < 500 or err.code >= 600:
+                        raise
+                    err_to_retry = err
+                except (socket.error, ContentTooShortError) as err:
+                    err_to_retry = err
+                else:
+                    continue
+                count += 1
+                if count > retries:
+                    raise DownloadError('giving up after %s retries' % retries)
+                self.report_retry(err_to_retry, count, retries)
+
+        errors = []
+
+        def worker(r):
+            try:
+                # Unbuffered so that the bytes recorded in the .ytdl file
+                # have actually been handed over to the OS
+                with open(encodeFilename(tmpfilename), 'r+b', 0) as stream:
+                    download_range(r, stream)
+            except Exception as err:
+                errors.append(err)
+                abort.set()
+
+        threads = [
+            threading.Thread(target=worker, args=(r, ))
+            for r in state['ranges'] if r['start'] + r['downloaded'] <= r['end']]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    # Join with a timeout so that KeyboardInterrupt is
+                    # delivered on python 2 as well
+                    t.join(1)
+        except BaseException:
+            abort.set()
+            raise
+
+        self._write_ranges_state(filename, state)
+        for err in errors:
+            # The .part and .ytdl files are kept for resuming
+            if isinstance(err, DownloadCancelled):
+                raise err
+        if errors:
+            self.report_error(str(errors[0]))
+            return False
+
+        os.remove(ytdl_filename)
+        self.try_rename(tmpfilename, filename)
+        if self.params.get('updatetime', True):
+            info_dict['filetime'] = self.try_utime(filename, last_modified)
+
+        self._hook_progress({
+            'downloaded_bytes': total_bytes,
+            'total_bytes': total_bytes,
+            'filename': filename,
+            'status': 'finished',
+            'elapsed': time.time() - start_time,
+        })
+        return True
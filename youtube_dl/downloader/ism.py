@@ -5,10 +5,7 @@ import binascii
 import io
 
 from .fragment import FragmentFD
-from ..compat import (
-    compat_Struct,
-    compat_urllib_error,
-)
+from ..compat import compat_Struct
 
 
 u8 = compat_Struct('>B')
@@ -221,38 +218,23 @@ class IsmFD(FragmentFD):
 
         self._prepare_and_start_frag_download(ctx)
 
-        fragment_retries = self.params.get('fragment_retries', 0)
-        skip_unavailable_fragments = self.params.get('skip_unavailable_fragments', True)
-
-        track_written = False
-        frag_index = 0
-        for i, segment in enumerate(segments):
-            frag_index += 1
-            if frag_index <= ctx['fragment_index']:
-                continue
-            count = 0
-            while count <= fragment_retries:
-                try:
-                    success, frag_content = self._download_fragment(ctx, segment['url'], info_dict)
-                    if not success:
-                        return False
-                    if not track_written:
-                        tfhd_data = extract_box_data(frag_content, [b'moof', b'traf', b'tfhd'])
-                        info_dict['_download_params']['track_id'] = u32.unpack(tfhd_data[4:8])[0]
-                        write_piff_header(ctx['dest_stream'], info_dict['_download_params'])
-                        track_written = True
-                    self._append_fragment(ctx, frag_content)
-                    break
-                except compat_urllib_error.HTTPError as err:
-                    count += 1
-                    if count <= fragment_retries:
-                        self.report_retry_fragment(err, frag_index, count, fragment_retries)
-            if count > fragment_retries:
-                if skip_unavailable_fragments:
-                    self.report_skip_fragment(frag_index)
-                    continue
-                self.report_error('giving up after %s fragment retries' % fragment_retries)
-                return False
+        track_written = [False]
+
+        def pack_fragment(frag_content, _):
+            if not track_written[0]:
+                tfhd_data = extract_box_data(frag_content, [b'moof', b'traf', b'tfhd'])
+                info_dict['_download_params']['track_id'] = u32.unpack(tfhd_data[4:8])[0]
+                write_piff_header(ctx['dest_stream'], info_dict['_download_params'])
+                track_written[0] = True
+            return frag_content
+
+        fragments = [{
+            'frag_index': i + 1,
+            'url': segment['url'],
+        } for i, segment in enumerate(segments)]
+
+        if not self.download_and_append_fragments(ctx, fragments, info_dict, pack_fragment):
+            return False
 
         self._finish_frag_download(ctx)
 
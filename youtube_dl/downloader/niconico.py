@@ -8,7 +8,6 @@ except ImportError:
 
 from .common import FileDownloader
 from ..downloader import get_suitable_downloader
-from ..extractor.niconico import NiconicoIE
 from ..utils import sanitized_Request
 
 
@@ -20,6 +19,8 @@ class NiconicoDmcFD(FileDownloader):
     def real_download(self, filename, info_dict):
         self.to_screen('[%s] Downloading from DMC' % self.FD_NAME)
 
+        # Importing any extractor loads all of them, do it only when needed
+        from ..extractor.niconico import NiconicoIE
         ie = NiconicoIE(self.ydl)
         info_dict, heartbeat_info_dict = ie._get_heartbeat_info(info_dict)
 
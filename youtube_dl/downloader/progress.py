@@ -0,0 +1,147 @@
+from __future__ import unicode_literals
+
+import io
+import json
+import sys
+import threading
+import time
+
+from ..compat import (
+    compat_os_name,
+    compat_str,
+)
+from ..utils import (
+    encodeFilename,
+    float_or_none,
+)
+
+
+# The entries of a progress hook status (see YoutubeDL) written as events
+_EVENT_FIELDS = (
+    'status', 'filename', 'tmpfilename', 'downloaded_bytes', 'total_bytes',
+    'total_bytes_estimate', 'elapsed', 'eta', 'speed', 'fragment_index',
+    'fragment_count',
+)
+
+
+def progress_event(status):
+    """Return the JSON-serializable event of a progress hook status"""
+    event = dict((k, status[k]) for k in _EVENT_FIELDS if status.get(k) is not None)
+    event['time'] = time.time()
+    return event
+
+
+class ProgressAggregator(object):
+    """
+    Progress display shared by the downloads of a YoutubeDL instance.
+
+    Downloads report every status change with update(), which only records
+    it: the latest status of the active downloads is rendered at most every
+    progress_interval seconds (0.1 by default), one line per download. The
+    status of a finished download is always rendered, as a permanent line.
+
+    If the progress_json parameter is set, the statuses are also written to
+    that file ("-" for stdout) as JSON lines (see progress_event), with the
+    same rate limit except for "finished" and "error" ones.
+    """
+
+    def __init__(self, ydl):
+        self.ydl = ydl
+        self._lock = threading.Lock()
+        # Active downloads, by filename, and their order of appearance
+        self._active = {}
+        self._order = []
+        self._changed = set()
+        self._last_flush = None
+        self._rendered_lines = 0
+        self._prev_line_length = 0
+        self._json_file = None
+
+    def update(self, status, formatter=None):
+        """
+        Record a progress hook status, formatter returns the progress line
+        of a status or is None if the download is not displayed
+        """
+        key = status['filename']
+        with self._lock:
+            now = time.time()
+            if status['status'] == 'downloading':
+                if key not in self._active:
+                    self._order.append(key)
+                self._active[key] = (formatter, dict(status))
+                self._changed.add(key)
+                interval = float_or_none(self.ydl.params.get('progress_interval'))
+                if interval is None:
+                    interval = 0.1
+                if self._last_flush is not None and now - self._last_flush < interval:
+                    return
+                self._flush(now)
+            else:
+                if self._active.pop(key, None) is not None:
+                    self._order.remove(key)
+                self._changed.discard(key)
+                self._flush(now, status, formatter and formatter(status))
+
+    def close(self):
+        with self._lock:
+            if self._json_file not in (None, sys.stdout):
+                self._json_file.close()
+            self._json_file = None
+
+    def _write_events(self, statuses):
+        filename = self.ydl.params.get('progress_json')
+        if not filename or not statuses:
+            return
+        if self._json_file is None:
+            self._json_file = (
+                sys.stdout if filename == '-'
+                else io.open(encodeFilename(filename), 'a', encoding='utf-8'))
+        lines = ''.join(
+            compat_str(json.dumps(progress_event(s))) + '\n' for s in statuses)
+        if self._json_file is sys.stdout:
+            self.ydl._write_string(lines, sys.stdout)
+        else:
+            self._json_file.write(lines)
+        self._json_file.flush()
+
+    def _flush(self, now, final_status=None, final_line=None):
+        self._last_flush = now
+        statuses = [self._active[key][1] for key in self._order if key in self._changed]
+        if final_status is not None:
+            statuses.append(final_status)
+        self._changed.clear()
+        self._write_events(statuses)
+
+        lines = []
+        for key in self._order:
+            formatter, status = self._active[key]
+            if formatter:
+                lines.append(formatter(status))
+        if final_line is not None:
+            self._render([final_line], permanent=True)
+        if lines or (final_line is None and self._rendered_lines):
+            self._render(lines)
+        if lines:
+            self.ydl.to_console_title('youtube-dl ' + lines[0])
+
+    def _render(self, lines, permanent=False):
+        lines = ['[download] ' + line for line in lines]
+        if self.ydl.params.get('progress_with_newline', False):
+            for line in lines:
+                self.ydl.to_screen(line)
+            return
+        if compat_os_name != 'nt' and self.ydl._screen_file.isatty():
+            # Go back to the first line of the display and redraw it
+            up = '\x1b[%dA' % (self._rendered_lines - 1) if self._rendered_lines > 1 else ''
+            self.ydl.to_screen(
+                up + '\r\x1b[J' + '\n'.join(lines), skip_eol=not permanent)
+            self._rendered_lines = 0 if permanent else len(lines)
+            return
+        # The cursor can't be moved up, concurrent downloads share one line
+        fullmsg = ' | '.join(lines)
+        if compat_os_name == 'nt':
+            if self._prev_line_length > len(fullmsg):
+                fullmsg += ' ' * (self._prev_line_length - len(fullmsg))
+            self._prev_line_length = 0 if permanent else len(fullmsg)
+        self.ydl.to_screen('\r' + fullmsg, skip_eol=not permanent)
+        self._rendered_lines = 0 if permanent else len(lines)
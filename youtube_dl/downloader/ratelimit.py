@@ -0,0 +1,90 @@
+from __future__ import division, unicode_literals
+
+import threading
+import time
+
+from ..compat import compat_urllib_parse_urlparse
+
+
+class TokenBucket(object):
+    """
+    Token bucket letting rate bytes/s through on average, in bursts of at
+    most burst bytes (a tenth of a second worth of data by default).
+
+    consume() never blocks: the bytes are taken even if it leaves the bucket
+    in debt and the caller has to wait for the returned number of seconds,
+    so that concurrent consumers are throttled in proportion to what they
+    take.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = burst or max(self.rate / 10, 1024)
+        self._tokens = self.burst
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def _get_bucket(key, rate):
+    with _buckets_lock:
+        bucket = _buckets.get((key, rate))
+        if bucket is None:
+            bucket = _buckets[(key, rate)] = TokenBucket(rate)
+        return bucket
+
+
+class RateLimiter(object):
+    """
+    Rate limit of a download, drawing from the process-wide buckets of the
+    global rate limit and of the rate limit per host of its URL.
+
+    The buckets are shared by all the downloads with the same limits,
+    whatever the downloader or YoutubeDL instance.
+    """
+
+    def __init__(self, rate=None, rate_per_host=None, url=None):
+        self._buckets = []
+        if rate:
+            self._buckets.append(_get_bucket(None, rate))
+        host = url and compat_urllib_parse_urlparse(url).hostname
+        if rate_per_host and host:
+            self._buckets.append(_get_bucket(host.lower(), rate_per_host))
+
+    def __bool__(self):
+        return bool(self._buckets)
+
+    __nonzero__ = __bool__
+
+    @property
+    def rate(self):
+        """The maximum rate of the download in bytes/s, None if unlimited"""
+        return min(b.rate for b in self._buckets) if self._buckets else None
+
+    @property
+    def max_block_size(self):
+        """The size of the blocks to read not to sleep in large steps"""
+        return int(min(b.burst for b in self._buckets)) if self._buckets else None
+
+    def delay(self, byte_count):
+        """Account for byte_count downloaded bytes, return the seconds to wait"""
+        if not self._buckets or byte_count <= 0:
+            return 0
+        return max(b.consume(byte_count) for b in self._buckets)
+
+    def throttle(self, byte_count):
+        """Account for byte_count downloaded bytes, sleeping if over the limits"""
+        wait = self.delay(byte_count)
+        if wait > 0:
+            time.sleep(wait)
@@ -1,6 +1,12 @@
 from __future__ import unicode_literals
 
+import os
+
 try:
+    # Set YOUTUBE_DL_NO_LAZY_EXTRACTORS to import the extractors themselves,
+    # e.g. while working on them with a stale lazy_extractors.py around
+    if os.environ.get('YOUTUBE_DL_NO_LAZY_EXTRACTORS'):
+        raise ImportError('lazy extractors are disabled')
     from .lazy_extractors import *
     from .lazy_extractors import _ALL_CLASSES
     _LAZY_LOADER = True
@@ -36,6 +36,7 @@ from ..downloader.f4m import (
     get_base_url,
     remove_encrypted_media,
 )
+from ..m3u8 import parse_m3u8_playlist
 from ..utils import (
     NO_DEFAULT,
     age_restricted,
@@ -62,7 +63,6 @@ from ..utils import (
     parse_codecs,
     parse_duration,
     parse_iso8601,
-    parse_m3u8_attributes,
     parse_resolution,
     RegexNotFoundError,
     sanitized_Request,
@@ -1664,11 +1664,6 @@ class InfoExtractor(object):
 
         formats = []
 
-        format_url = lambda u: (
-            u
-            if re.match(r'^https?://', u)
-            else compat_urlparse.urljoin(m3u8_url, u))
-
         # References:
         # 1. https://tools.ietf.org/html/draft-pantos-http-live-streaming-21
         # 2. https://github.com/ytdl-org/youtube-dl/issues/12211
@@ -1694,11 +1689,16 @@ class InfoExtractor(object):
                 'preference': preference,
             }]
 
+        format_url = lambda u: (
+            u
+            if re.match(r'^https?://', u)
+            else compat_urlparse.urljoin(m3u8_url, u))
+
+        playlist = parse_m3u8_playlist(m3u8_doc, m3u8_url)
         groups = {}
         last_stream_inf = {}
 
-        def extract_media(x_media_line):
-            media = parse_m3u8_attributes(x_media_line)
+        def extract_media(media):
             # As per [1, 4.3.4.1] TYPE, GROUP-ID and NAME are REQUIRED
             media_type, group_id, name = media.get('TYPE'), media.get('GROUP-ID'), media.get('NAME')
             if not (media_type and group_id and name):
@@ -1747,88 +1747,81 @@ class InfoExtractor(object):
         # parse EXT-X-MEDIA tags before EXT-X-STREAM-INF in order to have the
         # chance to detect video only formats when EXT-X-STREAM-INF tags
         # precede EXT-X-MEDIA tags in HLS manifest such as [3].
-        for line in m3u8_doc.splitlines():
-            if line.startswith('#EXT-X-MEDIA:'):
-                extract_media(line)
-
-        for line in m3u8_doc.splitlines():
-            if line.startswith('#EXT-X-STREAM-INF:'):
-                last_stream_inf = parse_m3u8_attributes(line)
-            elif line.startswith('#') or not line.strip():
-                continue
-            else:
-                tbr = float_or_none(
-                    last_stream_inf.get('AVERAGE-BANDWIDTH')
-                    or last_stream_inf.get('BANDWIDTH'), scale=1000)
-                format_id = []
-                if m3u8_id:
-                    format_id.append(m3u8_id)
-                stream_name = build_stream_name()
-                # Bandwidth of live streams may differ over time thus making
-                # format_id unpredictable. So it's better to keep provided
-                # format_id intact.
-                if not live:
-                    format_id.append(stream_name if stream_name else '%d' % (tbr if tbr else len(formats)))
-                manifest_url = format_url(line.strip())
-                f = {
-                    'format_id': '-'.join(format_id),
-                    'url': manifest_url,
-                    'manifest_url': m3u8_url,
-                    'tbr': tbr,
-                    'ext': ext,
-                    'fps': float_or_none(last_stream_inf.get('FRAME-RATE')),
-                    'protocol': entry_protocol,
-                    'preference': preference,
-                }
-                resolution = last_stream_inf.get('RESOLUTION')
-                if resolution:
-                    mobj = re.search(r'(?P<width>\d+)[xX](?P<height>\d+)', resolution)
-                    if mobj:
-                        f['width'] = int(mobj.group('width'))
-                        f['height'] = int(mobj.group('height'))
-                # Unified Streaming Platform
-                mobj = re.search(
-                    r'audio.*?(?:%3D|=)(\d+)(?:-video.*?(?:%3D|=)(\d+))?', f['url'])
+        for media in playlist['media']:
+            extract_media(media)
+
+        for variant in playlist['variants']:
+            last_stream_inf = variant['stream_inf']
+            tbr = float_or_none(
+                last_stream_inf.get('AVERAGE-BANDWIDTH')
+                or last_stream_inf.get('BANDWIDTH'), scale=1000)
+            format_id = []
+            if m3u8_id:
+                format_id.append(m3u8_id)
+            stream_name = build_stream_name()
+            # Bandwidth of live streams may differ over time thus making
+            # format_id unpredictable. So it's better to keep provided
+            # format_id intact.
+            if not live:
+                format_id.append(stream_name if stream_name else '%d' % (tbr if tbr else len(formats)))
+            manifest_url = variant['url']
+            f = {
+                'format_id': '-'.join(format_id),
+                'url': manifest_url,
+                'manifest_url': m3u8_url,
+                'tbr': tbr,
+                'ext': ext,
+                'fps': float_or_none(last_stream_inf.get('FRAME-RATE')),
+                'protocol': entry_protocol,
+                'preference': preference,
+            }
+            resolution = last_stream_inf.get('RESOLUTION')
+            if resolution:
+                mobj = re.search(r'(?P<width>\d+)[xX](?P<height>\d+)', resolution)
                 if mobj:
-                    abr, vbr = mobj.groups()
-                    abr, vbr = float_or_none(abr, 1000), float_or_none(vbr, 1000)
-                    f.update({
-                        'vbr': vbr,
-                        'abr': abr,
-                    })
-                codecs = parse_codecs(last_stream_inf.get('CODECS'))
-                f.update(codecs)
-                audio_group_id = last_stream_inf.get('AUDIO')
-                # As per [1, 4.3.4.1.1] any EXT-X-STREAM-INF tag which
-                # references a rendition group MUST have a CODECS attribute.
-                # However, this is not always respected, for example, [2]
-                # contains EXT-X-STREAM-INF tag which references AUDIO
-                # rendition group but does not have CODECS and despite
-                # referencing an audio group it represents a complete
-                # (with audio and video) format. So, for such cases we will
-                # ignore references to rendition groups and treat them
-                # as complete formats.
-                if audio_group_id and codecs and f.get('vcodec') != 'none':
-                    audio_group = groups.get(audio_group_id)
-                    if audio_group and audio_group[0].get('URI'):
-                        # TODO: update acodec for audio only formats with
-                        # the same GROUP-ID
-                        f['acodec'] = 'none'
-                formats.append(f)
-
-                # for DailyMotion
-                progressive_uri = last_stream_inf.get('PROGRESSIVE-URI')
-                if progressive_uri:
-                    http_f = f.copy()
-                    del http_f['manifest_url']
-                    http_f.update({
-                        'format_id': f['format_id'].replace('hls-', 'http-'),
-                        'protocol': 'http',
-                        'url': progressive_uri,
-                    })
-                    formats.append(http_f)
-
-                last_stream_inf = {}
+                    f['width'] = int(mobj.group('width'))
+                    f['height'] = int(mobj.group('height'))
+            # Unified Streaming Platform
+            mobj = re.search(
+                r'audio.*?(?:%3D|=)(\d+)(?:-video.*?(?:%3D|=)(\d+))?', f['url'])
+            if mobj:
+                abr, vbr = mobj.groups()
+                abr, vbr = float_or_none(abr, 1000), float_or_none(vbr, 1000)
+                f.update({
+                    'vbr': vbr,
+                    'abr': abr,
+                })
+            codecs = parse_codecs(last_stream_inf.get('CODECS'))
+            f.update(codecs)
+            audio_group_id = last_stream_inf.get('AUDIO')
+            # As per [1, 4.3.4.1.1] any EXT-X-STREAM-INF tag which
+            # references a rendition group MUST have a CODECS attribute.
+            # However, this is not always respected, for example, [2]
+            # contains EXT-X-STREAM-INF tag which references AUDIO
+            # rendition group but does not have CODECS and despite
+            # referencing an audio group it represents a complete
+            # (with audio and video) format. So, for such cases we will
+            # ignore references to rendition groups and treat them
+            # as complete formats.
+            if audio_group_id and codecs and f.get('vcodec') != 'none':
+                audio_group = groups.get(audio_group_id)
+                if audio_group and audio_group[0].get('URI'):
+                    # TODO: update acodec for audio only formats with
+                    # the same GROUP-ID
+                    f['acodec'] = 'none'
+            formats.append(f)
+
+            # for DailyMotion
+            progressive_uri = last_stream_inf.get('PROGRESSIVE-URI')
+            if progressive_uri:
+                http_f = f.copy()
+                del http_f['manifest_url']
+                http_f.update({
+                    'format_id': f['format_id'].replace('hls-', 'http-'),
+                    'protocol': 'http',
+                    'url': progressive_uri,
+                })
+                formats.append(http_f)
         return formats
 
     @staticmethod
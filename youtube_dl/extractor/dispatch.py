@@ -0,0 +1,388 @@
+from __future__ import unicode_literals
+
+import itertools
+import re
+import threading
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from ..compat import compat_chr
+
+# Placeholders used while expanding a _VALID_URL: a part that cannot be
+# enumerated, one that may also contain a slash and the end of the string ($)
+_WILDCARD = '\0'
+_ANY = '\x02'
+_END = '\x01'
+_HOST_TERMINATORS = '/?#' + _END
+_MAX_EXPANSIONS = 256
+_PREFIX_LENGTH = 4
+
+_SCHEME_RE = re.compile(r'[a-zA-Z][a-zA-Z0-9+.-]*://')
+_PARTIAL_SCHEME_RE = re.compile(r'[a-zA-Z][a-zA-Z0-9+.-]*:/{0,2}$')
+_PORT_RE = re.compile(r':[^.@]*$')
+
+_AT_END = (sre_parse.AT_END, sre_parse.AT_END_STRING)
+_ZERO_WIDTH = (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT)
+
+_host_keys_cache = {}
+
+
+class _NotKeyable(Exception):
+    pass
+
+
+def _category_matches(category, char):
+    name = str(category).upper()
+    if 'DIGIT' in name:
+        res = char.isdigit()
+    elif 'WORD' in name:
+        res = char.isalnum() or char == '_'
+    elif 'SPACE' in name:
+        res = char.isspace()
+    else:
+        return True
+    return not res if 'NOT' in name else res
+
+
+def _can_match(nodes, char):
+    """Conservatively tell whether the parsed nodes can consume char"""
+    code = ord(char)
+    for op, av in nodes:
+        if op is sre_parse.LITERAL:
+            res = av == code
+        elif op is sre_parse.NOT_LITERAL:
+            res = av != code
+        elif op is sre_parse.IN:
+            negate = False
+            res = False
+            for item_op, item_av in av:
+                if item_op is sre_parse.NEGATE:
+                    negate = True
+                elif item_op is sre_parse.LITERAL:
+                    res = res or item_av == code
+                elif item_op is sre_parse.RANGE:
+                    res = res or item_av[0] <= code <= item_av[1]
+                elif item_op is sre_parse.CATEGORY:
+                    res = res or _category_matches(item_av, char)
+                else:
+                    res = True
+            res = res != negate
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            res = _can_match(av[2], char)
+        elif op is sre_parse.SUBPATTERN:
+            res = _can_match(av[-1], char)
+        elif op is sre_parse.BRANCH:
+            res = any(_can_match(branch, char) for branch in av[1])
+        elif op in _ZERO_WIDTH:
+            res = False
+        else:
+            res = True
+        if res:
+            return True
+    return False
+
+
+def _host_start(partial):
+    """
+    Return the known start of the host of a partial expansion and whether it
+    is the whole host, or None if even its start is not known yet
+    """
+    mobj = _SCHEME_RE.match(partial)
+    if mobj:
+        rest = partial[mobj.end():]
+    elif _PARTIAL_SCHEME_RE.match(partial):
+        # May still turn into a scheme
+        return None
+    else:
+        rest = partial
+    for i, c in enumerate(rest):
+        if c in _HOST_TERMINATORS:
+            return rest[:i], True
+        if c == _ANY:
+            return rest[:i], False
+    return rest, False
+
+
+def _host_of(partial):
+    """Return the host of a partial expansion or None if it is not complete yet"""
+    start = _host_start(partial)
+    if start is None or not start[1]:
+        return None
+    return start[0]
+
+
+def _advance(partials, suffix):
+    partials = [p + suffix for p in partials]
+    if suffix == _ANY:
+        # Nothing more can be known about the host
+        return [], partials
+    if not any(c in _HOST_TERMINATORS for c in suffix):
+        return partials, []
+    open_partials, complete = [], []
+    for p in partials:
+        (open_partials if _host_of(p) is None else complete).append(p)
+    return open_partials, complete
+
+
+def _run_placeholder(nodes):
+    """
+    Placeholder for a part of the host matched by nodes that cannot be
+    enumerated. A part that cannot consume a dot is taken to be bounded to a
+    label of the host even if it could consume a slash (e.g. [^.]+).
+    """
+    if _can_match(nodes, '/') and _can_match(nodes, '.'):
+        return _ANY
+    return _WILDCARD
+
+
+def _literal_suffix(nodes):
+    """Return the literal string the parsed nodes always end with"""
+    suffix = []
+    for op, av in reversed(nodes):
+        if op is not sre_parse.LITERAL:
+            break
+        suffix.append(compat_chr(av))
+    return ''.join(reversed(suffix)).lower()
+
+
+def _subdomains_run(sub, following, partials):
+    """
+    Tell whether a repeat of sub is taken to be the subdomains of the host:
+    a run that may consume anything but is followed by a dot while the host
+    is not complete yet (e.g. the .+? of "(?:.+?[.])?example[.]com")
+    """
+    return (
+        following and following[0][0] is None and following[0][1].startswith('.')
+        and _run_placeholder(sub) == _ANY
+        and all(_host_of(p) is None for p in partials))
+
+
+def _literal_runs(nodes):
+    """Merge consecutive literals of the parsed nodes into strings"""
+    run = []
+    for op, av in nodes:
+        if op is sre_parse.LITERAL:
+            run.append(compat_chr(av))
+            continue
+        if run:
+            yield None, ''.join(run)
+            run = []
+        yield op, av
+    if run:
+        yield None, ''.join(run)
+
+
+def _expand(nodes, partials):
+    """
+    Expand the open partials with the parsed nodes until their host is
+    known, return the partials still open and the complete ones
+    """
+    complete = []
+    runs = list(_literal_runs(nodes))
+    for i, (op, av) in enumerate(runs):
+        if not partials:
+            break
+        if op is None:
+            partials, done = _advance(partials, av.lower())
+        elif op is sre_parse.SUBPATTERN:
+            partials, done = _expand(av[-1], partials)
+        elif op is sre_parse.BRANCH:
+            expanded, done = [], []
+            for branch in av[1]:
+                branch_open, branch_done = _expand(branch, partials)
+                expanded.extend(branch_open)
+                done.extend(branch_done)
+            partials = expanded
+        elif op is sre_parse.IN and len(av) <= 4 and all(
+                item_op is sre_parse.LITERAL for item_op, _ in av):
+            partials_in = partials
+            partials, done = [], []
+            # Keys are case insensitive so that e.g. [yY] is a single character
+            for char in set(compat_chr(item_av).lower() for _, item_av in av):
+                item_open, item_done = _advance(partials_in, char)
+                partials.extend(item_open)
+                done.extend(item_done)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and _subdomains_run(
+                av[2], runs[i + 1:i + 2], partials):
+            partials, done = _advance(partials, _WILDCARD)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            lo, hi, sub = av
+            current = partials
+            partials = list(current) if lo == 0 else []
+            done = []
+            for count in itertools.count(1):
+                if count > hi or not current:
+                    break
+                current, repeat_done = _expand(sub, current)
+                done.extend(repeat_done)
+                if count >= lo:
+                    partials.extend(current)
+                if count >= 2 and count < hi:
+                    # Further repetitions are not enumerated, they still
+                    # end like sub (e.g. with the dot of (?:\w+\.)*)
+                    placeholder = _run_placeholder(sub)
+                    if placeholder == _WILDCARD:
+                        placeholder += _literal_suffix(sub)
+                    more, more_done = _advance(current, placeholder)
+                    partials.extend(more)
+                    done.extend(more_done)
+                    break
+        elif op is sre_parse.AT:
+            if av not in _AT_END:
+                continue
+            partials, done = _advance(partials, _END)
+        elif op in _ZERO_WIDTH:
+            continue
+        else:
+            # The host may end anywhere inside a part that can consume
+            # a slash so nothing is known about it
+            partials, done = _advance(partials, _run_placeholder([(op, av)]))
+        complete.extend(done)
+        if len(partials) + len(complete) > _MAX_EXPANSIONS:
+            raise _NotKeyable()
+    return partials, complete
+
+
+def _host_key(host, wildcards=False):
+    labels = host.split('.')
+    if len(labels) < (3 if wildcards else 2) or not labels[-1] or not labels[-2]:
+        return None
+    return '.'.join(labels[-2:])
+
+
+def _label_keys(host):
+    # Every label but the last one followed by "*" (e.g. "dailymotion.*"),
+    # for the hosts whose top level domain is not known
+    return set(label + '.*' for label in host.split('.')[:-1] if label)
+
+
+def _partial_key(partial):
+    host, whole = _host_start(partial) or (None, False)
+    if host is not None and '@' not in host:
+        if whole:
+            host = _PORT_RE.sub('', host)
+            key = _host_key(host.rpartition(_WILDCARD)[2], _WILDCARD in host)
+            if key is not None:
+                return key
+        # Otherwise the last literal label followed by other labels
+        # (e.g. "dailymotion" in "www.dailymotion.[a-z]{2,3}" or "bandcamp"
+        # in "bandcamp.com" not followed by a slash)
+        labels = host.split('.')
+        for label in reversed(labels[:-1]):
+            if label and _WILDCARD not in label:
+                return label + '.*'
+    # Not an URL with a known host (e.g. "ytsearch:" or a bare id), index it
+    # by the literal start of the pattern instead
+    prefix = partial[:_PREFIX_LENGTH]
+    if len(prefix) == _PREFIX_LENGTH and not any(c in prefix for c in (_WILDCARD, _ANY, _END)):
+        return '^' + prefix
+    return None
+
+
+def url_host_keys(pattern):
+    """
+    Return the keys of every URL matching pattern or None if they cannot be
+    determined. A key is either the last two labels of the host name
+    (e.g. "youtube.com"), a label of the host name followed by other labels
+    (e.g. "dailymotion.*") or the start of the URL (e.g. "^ytse"), all in
+    lower case.
+
+    The result is a necessary condition: a URL can only match pattern if one
+    of the keys returned by url_keys() for it is among them.
+    """
+    if pattern is None:
+        return None
+    try:
+        open_partials, complete = _expand(sre_parse.parse(pattern), [''])
+    except _NotKeyable:
+        return None
+    keys = set()
+    for partial in open_partials + complete:
+        key = _partial_key(partial)
+        if key is None:
+            return None
+        keys.add(key)
+    return tuple(sorted(keys))
+
+
+def url_keys(url):
+    """Return the keys a URL may be indexed under"""
+    url = url.lower()
+    mobj = _SCHEME_RE.match(url)
+    authority = url[mobj.end():] if mobj else url
+    authority = authority.partition('/')[0]
+    keys = set()
+    # The host may be delimited by any query or fragment separator and be
+    # preceded by user info or followed by a port
+    ends = [i for i, c in enumerate(authority) if c in '?#']
+    ends.append(len(authority))
+    for end in ends:
+        for segment in re.split(r'[@:]', authority[:end]):
+            key = _host_key(segment)
+            if key is not None:
+                keys.add(key)
+            keys.update(_label_keys(segment))
+    keys.add('^' + url[:_PREFIX_LENGTH])
+    return keys
+
+
+def _ie_pattern(ie):
+    make_valid_url = getattr(ie, '_make_valid_url', None)
+    if make_valid_url is not None:
+        # search extractors
+        return make_valid_url()
+    return getattr(ie, '_VALID_URL', None)
+
+
+def ie_host_keys(ie):
+    """Return the host keys of an extractor class or instance (see url_host_keys)"""
+    cls = ie if isinstance(ie, type) else type(ie)
+    # Precomputed by devscripts/make_lazy_extractors.py
+    if '_URL_HOST_KEYS' in cls.__dict__:
+        return cls._URL_HOST_KEYS
+    if cls not in _host_keys_cache:
+        _host_keys_cache[cls] = url_host_keys(_ie_pattern(cls))
+    return _host_keys_cache[cls]
+
+
+class ExtractorDispatchIndex(object):
+    """
+    Index of extractors by the host keys of their _VALID_URL.
+
+    candidates() returns, in their original order, the extractors that may
+    be suitable for a URL: those indexed under one of its host keys plus the
+    ones whose _VALID_URL cannot be keyed. Extractors overriding suitable()
+    are expected to only narrow down _VALID_URL.
+    """
+
+    def __init__(self, ies=()):
+        self._lock = threading.Lock()
+        self._ies = []
+        self._by_key = {}
+        self._fallback = []
+        self.update(ies)
+
+    def __len__(self):
+        return len(self._ies)
+
+    def update(self, ies):
+        """Index the extractors appended to ies since the last call"""
+        with self._lock:
+            for ie in ies[len(self._ies):]:
+                entry = (len(self._ies), ie)
+                self._ies.append(ie)
+                keys = ie_host_keys(ie)
+                if keys is None:
+                    self._fallback.append(entry)
+                else:
+                    for key in keys:
+                        self._by_key.setdefault(key, []).append(entry)
+
+    def candidates(self, url):
+        entries = dict(self._fallback)
+        for key in url_keys(url):
+            entries.update(self._by_key.get(key, ()))
+        return [entries[pos] for pos in sorted(entries)]
@@ -7,6 +7,7 @@ import json
 import os.path
 import random
 import re
+import threading
 import traceback
 
 from .common import InfoExtractor, SearchInfoExtractor
@@ -1308,11 +1309,34 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
             return False
         return super(YoutubeIE, cls).suitable(url)
 
+    # Signature and nsig functions compiled from the player JS, shared by all
+    # instances and keyed by player; only the most recently used are kept
+    _PLAYER_FUNC_CACHE_SIZE = 16
+    _player_func_cache = {}
+    _player_func_lru = []
+    _player_func_lock = threading.Lock()
+
     def __init__(self, *args, **kwargs):
         super(YoutubeIE, self).__init__(*args, **kwargs)
         self._code_cache = {}
         self._player_cache = {}
 
+    @classmethod
+    def _cached_player_func(cls, key, build_func):
+        with cls._player_func_lock:
+            if key in cls._player_func_cache:
+                cls._player_func_lru.remove(key)
+                cls._player_func_lru.append(key)
+                return cls._player_func_cache[key]
+        func = build_func()
+        with cls._player_func_lock:
+            if key not in cls._player_func_cache:
+                cls._player_func_lru.append(key)
+                while len(cls._player_func_lru) > cls._PLAYER_FUNC_CACHE_SIZE:
+                    del cls._player_func_cache[cls._player_func_lru.pop(0)]
+            cls._player_func_cache[key] = func
+        return func
+
     def _signature_cache_id(self, example_sig):
         """ Return a string representation of a signature """
         return '.'.join(compat_str(len(part)) for part in example_sig.split('.'))
@@ -1358,7 +1382,8 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
         cache_spec = [ord(c) for c in cache_res]
 
         self._downloader.cache.store('youtube-sigfuncs', func_id, cache_spec)
-        return res
+        # The permutation is all that is needed, no need to interpret the JS again
+        return lambda s: ''.join(s[i] for i in cache_spec)
 
     def _print_sig_code(self, func, example_sig):
         def gen_sig_code(idxs):
@@ -1430,13 +1455,9 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
             raise ExtractorError('Cannot decrypt signature without player_url')
 
         try:
-            player_id = (player_url, self._signature_cache_id(s))
-            if player_id not in self._player_cache:
-                func = self._extract_signature_function(
-                    video_id, player_url, s
-                )
-                self._player_cache[player_id] = func
-            func = self._player_cache[player_id]
+            func = self._cached_player_func(
+                ('sig', player_url, self._signature_cache_id(s)),
+                lambda: self._extract_signature_function(video_id, player_url, s))
             if self._downloader.params.get('youtube_print_sig_code'):
                 self._print_sig_code(func, s)
             return func(s)
@@ -1484,9 +1505,13 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
     def _extract_n_function(self, video_id, player_url):
         player_id = self._extract_player_info(player_url)
         func_code = self._downloader.cache.load('youtube-nsig', player_id)
+        # The function code split into statements and expressions, see
+        # JSInterpreter.dump_splits()
+        splits = None
 
         if func_code:
-            jsi = JSInterpreter(func_code)
+            splits = self._downloader.cache.load('youtube-nsig-splits', player_id)
+            jsi = JSInterpreter(func_code, splits=splits)
         else:
             jscode = self._get_player_code(video_id, player_url, player_id)
             funcname = self._extract_n_function_name(jscode)
@@ -1497,7 +1522,20 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
         if self._downloader.params.get('youtube_print_sig_code'):
             self.to_screen('Extracted nsig function from {0}:\n{1}\n'.format(player_id, func_code[1]))
 
-        return lambda s: jsi.extract_function_from_code(*func_code)([s])
+        func = jsi.extract_function_from_code(*func_code)
+        lock = threading.Lock()
+        cache = [self._downloader.cache if splits is None else None]
+
+        def n_func(s):
+            # The interpreted function keeps its variables between calls
+            with lock:
+                ret = func([s])
+                if cache[0]:
+                    # Once the function has been run all of its code is split
+                    cache.pop().store('youtube-nsig-splits', player_id, jsi.dump_splits())
+                    cache.append(None)
+                return ret
+        return n_func
 
     def _n_descramble(self, n_param, player_url, video_id):
         """Compute the response to YT's "n" parameter challenge,
@@ -1515,10 +1553,9 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
             return self._player_cache[sig_id]
 
         try:
-            player_id = ('nsig', player_url)
-            if player_id not in self._player_cache:
-                self._player_cache[player_id] = self._extract_n_function(video_id, player_url)
-            func = self._player_cache[player_id]
+            func = self._cached_player_func(
+                ('nsig', player_url),
+                lambda: self._extract_n_function(video_id, player_url))
             ret = func(n_param)
             if ret.startswith('enhanced_except_'):
                 raise ExtractorError('Unhandled exception in decode')
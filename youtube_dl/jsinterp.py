@@ -142,6 +142,25 @@ _NAME_RE = r'[a-zA-Z_$][\w$]*'
 _MATCHING_PARENS = dict(zip(*zip('()', '{}', '[]')))
 _QUOTES = '\'"/'
 
+# Compiled once, interpret_statement() is called for every evaluated statement
+_INC_DEC_RE = re.compile(r'''(?x)
+    (?P<pre_sign>\+\+|--)(?P<var1>{_NAME_RE})|
+    (?P<var2>{_NAME_RE})(?P<post_sign>\+\+|--)'''.format(**globals()))
+_STATEMENT_RE = re.compile(r'''(?x)
+    (?P<assign>
+        (?P<out>{_NAME_RE})(?:\[(?P<index>[^\]]+?)\])?\s*
+        (?P<op>{_OPERATOR_RE})?
+        =(?!=)(?P<expr>.*)$
+    )|(?P<return>
+        (?!if|return|true|false|null|undefined)(?P<name>{_NAME_RE})$
+    )|(?P<indexing>
+        (?P<in>{_NAME_RE})\[(?P<idx>.+)\]$
+    )|(?P<attribute>
+        (?P<var>{_NAME_RE})(?:(?P<nullish>\?)?\.(?P<member>[^(]+)|\[(?P<member2>[^\]]+)\])\s*
+    )|(?P<function>
+        (?P<fname>{_NAME_RE})\((?P<args>.*)\)$
+    )'''.format(**globals()))
+
 
 class JS_Undefined(object):
     pass
@@ -201,12 +220,27 @@ class JSInterpreter(object):
     }
 
     _OBJ_NAME = '__youtube_dl_jsinterp_obj'
+    _OBJ_NAME_RE = re.compile(_OBJ_NAME + r'\d+')
+    # Named objects are counted from 1
+    _OBJ_PLACEHOLDER = _OBJ_NAME + '0'
+    _OBJ_PLACEHOLDER_RE = re.compile(_OBJ_PLACEHOLDER + r'(?!\d)')
 
     OP_CHARS = None
 
-    def __init__(self, code, objects=None):
+    # Bound on the memoized splits of an interpreter, expressions built at
+    # run time (see _named_object) would otherwise make them grow forever
+    _MAX_SPLITS = 20000
+
+    def __init__(self, code, objects=None, splits=None):
+        """
+        splits is the result of dump_splits() for the same code; it spares
+        splitting the code into statements and expressions again
+        """
         self.code, self._functions = code, {}
         self._objects = {} if objects is None else objects
+        self._splits = {}
+        for expr, delim, max_split, skip_delims, separated in splits or []:
+            self._splits[self._split_key(expr, delim, max_split, skip_delims)] = tuple(separated)
         if type(self).OP_CHARS is None:
             type(self).OP_CHARS = self.OP_CHARS = self.__op_chars()
 
@@ -294,14 +328,45 @@ class JSInterpreter(object):
                 break
         yield expr[start:]
 
-    @classmethod
-    def _separate_at_paren(cls, expr, delim=None):
+    @staticmethod
+    def _split_key(expr, delim, max_split, skip_delims):
+        if isinstance(skip_delims, list):
+            skip_delims = tuple(skip_delims)
+        return expr, delim, max_split, skip_delims
+
+    def _split(self, expr, delim=',', max_split=None, skip_delims=None):
+        """Memoized tuple(self._separate(...)): function bodies are interpreted from source on every call"""
+        names = None
+        if self._OBJ_NAME in expr:
+            # Named objects only consist of word characters so they do not
+            # change where expr is split; share the splits of expressions
+            # that only differ by them
+            names = self._OBJ_NAME_RE.findall(expr)
+            expr = self._OBJ_NAME_RE.sub(self._OBJ_PLACEHOLDER, expr)
+        key = self._split_key(expr, delim, max_split, skip_delims)
+        separated = self._splits.get(key)
+        if separated is None:
+            separated = tuple(self._separate(expr, delim, max_split, skip_delims))
+            if len(self._splits) < self._MAX_SPLITS:
+                self._splits[key] = separated
+        if names:
+            names = iter(names)
+            separated = tuple(
+                self._OBJ_PLACEHOLDER_RE.sub(lambda _: next(names), part)
+                for part in separated)
+        return separated
+
+    def dump_splits(self):
+        """Return the memoized splits in a JSON serializable form"""
+        return [list(key) + [list(separated)] for key, separated in self._splits.items()]
+
+    def _separate_at_paren(self, expr, delim=None):
         if delim is None:
             delim = expr and _MATCHING_PARENS[expr[0]]
-        separated = list(cls._separate(expr, delim, 1))
+        separated = self._split(expr, delim, 1)
 
         if len(separated) < 2:
-            raise cls.Exception('No terminating paren {delim} in {expr:.100}'.format(**locals()))
+            raise self.Exception('No terminating paren {delim} in {expr:.100}'.format(**locals()))
         return separated[0][1:].strip(), separated[1].strip()
 
     @staticmethod
@@ -318,7 +383,7 @@ class JSInterpreter(object):
             if left_val not in (None, JS_Undefined):
                 return left_val
         elif op == '?':
-            right_expr = _js_ternary(left_val, *self._separate(right_expr, ':', 1))
+            right_expr = _js_ternary(left_val, *self._split(right_expr, ':', 1))
 
         right_val = self.interpret_expression(right_expr, local_vars, allow_recursion)
         opfunc = op and next((v for k, v in self._all_operators() if k == op), None)
@@ -352,7 +417,7 @@ class JSInterpreter(object):
         allow_recursion -= 1
 
         should_return = False
-        sub_statements = list(self._separate(stmt, ';')) or ['']
+        sub_statements = list(self._split(stmt, ';')) or ['']
         expr = stmt = sub_statements.pop().strip()
         for sub_stmt in sub_statements:
             ret, should_return = self.interpret_statement(sub_stmt, local_vars, allow_recursion)
@@ -369,7 +434,7 @@ class JSInterpreter(object):
             return None, should_return
 
         if expr[0] in _QUOTES:
-            inner, outer = self._separate(expr, expr[0], 1)
+            inner, outer = self._split(expr, expr[0], 1)
             if expr[0] == '/':
                 flags, outer = self._regex_flags(outer)
                 inner = re.compile(inner[1:], flags=flags)  # , strict=True))
@@ -398,7 +463,7 @@ class JSInterpreter(object):
         if expr.startswith('{'):
             inner, outer = self._separate_at_paren(expr)
             # try for object expression (Map)
-            sub_expressions = [list(self._separate(sub_expr.strip(), ':', 1)) for sub_expr in self._separate(inner)]
+            sub_expressions = [list(self._split(sub_expr.strip(), ':', 1)) for sub_expr in self._split(inner)]
             if all(len(sub_expr) == 2 for sub_expr in sub_expressions):
                 return dict(
                     (key_expr if re.match(_NAME_RE, key_expr) else key_expr,
@@ -423,7 +488,7 @@ class JSInterpreter(object):
             inner, outer = self._separate_at_paren(expr)
             name = self._named_object(local_vars, [
                 self.interpret_expression(item, local_vars, allow_recursion)
-                for item in self._separate(inner)])
+                for item in self._split(inner)])
             expr = name + outer
 
         m = re.match(r'''(?x)
@@ -481,7 +546,7 @@ class JSInterpreter(object):
                     body = 'switch(%s){%s}' % (switch_val, body)
                 else:
                     body, expr = remaining, ''
-            start, cndn, increment = self._separate(constructor, ';')
+            start, cndn, increment = self._split(constructor, ';')
             self.interpret_expression(start, local_vars, allow_recursion)
             while True:
                 if not _js_ternary(self.interpret_expression(cndn, local_vars, allow_recursion)):
@@ -504,7 +569,7 @@ class JSInterpreter(object):
             for default in (False, True):
                 matched = False
                 for item in items:
-                    case, stmt = (i.strip() for i in self._separate(item, ':', 1))
+                    case, stmt = (i.strip() for i in self._split(item, ':', 1))
                     if default:
                         matched = matched or case == 'default'
                     elif not matched:
@@ -526,7 +591,7 @@ class JSInterpreter(object):
             return ret, should_abort or should_return
 
         # Comma separated statements
-        sub_expressions = list(self._separate(expr))
+        sub_expressions = list(self._split(expr))
         if len(sub_expressions) > 1:
             for sub_expr in sub_expressions:
                 ret, should_abort = self.interpret_statement(sub_expr, local_vars, allow_recursion)
@@ -534,9 +599,7 @@ class JSInterpreter(object):
                     return ret, True
             return ret, False
 
-        for m in re.finditer(r'''(?x)
-                (?P<pre_sign>\+\+|--)(?P<var1>{_NAME_RE})|
-                (?P<var2>{_NAME_RE})(?P<post_sign>\+\+|--)'''.format(**globals()), expr):
+        for m in _INC_DEC_RE.finditer(expr):
             var = m.group('var1') or m.group('var2')
             start, end = m.span()
             sign = m.group('pre_sign') or m.group('post_sign')
@@ -549,20 +612,7 @@ class JSInterpreter(object):
         if not expr:
             return None, should_return
 
-        m = re.match(r'''(?x)
-            (?P<assign>
-                (?P<out>{_NAME_RE})(?:\[(?P<index>[^\]]+?)\])?\s*
-                (?P<op>{_OPERATOR_RE})?
-                =(?!=)(?P<expr>.*)$
-            )|(?P<return>
-                (?!if|return|true|false|null|undefined)(?P<name>{_NAME_RE})$
-            )|(?P<indexing>
-                (?P<in>{_NAME_RE})\[(?P<idx>.+)\]$
-            )|(?P<attribute>
-                (?P<var>{_NAME_RE})(?:(?P<nullish>\?)?\.(?P<member>[^(]+)|\[(?P<member2>[^\]]+)\])\s*
-            )|(?P<function>
-                (?P<fname>{_NAME_RE})\((?P<args>.*)\)$
-            )'''.format(**globals()), expr)
+        m = _STATEMENT_RE.match(expr)
         md = m.groupdict() if m else {}
         if md.get('assign'):
             left_val = local_vars.get(m.group('out'))
@@ -615,7 +665,7 @@ class JSInterpreter(object):
             skip_delim = (op + op) if op in '<>*?' else None
             if op == '?':
                 skip_delim = (skip_delim, '?.')
-            separated = list(self._separate(expr, op, skip_delims=skip_delim))
+            separated = list(self._split(expr, op, skip_delims=skip_delim))
             if len(separated) < 2:
                 continue
 
@@ -671,7 +721,7 @@ class JSInterpreter(object):
                 # Function call
                 argvals = [
                     self.interpret_expression(v, local_vars, allow_recursion)
-                    for v in self._separate(arg_str)]
+                    for v in self._split(arg_str)]
 
                 if obj == compat_str:
                     if member == 'fromCharCode':
@@ -764,7 +814,7 @@ class JSInterpreter(object):
         elif md.get('function'):
             fname = m.group('fname')
             argvals = [self.interpret_expression(v, local_vars, allow_recursion)
-                       for v in self._separate(m.group('args'))]
+                       for v in self._split(m.group('args'))]
             if fname in local_vars:
                 return local_vars[fname](argvals, allow_recursion=allow_recursion), should_return
             elif fname not in self._functions:
@@ -0,0 +1,126 @@
+from __future__ import unicode_literals
+
+import binascii
+import re
+
+from .compat import compat_urlparse
+from .utils import (
+    float_or_none,
+    parse_m3u8_attributes,
+)
+
+
+def _is_ad_fragment_start(line):
+    return (line.startswith('#ANVATO-SEGMENT-INFO') and 'type=ad' in line
+            or line.startswith('#UPLYNK-SEGMENT') and line.endswith(',ad'))
+
+
+def _is_ad_fragment_end(line):
+    return (line.startswith('#ANVATO-SEGMENT-INFO') and 'type=master' in line
+            or line.startswith('#UPLYNK-SEGMENT') and line.endswith(',segment'))
+
+
+def _absolute_url(url, base_url):
+    return url if re.match(r'^https?://', url) else compat_urlparse.urljoin(base_url, url)
+
+
+def parse_m3u8_playlist(m3u8_doc, m3u8_url):
+    """
+    Parse a master or media playlist in a single pass.
+
+    Returns a dict with:
+    is_master        True for a master playlist, that is one with
+                     #EXT-X-STREAM-INF tags
+    media            The attributes of the EXT-X-MEDIA tags
+    variants         The variant streams, dicts with the absolute url and the
+                     attributes of their EXT-X-STREAM-INF tag (stream_inf)
+    fragments        The media segments, except ads, with:
+                     * url: absolute URL
+                     * byte_range: None or dict with start and end (exclusive)
+                     * decrypt_info: the attributes of the EXT-X-KEY tag in
+                       effect, shared by the fragments using the same key,
+                       with an absolute URI and the IV as bytes
+                     * media_sequence: sequence number
+                     * duration: from EXTINF, may be None
+    ad_fragments     The number of ad segments left out
+    target_duration  The value of #EXT-X-TARGETDURATION or None
+    media_sequence   The sequence number of the first segment
+    ended            Whether the playlist has #EXT-X-ENDLIST
+
+    The fragments are in playlist order, so that the one with frag_index n
+    (counting from 1) is fragments[n - 1].
+    """
+    playlist = {
+        'is_master': '#EXT-X-STREAM-INF' in m3u8_doc,
+        'media': [],
+        'variants': [],
+        'fragments': [],
+        'ad_fragments': 0,
+        'target_duration': None,
+        'media_sequence': 0,
+        'ended': False,
+    }
+    media_sequence = 0
+    decrypt_info = {'METHOD': 'NONE'}
+    byte_range = None
+    duration = None
+    stream_inf = {}
+    ad_frag_next = False
+    for line in m3u8_doc.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith('#'):
+            if playlist['is_master']:
+                playlist['variants'].append({
+                    'url': _absolute_url(line, m3u8_url),
+                    'stream_inf': stream_inf,
+                })
+                stream_inf = {}
+            elif ad_frag_next:
+                playlist['ad_fragments'] += 1
+            else:
+                playlist['fragments'].append({
+                    'url': _absolute_url(line, m3u8_url),
+                    'byte_range': byte_range,
+                    'decrypt_info': decrypt_info,
+                    'media_sequence': media_sequence,
+                    'duration': duration,
+                })
+                media_sequence += 1
+            duration = None
+        elif line.startswith('#EXTINF:'):
+            duration = float_or_none(line[8:].partition(',')[0])
+        elif line.startswith('#EXT-X-STREAM-INF:'):
+            stream_inf = parse_m3u8_attributes(line)
+        elif line.startswith('#EXT-X-MEDIA:'):
+            playlist['media'].append(parse_m3u8_attributes(line))
+        elif line.startswith('#EXT-X-KEY'):
+            decrypt_info = parse_m3u8_attributes(line[11:])
+            if decrypt_info['METHOD'] == 'AES-128':
+                if 'IV' in decrypt_info:
+                    decrypt_info['IV'] = binascii.unhexlify(decrypt_info['IV'][2:].zfill(32))
+                decrypt_info['URI'] = _absolute_url(decrypt_info['URI'], m3u8_url)
+        elif line.startswith('#EXT-X-MEDIA-SEQUENCE'):
+            media_sequence = playlist['media_sequence'] = int(line[22:])
+        elif line.startswith('#EXT-X-TARGETDURATION'):
+            playlist['target_duration'] = float_or_none(line[22:])
+        elif line.startswith('#EXT-X-BYTERANGE'):
+            splitted_byte_range = line[17:].split('@')
+            if len(splitted_byte_range) == 2:
+                sub_range_start = int(splitted_byte_range[1])
+            else:
+                # Without an offset the sub-range follows the previous one,
+                # or starts the resource
+                sub_range_start = byte_range['end'] if byte_range else 0
+            byte_range = {
+                'start': sub_range_start,
+                'end': sub_range_start + int(splitted_byte_range[0]),
+            }
+        elif line.startswith('#EXT-X-ENDLIST'):
+            playlist['ended'] = True
+        elif _is_ad_fragment_start(line):
+            ad_frag_next = True
+        elif _is_ad_fragment_end(line):
+            ad_frag_next = False
+    return playlist
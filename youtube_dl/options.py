@@ -213,6 +213,10 @@ def parseOpts(overrideArguments=None): # opts(옵션들)을 분석하는 메소
         '--socket-timeout',
         dest='socket_timeout', type=float, default=None, metavar='SECONDS',
         help='포기하기 전에 기다리는 시간(초 단위)')
+    network.add_option(
+        '--no-keep-alive',
+        action='store_false', dest='http_keepalive', default=True,
+        help='HTTP(S) 연결을 재사용하지 않고 요청마다 새로 연결합니다.')
     network.add_option(
         '--source-address',
         metavar='IP', dest='source_address', default=None,
@@ -456,6 +460,10 @@ def parseOpts(overrideArguments=None): # opts(옵션들)을 분석하는 메소
         '-r', '--limit-rate', '--rate-limit',
         dest='ratelimit', metavar='RATE',
         help='최대 다운로드 속도(초당 바이트 수)(예: 50K 또는 4).2M)')
+    downloader.add_option(
+        '--limit-rate-per-host',
+        dest='ratelimit_per_host', metavar='RATE',
+        help='호스트당 최대 다운로드 속도(초당 바이트 수)(예: 50K 또는 4.2M), 동시 다운로드가 공유합니다.')
     downloader.add_option(
         '-R', '--retries',
         dest='retries', metavar='RETRIES', default=10,
@@ -476,6 +484,18 @@ def parseOpts(overrideArguments=None): # opts(옵션들)을 분석하는 메소
         '--keep-fragments',
         action='store_true', dest='keep_fragments', default=False,
         help='다운로드가 완료된 후에도 디스크에 다운로드된 조각을 유지합니다. 조각은 기본적으로 지워집니다.')
+    downloader.add_option(
+        '-N', '--concurrent-fragments',
+        dest='concurrent_fragment_downloads', metavar='N', default=1, type=int,
+        help='동시에 다운로드할 조각의 수(DASH, hlsnative 및 ISM)(기본값은 %default)')
+    downloader.add_option(
+        '--http-connections',
+        dest='http_connections', metavar='N', default=1, type=int,
+        help='서버가 범위 요청을 지원하는 경우 파일을 N개의 구간으로 나누어 동시에 다운로드합니다(기본값은 %default).')
+    downloader.add_option(
+        '--async-engine',
+        action='store_true', dest='async_engine', default=False,
+        help='HTTP, DASH 및 hlsnative 다운로드를 스레드 대신 하나의 asyncio 이벤트 루프에서 수행합니다(Python 3.5 이상, 프록시 미사용 시)(실험적)')
     downloader.add_option(
         '--buffer-size',
         dest='buffersize', metavar='SIZE', default='1024',
@@ -501,6 +521,23 @@ def parseOpts(overrideArguments=None): # opts(옵션들)을 분석하는 메소
         '--playlist-random',
         action='store_true',
         help='재생 목록 비디오를 임의 순서로 다운로드')
+    downloader.add_option(
+        '--lazy-playlist',
+        action='store_true', dest='lazy_playlist', default=False,
+        help='재생 목록 비디오를 모두 수집하기 전에 받는 대로 처리(--playlist-reverse 및 --playlist-random과 함께 사용하면 무시될 수 있음)')
+    downloader.add_option(
+        '--concurrent-playlist-entries',
+        dest='concurrent_playlist_entries', metavar='N', default=1, type=int,
+        help='동시에 처리(추출 및 다운로드)할 재생 목록 비디오의 수(기본값은 %default)')
+    downloader.add_option(
+        '--sidecar-downloads',
+        dest='sidecar_downloads', metavar='N', default=4, type=int,
+        help='자막과 썸네일을 N개의 스레드에서 비디오와 동시에 다운로드합니다. '
+             '0이면 비디오를 다운로드하기 전에 하나씩 다운로드합니다(기본값은 %default)')
+    downloader.add_option(
+        '--no-concurrent-formats',
+        action='store_false', dest='concurrent_formats', default=True,
+        help='병합할 형식(예: bestvideo+bestaudio)을 동시에 다운로드하지 않고 하나씩 다운로드합니다.')
     downloader.add_option(
         '--xattr-set-filesize',
         dest='xattr_set_filesize', action='store_true',
@@ -648,6 +685,14 @@ def parseOpts(overrideArguments=None): # opts(옵션들)을 분석하는 메소
         '--console-title',
         action='store_true', dest='consoletitle', default=False,
         help='콘솔 제목 표시줄에 진행률 표시')
+    verbosity.add_option(
+        '--progress-interval',
+        metavar='SECONDS', dest='progress_interval', type=float, default=None,
+        help='진행 표시줄을 다시 그리는 최소 간격(초) (기본값 0.1)')
+    verbosity.add_option(
+        '--progress-json',
+        metavar='FILE', dest='progress_json', default=None,
+        help='다운로드 진행 상황을 JSON 줄로 FILE에 기록합니다(표준 출력은 "-").')
     verbosity.add_option(
         '-v', '--verbose',
         action='store_true', dest='verbose', default=False,
@@ -683,6 +728,15 @@ def parseOpts(overrideArguments=None): # opts(옵션들)을 분석하는 메소
         dest='batchfile', metavar='FILE',
         help="다운로드할 URL('-' for stdin)을 포함하는 파일로, 한 줄에 하나의 URL을 입력합니다. "
              "'#', ';' 또는 ']'로 시작하는 줄은 주석으로 간주되어 무시됩니다.")
+    filesystem.add_option(
+        '--service',
+        dest='service', metavar='SOURCE',
+        help="서비스 모드: SOURCE('-' for stdin, 파일 또는 FIFO 경로, 'unix:PATH' 소켓)에서 한 줄에 하나씩 읽은 URL을 "
+             "미리 초기화된 작업자 프로세스에서 다운로드하고 URL별 결과를 JSON 한 줄로 출력합니다.")
+    filesystem.add_option(
+        '--service-workers',
+        dest='service_workers', metavar='N', default=1, type=int,
+        help='서비스 모드의 작업자 프로세스 수(기본값은 %default)')
     filesystem.add_option(
         '--id', default=False,
         action='store_true', dest='useid', help='파일 이름에 비디오 ID만 사용')
@@ -849,6 +903,19 @@ def parseOpts(overrideArguments=None): # opts(옵션들)을 분석하는 메소
         '--prefer-ffmpeg',
         action='store_true', dest='prefer_ffmpeg',
         help='포스트 프로세서 실행을 위해 avconv보다 ffmpeg 선호(기본값)')
+    postproc.add_option(
+        '--postprocess-workers',
+        dest='postprocess_workers', metavar='N', default=0, type=int,
+        help='다운로드가 끝난 파일의 후처리를 N개의 스레드에서 수행하고 바로 다음 다운로드를 시작합니다. '
+             '다운로드 기록(--download-archive)은 후처리가 끝난 뒤에 남지만 --max-downloads는 후처리가 아니라 다운로드를 기준으로 셉니다(기본값은 %default, 다운로드마다 후처리를 마친 뒤 다음 다운로드 시작)')
+    postproc.add_option(
+        '--no-native-merge',
+        action='store_false', dest='native_merge', default=True,
+        help='조각화된 MP4 형식(DASH)도 내장 병합기 대신 항상 ffmpeg로 병합합니다. 내장 병합기는 ffmpeg 없이 비디오와 오디오 트랙을 그대로 복사해 조각화된 MP4 파일을 만듭니다.')
+    postproc.add_option(
+        '--no-fuse-postprocessors',
+        action='store_false', dest='fuse_postprocessors', default=True,
+        help='연속된 ffmpeg 후처리(병합, 보정, 메타데이터, 자막 등)를 하나의 ffmpeg 명령으로 합치지 않고 각각 실행합니다.')
     postproc.add_option(
         '--ffmpeg-location', '--avconv-location', metavar='PATH',
         dest='ffmpeg_location',
@@ -28,20 +28,18 @@ class EmbedThumbnailPP(FFmpegPostProcessor):
         super(EmbedThumbnailPP, self).__init__(downloader)
         self._already_have_thumbnail = already_have_thumbnail
 
-    def run(self, info):
-        filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-
+    def _get_thumbnail_filename(self, info):
+        """Return the thumbnail to embed, in JPEG or PNG, None if there is none"""
         if not info.get('thumbnails'):
             self._downloader.to_screen('[embedthumbnail] There aren\'t any thumbnails to embed')
-            return [], info
+            return None
 
         thumbnail_filename = info['thumbnails'][-1]['filename']
 
         if not os.path.exists(encodeFilename(thumbnail_filename)):
             self._downloader.report_warning(
                 'Skipping embedding the thumbnail because the file is missing.')
-            return [], info
+            return None
 
         def is_webp(path):
             with open(encodeFilename(path), 'rb') as f:
@@ -75,21 +73,39 @@ class EmbedThumbnailPP(FFmpegPostProcessor):
             os.rename(encodeFilename(escaped_thumbnail_jpg_filename), encodeFilename(thumbnail_jpg_filename))
             thumbnail_filename = thumbnail_jpg_filename
 
-        if info['ext'] == 'mp3':
-            options = [
-                '-c', 'copy', '-map', '0', '-map', '1',
-                '-metadata:s:v', 'title="Album cover"', '-metadata:s:v', 'comment="Cover (Front)"']
+        return thumbnail_filename
 
-            self._downloader.to_screen('[ffmpeg] Adding thumbnail to "%s"' % filename)
+    def ffmpeg_pass(self, info):
+        # Only mp3 files are handled by ffmpeg
+        if info['ext'] != 'mp3':
+            return None
 
-            self.run_ffmpeg_multiple_files([filename, thumbnail_filename], temp_filename, options)
+        thumbnail_filename = self._get_thumbnail_filename(info)
+        if thumbnail_filename is None:
+            return {}
 
-            if not self._already_have_thumbnail:
-                os.remove(encodeFilename(thumbnail_filename))
-            os.remove(encodeFilename(filename))
-            os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+        return {
+            'msg': 'Adding thumbnail to "%s"' % info['filepath'],
+            'main_maps': ['0'],
+            'inputs': [thumbnail_filename],
+            'input_opts': lambda first_input: ['-map', '%d' % first_input],
+            'opts': [
+                '-metadata:s:v', 'title="Album cover"', '-metadata:s:v', 'comment="Cover (Front)"'],
+            'cleanup': [] if self._already_have_thumbnail else [thumbnail_filename],
+        }
+
+    def run(self, info):
+        if info['ext'] == 'mp3':
+            return self.run_ffmpeg_passes(info, [self.ffmpeg_pass(info)])
+
+        filename = info['filepath']
+        temp_filename = prepend_extension(filename, 'temp')
+
+        thumbnail_filename = self._get_thumbnail_filename(info)
+        if thumbnail_filename is None:
+            return [], info
 
-        elif info['ext'] in ['m4a', 'mp4']:
+        if info['ext'] in ['m4a', 'mp4']:
             atomicparsley = next((x
                                   for x in ['AtomicParsley', 'atomicparsley']
                                   if check_executable(x, ['-v'])), None)
@@ -1,15 +1,25 @@
 from __future__ import unicode_literals
 
+import hashlib
 import io
+import json
 import os
 import subprocess
+import threading
 import time
 import re
 
 
 from .common import AudioConversionError, PostProcessor
+from .mp4merge import (
+    FRAGMENTED_MP4_EXTS,
+    FragmentedMP4Merger,
+    MP4MergeError,
+)
 
+from ..compat import compat_os_name
 from ..utils import (
+    determine_ext,
     encodeArgument,
     encodeFilename,
     get_exe_version,
@@ -53,6 +63,11 @@ class FFmpegPostProcessorError(PostProcessingError):
 
 
 class FFmpegPostProcessor(PostProcessor):
+    # Versions of the executables by path, shared by all the instances since
+    # finding them out runs every program
+    _versions_cache = {}
+    _versions_cache_lock = threading.Lock()
+
     def __init__(self, downloader=None):
         PostProcessor.__init__(self, downloader)
         self._determine_executables()
@@ -73,24 +88,65 @@ class FFmpegPostProcessor(PostProcessor):
     def get_versions(downloader=None):
         return FFmpegPostProcessor(downloader)._versions
 
+    @staticmethod
+    def _get_ffmpeg_version(path):
+        ver = get_exe_version(path, args=['-version'])
+        if ver:
+            regexs = [
+                r'(?:\d+:)?([0-9.]+)-[0-9]+ubuntu[0-9.]+$',  # Ubuntu, see [1]
+                r'n([0-9.]+)$',  # Arch Linux
+                # 1. http://www.ducea.com/2006/06/17/ubuntu-package-version-naming-explanation/
+            ]
+            for regex in regexs:
+                mobj = re.match(regex, ver)
+                if mobj:
+                    ver = mobj.group(1)
+        return ver
+
+    @staticmethod
+    def _stat_executable(path):
+        """Return the file run for path and its modification time, or None"""
+        if os.path.dirname(path):
+            candidates = [path]
+        else:
+            candidates = [
+                os.path.join(dirname, path)
+                for dirname in os.environ.get('PATH', os.defpath).split(os.pathsep)]
+        for candidate in candidates:
+            for fn in (candidate, candidate + '.exe') if compat_os_name == 'nt' else (candidate, ):
+                if os.path.isfile(fn) and os.access(fn, os.X_OK):
+                    return [fn, os.path.getmtime(fn)]
+        return None
+
+    def _get_versions(self, paths):
+        key = tuple(sorted(paths.items()))
+        with self._versions_cache_lock:
+            if key not in self._versions_cache:
+                self._versions_cache[key] = self._load_versions(paths, key)
+            return dict(self._versions_cache[key])
+
+    def _load_versions(self, paths, key):
+        cache = getattr(self._downloader, 'cache', None)
+        if cache is None:
+            return dict((p, self._get_ffmpeg_version(path)) for p, path in paths.items())
+
+        # Entries are only valid as long as the same executables are found
+        cache_key = hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+        executables = dict((p, self._stat_executable(path)) for p, path in paths.items())
+        cached = cache.load('ffmpeg-versions', cache_key)
+        if cached and cached.get('executables') == executables:
+            return cached['versions']
+        versions = dict((p, self._get_ffmpeg_version(path)) for p, path in paths.items())
+        cache.store('ffmpeg-versions', cache_key, {
+            'executables': executables,
+            'versions': versions,
+        })
+        return versions
+
     def _determine_executables(self):
         programs = ['avprobe', 'avconv', 'ffmpeg', 'ffprobe']
         prefer_ffmpeg = True
 
-        def get_ffmpeg_version(path):
-            ver = get_exe_version(path, args=['-version'])
-            if ver:
-                regexs = [
-                    r'(?:\d+:)?([0-9.]+)-[0-9]+ubuntu[0-9.]+$',  # Ubuntu, see [1]
-                    r'n([0-9.]+)$',  # Arch Linux
-                    # 1. http://www.ducea.com/2006/06/17/ubuntu-package-version-naming-explanation/
-                ]
-                for regex in regexs:
-                    mobj = re.match(regex, ver)
-                    if mobj:
-                        ver = mobj.group(1)
-            return ver
-
         self.basename = None
         self.probe_basename = None
 
@@ -121,12 +177,10 @@ class FFmpegPostProcessor(PostProcessor):
 
                 self._paths = dict(
                     (p, os.path.join(location, p)) for p in programs)
-                self._versions = dict(
-                    (p, get_ffmpeg_version(self._paths[p])) for p in programs)
+                self._versions = self._get_versions(self._paths)
         if self._versions is None:
-            self._versions = dict(
-                (p, get_ffmpeg_version(p)) for p in programs)
             self._paths = dict((p, p) for p in programs)
+            self._versions = self._get_versions(self._paths)
 
         if prefer_ffmpeg is False:
             prefs = ('avconv', 'ffmpeg')
@@ -242,6 +296,86 @@ class FFmpegPostProcessor(PostProcessor):
     def run_ffmpeg(self, path, out_path, opts):
         self.run_ffmpeg_multiple_files([path], out_path, opts)
 
+    def ffmpeg_pass(self, info):
+        """
+        Describe what run(info) does as a pass of a single ffmpeg command
+        rewriting info['filepath'], so that FFmpegFusedPP can combine it with
+        the passes of the next postprocessors.
+
+        Return None if run() has to be called instead, an empty dict if there
+        is nothing to do, otherwise a dict with:
+        msg:            Message to show
+        codec:          Codec options, the passes of a command must have the
+                        same ones (default is ['-c', 'copy'])
+        main_inputs:    Files to read instead of info['filepath'], only for
+                        the first pass of a command
+        main_maps:      Streams of the main inputs to map, default stream
+                        selection is used if no pass gives any
+        inputs:         Additional input files
+        input_opts:     Function returning the options referring to the
+                        inputs given the index of the first one
+        opts:           Other options
+        format:         Output format
+        files_to_delete: Files to delete once the command succeeds, unless
+                        keepvideo is set
+        cleanup:        Temporary files to remove once the command succeeds
+        """
+        return None
+
+    @staticmethod
+    def can_fuse_passes(first, second):
+        """Whether two passes can be run by the same ffmpeg command"""
+        default_codec = ['-c', 'copy']
+        first_format, second_format = first.get('format'), second.get('format')
+        return (
+            not second.get('main_inputs')
+            and first.get('codec', default_codec) == second.get('codec', default_codec)
+            and (not first_format or not second_format or first_format == second_format))
+
+    def run_ffmpeg_passes(self, info, passes):
+        """Run passes (see ffmpeg_pass()) with a single ffmpeg command, return like run()"""
+        passes = [p for p in passes if p]
+        if not passes:
+            return [], info
+
+        filename = info['filepath']
+        main_inputs = passes[0].get('main_inputs')
+        inputs = list(main_inputs or [filename])
+        main_maps = []
+        for p in passes[:1] if main_inputs else passes:
+            main_maps.extend(m for m in p.get('main_maps', []) if m not in main_maps)
+        opts = list(passes[0].get('codec', ['-c', 'copy']))
+        for m in main_maps:
+            opts.extend(['-map', m])
+        output_format = None
+        files_to_delete = []
+        cleanup = []
+        for p in passes:
+            self._downloader.to_screen('[ffmpeg] ' + p['msg'])
+            if p.get('inputs'):
+                opts.extend(p['input_opts'](len(inputs)))
+                inputs.extend(p['inputs'])
+            opts.extend(p.get('opts', []))
+            output_format = p.get('format') or output_format
+            files_to_delete.extend(p.get('files_to_delete', []))
+            cleanup.extend(p.get('cleanup', []))
+        if output_format:
+            opts.extend(['-f', output_format])
+
+        temp_filename = prepend_extension(filename, 'temp')
+        try:
+            self.run_ffmpeg_multiple_files(inputs, temp_filename, opts)
+        except PostProcessingError:
+            if os.path.exists(encodeFilename(temp_filename)):
+                os.remove(encodeFilename(temp_filename))
+            raise
+        for path in cleanup:
+            os.remove(encodeFilename(path))
+        if not main_inputs:
+            os.remove(encodeFilename(filename))
+        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+        return files_to_delete, info
+
     def _ffmpeg_filename_argument(self, fn):
         # Always use 'file:' because the filename may contain ':' (ffmpeg
         # interprets that as a protocol) or can start with '-' (-- is broken in
@@ -378,13 +512,16 @@ class FFmpegVideoConvertorPP(FFmpegPostProcessor):
 
 class FFmpegEmbedSubtitlePP(FFmpegPostProcessor):
     def run(self, information):
+        return self.run_ffmpeg_passes(information, [self.ffmpeg_pass(information)])
+
+    def ffmpeg_pass(self, information):
         if information['ext'] not in ('mp4', 'webm', 'mkv'):
             self._downloader.to_screen('[ffmpeg] Subtitles can only be embedded in mp4, webm or mkv files')
-            return [], information
+            return {}
         subtitles = information.get('requested_subtitles')
         if not subtitles:
             self._downloader.to_screen('[ffmpeg] There aren\'t any subtitles to embed')
-            return [], information
+            return {}
 
         filename = information['filepath']
 
@@ -404,38 +541,39 @@ class FFmpegEmbedSubtitlePP(FFmpegPostProcessor):
                     self._downloader.to_screen('[ffmpeg] Only WebVTT subtitles can be embedded in webm files')
 
         if not sub_langs:
-            return [], information
-
-        input_files = [filename] + sub_filenames
-
-        opts = [
-            '-map', '0',
-            '-c', 'copy',
-            # Don't copy the existing subtitles, we may be running the
-            # postprocessor a second time
-            '-map', '-0:s',
-            # Don't copy Apple TV chapters track, bin_data (see #19042, #19024,
-            # https://trac.ffmpeg.org/ticket/6016)
-            '-map', '-0:d',
-        ]
-        if information['ext'] == 'mp4':
-            opts += ['-c:s', 'mov_text']
-        for (i, lang) in enumerate(sub_langs):
-            opts.extend(['-map', '%d:0' % (i + 1)])
-            lang_code = ISO639Utils.short2long(lang) or lang
-            opts.extend(['-metadata:s:s:%d' % i, 'language=%s' % lang_code])
-
-        temp_filename = prepend_extension(filename, 'temp')
-        self._downloader.to_screen('[ffmpeg] Embedding subtitles in \'%s\'' % filename)
-        self.run_ffmpeg_multiple_files(input_files, temp_filename, opts)
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-
-        return sub_filenames, information
+            return {}
+
+        def input_opts(first_input):
+            opts = []
+            for (i, lang) in enumerate(sub_langs):
+                opts.extend(['-map', '%d:0' % (first_input + i)])
+                lang_code = ISO639Utils.short2long(lang) or lang
+                opts.extend(['-metadata:s:s:%d' % i, 'language=%s' % lang_code])
+            return opts
+
+        return {
+            'msg': 'Embedding subtitles in \'%s\'' % filename,
+            'main_maps': [
+                '0',
+                # Don't copy the existing subtitles, we may be running the
+                # postprocessor a second time
+                '-0:s',
+                # Don't copy Apple TV chapters track, bin_data (see #19042, #19024,
+                # https://trac.ffmpeg.org/ticket/6016)
+                '-0:d',
+            ],
+            'inputs': sub_filenames,
+            'input_opts': input_opts,
+            'opts': ['-c:s', 'mov_text'] if information['ext'] == 'mp4' else [],
+            'files_to_delete': sub_filenames,
+        }
 
 
 class FFmpegMetadataPP(FFmpegPostProcessor):
     def run(self, info):
+        return self.run_ffmpeg_passes(info, [self.ffmpeg_pass(info)])
+
+    def ffmpeg_pass(self, info):
         metadata = {}
 
         def add(meta_list, info_list=None):
@@ -475,20 +613,19 @@ class FFmpegMetadataPP(FFmpegPostProcessor):
 
         if not metadata:
             self._downloader.to_screen('[ffmpeg] There isn\'t any metadata to add')
-            return [], info
+            return {}
 
         filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-        in_filenames = [filename]
-        options = []
+        ffmpeg_pass = {
+            'msg': 'Adding metadata to \'%s\'' % filename,
+            'opts': [],
+        }
 
         if info['ext'] == 'm4a':
-            options.extend(['-vn', '-acodec', 'copy'])
-        else:
-            options.extend(['-c', 'copy'])
+            ffmpeg_pass['codec'] = ['-vn', '-acodec', 'copy']
 
         for (name, value) in metadata.items():
-            options.extend(['-metadata', '%s=%s' % (name, value)])
+            ffmpeg_pass['opts'].extend(['-metadata', '%s=%s' % (name, value)])
 
         chapters = info.get('chapters', [])
         if chapters:
@@ -506,27 +643,67 @@ class FFmpegMetadataPP(FFmpegPostProcessor):
                     if chapter_title:
                         metadata_file_content += 'title=%s\n' % ffmpeg_escape(chapter_title)
                 f.write(metadata_file_content)
-                in_filenames.append(metadata_filename)
-                options.extend(['-map_metadata', '1'])
+            ffmpeg_pass.update({
+                'inputs': [metadata_filename],
+                'input_opts': lambda first_input: ['-map_metadata', '%d' % first_input],
+                'cleanup': [metadata_filename],
+            })
 
-        self._downloader.to_screen('[ffmpeg] Adding metadata to \'%s\'' % filename)
-        self.run_ffmpeg_multiple_files(in_filenames, temp_filename, options)
-        if chapters:
-            os.remove(metadata_filename)
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-        return [], info
+        return ffmpeg_pass
 
 
 class FFmpegMergerPP(FFmpegPostProcessor):
     def run(self, info):
-        filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-        args = ['-c', 'copy', '-map', '0:v:0', '-map', '1:a:0']
-        self._downloader.to_screen('[ffmpeg] Merging formats into "%s"' % filename)
-        self.run_ffmpeg_multiple_files(info['__files_to_merge'], temp_filename, args)
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-        return info['__files_to_merge'], info
+        if self._can_merge_natively(info):
+            filename = info['filepath']
+            temp_filename = prepend_extension(filename, 'temp')
+            try:
+                with FragmentedMP4Merger(info['__files_to_merge']) as merger:
+                    self._downloader.to_screen('[merger] Merging formats into "%s"' % filename)
+                    merger.write(temp_filename)
+            except MP4MergeError as e:
+                if os.path.exists(encodeFilename(temp_filename)):
+                    os.remove(encodeFilename(temp_filename))
+                if not self.available:
+                    # Left unmerged like when neither can merge them
+                    self._downloader.report_warning(
+                        'Unable to merge the formats natively (%s) and ffmpeg or avconv '
+                        'are not installed. The formats won\'t be merged.' % e.msg)
+                    return [], info
+                self._downloader.to_screen('[merger] %s, merging with %s' % (e.msg, self.basename))
+            else:
+                os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+                return info['__files_to_merge'], info
+        return self.run_ffmpeg_passes(info, [self.ffmpeg_pass(info)])
+
+    def can_merge_natively(self, ext, input_exts):
+        """Whether files with extensions input_exts may be merged into a file with extension ext without ffmpeg"""
+        if not self._downloader or not self._downloader.params.get('native_merge', True):
+            return False
+        return all(e in FRAGMENTED_MP4_EXTS for e in [ext] + list(input_exts))
+
+    def _can_merge_natively(self, info):
+        return self.can_merge_natively(
+            info['ext'], [determine_ext(f, None) for f in info['__files_to_merge']])
+
+    def ffmpeg_pass(self, info):
+        if self._can_merge_natively(info):
+            if not self.available:
+                # Merged natively or left unmerged by run()
+                return None
+            try:
+                FragmentedMP4Merger(info['__files_to_merge']).close()
+            except MP4MergeError:
+                pass
+            else:
+                # Merged natively by run()
+                return None
+        return {
+            'msg': 'Merging formats into "%s"' % info['filepath'],
+            'main_inputs': info['__files_to_merge'],
+            'main_maps': ['0:v:0', '1:a:0'],
+            'files_to_delete': info['__files_to_merge'],
+        }
 
     def can_merge(self):
         # TODO: figure out merge-capable ffmpeg version
@@ -548,54 +725,51 @@ class FFmpegMergerPP(FFmpegPostProcessor):
 
 class FFmpegFixupStretchedPP(FFmpegPostProcessor):
     def run(self, info):
+        return self.run_ffmpeg_passes(info, [self.ffmpeg_pass(info)])
+
+    def ffmpeg_pass(self, info):
         stretched_ratio = info.get('stretched_ratio')
         if stretched_ratio is None or stretched_ratio == 1:
-            return [], info
+            return {}
 
-        filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-
-        options = ['-c', 'copy', '-aspect', '%f' % stretched_ratio]
-        self._downloader.to_screen('[ffmpeg] Fixing aspect ratio in "%s"' % filename)
-        self.run_ffmpeg(filename, temp_filename, options)
-
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-
-        return [], info
+        return {
+            'msg': 'Fixing aspect ratio in "%s"' % info['filepath'],
+            'opts': ['-aspect', '%f' % stretched_ratio],
+        }
 
 
 class FFmpegFixupM4aPP(FFmpegPostProcessor):
     def run(self, info):
-        if info.get('container') != 'm4a_dash':
-            return [], info
-
-        filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-
-        options = ['-c', 'copy', '-f', 'mp4']
-        self._downloader.to_screen('[ffmpeg] Correcting container in "%s"' % filename)
-        self.run_ffmpeg(filename, temp_filename, options)
+        return self.run_ffmpeg_passes(info, [self.ffmpeg_pass(info)])
 
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+    def ffmpeg_pass(self, info):
+        if info.get('container') != 'm4a_dash':
+            return {}
 
-        return [], info
+        return {
+            'msg': 'Correcting container in "%s"' % info['filepath'],
+            'format': 'mp4',
+        }
 
 
 class FFmpegFixupM3u8PP(FFmpegPostProcessor):
     def run(self, info):
-        filename = info['filepath']
-        if self.get_audio_codec(filename) == 'aac':
-            temp_filename = prepend_extension(filename, 'temp')
+        return self.run_ffmpeg_passes(info, [self.ffmpeg_pass(info)])
 
-            options = ['-c', 'copy', '-f', 'mp4', '-bsf:a', 'aac_adtstoasc']
-            self._downloader.to_screen('[ffmpeg] Fixing malformed AAC bitstream in "%s"' % filename)
-            self.run_ffmpeg(filename, temp_filename, options)
+    def ffmpeg_pass(self, info):
+        filename = info['filepath']
+        if not os.path.exists(encodeFilename(filename)):
+            # The file is written by a pass fused with this one, it can't
+            # be probed yet
+            return None
+        if self.get_audio_codec(filename) != 'aac':
+            return {}
 
-            os.remove(encodeFilename(filename))
-            os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-        return [], info
+        return {
+            'msg': 'Fixing malformed AAC bitstream in "%s"' % filename,
+            'format': 'mp4',
+            'opts': ['-bsf:a', 'aac_adtstoasc'],
+        }
 
 
 class FFmpegSubtitlesConvertorPP(FFmpegPostProcessor):
@@ -659,3 +833,75 @@ class FFmpegSubtitlesConvertorPP(FFmpegPostProcessor):
                 }
 
         return sub_filenames, info
+
+
+class FFmpegFusedPP(FFmpegPostProcessor):
+    """
+    Run a chain of ffmpeg based postprocessors with as few ffmpeg commands
+    as possible: the passes (see ffmpeg_pass()) of consecutive
+    postprocessors are run by a single command when they are compatible
+    instead of each of them rewriting the whole file.
+    """
+
+    def __init__(self, downloader=None, pps=[]):
+        super(FFmpegFusedPP, self).__init__(downloader)
+        self._pps = pps
+
+    @classmethod
+    def fuse(cls, downloader, pps):
+        """Return the chain pps with the consecutive ffmpeg postprocessors fused"""
+        chain = []
+        group = []
+        for pp in list(pps) + [None]:
+            if isinstance(pp, FFmpegPostProcessor):
+                group.append(pp)
+                continue
+            if len(group) > 1:
+                chain.append(cls(downloader, group))
+            else:
+                chain.extend(group)
+            group = []
+            if pp is not None:
+                chain.append(pp)
+        return chain
+
+    def run(self, info):
+        files_to_delete = []
+        passes = []
+        for pp in self._pps:
+            ffmpeg_pass = pp.ffmpeg_pass(info)
+            if ffmpeg_pass == {}:
+                continue
+            if ffmpeg_pass is not None and all(self.can_fuse_passes(p, ffmpeg_pass) for p in passes):
+                passes.append(ffmpeg_pass)
+                continue
+            files, info = self._run_fused_passes(info, passes)
+            files_to_delete.extend(files)
+            passes = []
+            if ffmpeg_pass is None:
+                files, info = pp.run(info)
+                files_to_delete.extend(files)
+            else:
+                passes.append(ffmpeg_pass)
+        files, info = self._run_fused_passes(info, passes)
+        files_to_delete.extend(files)
+        return files_to_delete, info
+
+    def _run_fused_passes(self, info, passes):
+        passes = [p for p in passes if p]
+        try:
+            return self.run_ffmpeg_passes(info, passes)
+        except PostProcessingError:
+            if len(passes) < 2:
+                raise
+        # Like unfused postprocessors, a failing pass does not prevent the
+        # others from being applied
+        files_to_delete = []
+        for p in passes:
+            try:
+                files, info = self.run_ffmpeg_passes(info, [p])
+            except PostProcessingError as e:
+                self._downloader.report_error(e.msg)
+                continue
+            files_to_delete.extend(files)
+        return files_to_delete, info
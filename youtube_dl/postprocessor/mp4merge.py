@@ -0,0 +1,328 @@
+from __future__ import unicode_literals
+
+import heapq
+import os
+
+from ..downloader.ism import (
+    box,
+    u32,
+    u64,
+)
+from ..utils import (
+    encodeFilename,
+    PostProcessingError,
+)
+
+
+# Extensions of the files that may be fragmented MP4
+FRAGMENTED_MP4_EXTS = ('mp4', 'm4a', 'm4v')
+
+# Top-level boxes indexing the original files, meaningless once merged
+DROPPED_BOXES = (b'sidx', b'ssix', b'styp', b'mfra')
+
+TFHD_BASE_DATA_OFFSET_PRESENT = 0x1
+
+
+class MP4MergeError(PostProcessingError):
+    pass
+
+
+def iter_boxes(data, start=0, end=None):
+    """Yield the type, payload start and end offset of the boxes of data[start:end]"""
+    if end is None:
+        end = len(data)
+    while start < end:
+        if end - start < 8:
+            raise MP4MergeError('Truncated box')
+        size = u32.unpack(bytes(data[start:start + 4]))[0]
+        box_type = bytes(data[start + 4:start + 8])
+        header_size = 8
+        if size == 1:
+            size = u64.unpack(bytes(data[start + 8:start + 16]))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - start
+        if size < header_size or start + size > end:
+            raise MP4MergeError('Invalid %s box' % box_type.decode('latin-1'))
+        yield box_type, start + header_size, start + size
+        start += size
+
+
+def find_box(data, path, start=0, end=None):
+    """Return the payload start and end offset of the first box at path, None if there is none"""
+    for box_type, payload_start, box_end in iter_boxes(data, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload_start, box_end
+            return find_box(data, path[1:], payload_start, box_end)
+    return None
+
+
+def _read_uint(data, offset, size):
+    return (u64 if size == 8 else u32).unpack(bytes(data[offset:offset + size]))[0]
+
+
+def _write_uint(data, offset, size, value):
+    data[offset:offset + size] = (u64 if size == 8 else u32).pack(value)
+
+
+class FragmentedMP4(object):
+    """
+    A fragmented MP4 file with a single track: its moov box is kept in
+    memory, its fragments are read one at a time.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._stream = open(encodeFilename(filename), 'rb')
+        try:
+            self._read_header()
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self._stream.close()
+
+    def _read_box_header(self, position):
+        """Return the type, size and header size of the top-level box at position, None at the end of the file"""
+        self._stream.seek(position)
+        header = self._stream.read(16)
+        if not header:
+            return None
+        if len(header) < 8:
+            raise MP4MergeError('Truncated box in %s' % self.filename)
+        size = u32.unpack(header[:4])[0]
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                raise MP4MergeError('Truncated box in %s' % self.filename)
+            size = u64.unpack(header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = self._file_size - position
+        if size < header_size:
+            raise MP4MergeError('Invalid box in %s' % self.filename)
+        return header[4:8], size, header_size
+
+    def _read_box(self, position, size):
+        self._stream.seek(position)
+        data = self._stream.read(size)
+        if len(data) != size:
+            raise MP4MergeError('Truncated box in %s' % self.filename)
+        return data
+
+    def _read_header(self):
+        self._file_size = os.fstat(self._stream.fileno()).st_size
+        self.ftyp = self.moov = None
+        position = 0
+        while True:
+            header = self._read_box_header(position)
+            if header is None:
+                raise MP4MergeError('%s is not a fragmented MP4 file' % self.filename)
+            box_type, size, header_size = header
+            if box_type == b'moof':
+                break
+            if box_type == b'mdat':
+                raise MP4MergeError('%s is not a fragmented MP4 file' % self.filename)
+            if box_type == b'ftyp':
+                self.ftyp = self._read_box(position, size)
+            elif box_type == b'moov':
+                self.moov = self._read_box(position, size)[header_size:]
+            position += size
+        self._first_fragment = position
+
+        if self.moov is None:
+            raise MP4MergeError('%s has no movie box' % self.filename)
+        moov = self.moov
+        traks = [b for b in iter_boxes(moov) if b[0] == b'trak']
+        if len(traks) != 1 or not find_box(moov, [b'mvex']):
+            raise MP4MergeError('%s does not have a single fragmented track' % self.filename)
+        _, self.trak_start, self.trak_end = traks[0]
+        hdlr = find_box(moov, [b'mdia', b'hdlr'], self.trak_start, self.trak_end)
+        mdhd = find_box(moov, [b'mdia', b'mdhd'], self.trak_start, self.trak_end)
+        mvhd = find_box(moov, [b'mvhd'])
+        if not hdlr or not mdhd or not mvhd:
+            raise MP4MergeError('%s has an incomplete movie box' % self.filename)
+        self.handler_type = moov[hdlr[0] + 8:hdlr[0] + 12]
+        self.timescale = self._header_field(moov, mdhd[0], 'timescale')
+        self.movie_timescale = self._header_field(moov, mvhd[0], 'timescale')
+        self.movie_duration = self._header_field(moov, mvhd[0], 'duration')
+
+    @staticmethod
+    def _header_field(data, payload_start, field):
+        """Return the timescale or the duration of the mvhd or mdhd box at payload_start"""
+        time_size = 8 if data[payload_start:payload_start + 1] == b'\x01' else 4
+        # after the version, flags, creation and modification times
+        offset = payload_start + 4 + 2 * time_size
+        if field == 'timescale':
+            return _read_uint(data, offset, 4)
+        assert field == 'duration'
+        return _read_uint(data, offset + 4, time_size)
+
+    def fragments(self):
+        """
+        Yield the fragments as (decode time in seconds, moof box, offset of
+        the mfhd sequence number, offset of the tfhd track id, [(position,
+        size)] of the boxes holding the fragment data)
+        """
+        position = self._first_fragment
+        moof = None
+        moof_header_size = 0
+        data_boxes = []
+        while True:
+            header = self._read_box_header(position)
+            if header is None or header[0] == b'moof':
+                if moof is not None:
+                    yield self._parse_moof(moof, moof_header_size, data_boxes)
+                if header is None:
+                    return
+                moof = bytearray(self._read_box(position, header[1]))
+                moof_header_size = header[2]
+                data_boxes = []
+            elif header[0] in DROPPED_BOXES:
+                if not data_boxes:
+                    # The data offsets would be wrong without it
+                    raise MP4MergeError('Unexpected %s box in %s' % (header[0].decode('latin-1'), self.filename))
+            else:
+                data_boxes.append((position, header[1]))
+            position += header[1]
+
+    def _parse_moof(self, moof, header_size, data_boxes):
+        mfhd = find_box(moof, [b'mfhd'], header_size)
+        trafs = [b for b in iter_boxes(moof, header_size) if b[0] == b'traf']
+        if not mfhd or len(trafs) != 1:
+            raise MP4MergeError('Unsupported movie fragment in %s' % self.filename)
+        _, traf_start, traf_end = trafs[0]
+        tfhd = find_box(moof, [b'tfhd'], traf_start, traf_end)
+        tfdt = find_box(moof, [b'tfdt'], traf_start, traf_end)
+        if not tfhd or not tfdt:
+            raise MP4MergeError('Unsupported track fragment in %s' % self.filename)
+        if _read_uint(moof, tfhd[0], 4) & TFHD_BASE_DATA_OFFSET_PRESENT:
+            raise MP4MergeError('%s uses absolute data offsets' % self.filename)
+        decode_time = _read_uint(moof, tfdt[0] + 4, 8 if moof[tfdt[0]] == 1 else 4)
+        return float(decode_time) / self.timescale, moof, mfhd[0] + 4, tfhd[0] + 4, data_boxes
+
+    def copy_box(self, position, size, out, chunk_size=1024 * 1024):
+        self._stream.seek(position)
+        while size > 0:
+            data = self._stream.read(min(size, chunk_size))
+            if not data:
+                raise MP4MergeError('Truncated box in %s' % self.filename)
+            out.write(data)
+            size -= len(data)
+
+
+class FragmentedMP4Merger(object):
+    """
+    Stream copy the video track of a fragmented MP4 file and the audio track
+    of another one into a single fragmented MP4 file without ffmpeg: the
+    movie boxes are combined and the movie fragments are interleaved by
+    decode time, the media data is copied as is.
+
+    MP4MergeError is raised if the files can't be merged this way (files
+    that aren't fragmented, several tracks per file...).
+    """
+
+    def __init__(self, filenames):
+        if len(filenames) != 2:
+            raise MP4MergeError('Only a video and an audio file can be merged')
+        self._inputs = []
+        try:
+            for filename in filenames:
+                self._inputs.append(FragmentedMP4(filename))
+        except BaseException:
+            self.close()
+            raise
+        if [i.handler_type for i in self._inputs] != [b'vide', b'soun']:
+            self.close()
+            raise MP4MergeError('Only a video and an audio file can be merged')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for i in self._inputs:
+            i.close()
+
+    def _trak(self, track_input, track_id, movie_timescale):
+        moov = track_input.moov
+        trak = bytearray(moov[track_input.trak_start:track_input.trak_end])
+        if find_box(trak, [b'tref']):
+            raise MP4MergeError('%s has track references' % track_input.filename)
+        tkhd = find_box(trak, [b'tkhd'])
+        if not tkhd:
+            raise MP4MergeError('%s has no track header' % track_input.filename)
+        time_size = 8 if trak[tkhd[0]] == 1 else 4
+        _write_uint(trak, tkhd[0] + 4 + 2 * time_size, 4, track_id)
+        if track_input.movie_timescale != movie_timescale:
+            # Durations of the track header and the edit list are in the
+            # movie timescale
+            def rescale(offset, size):
+                _write_uint(trak, offset, size, _read_uint(trak, offset, size) * movie_timescale // track_input.movie_timescale)
+
+            rescale(tkhd[0] + 4 + 2 * time_size + 8, time_size)
+            elst = find_box(trak, [b'edts', b'elst'])
+            if elst:
+                entry_size = 20 if trak[elst[0]] == 1 else 12
+                for n in range(_read_uint(trak, elst[0] + 4, 4)):
+                    rescale(elst[0] + 8 + n * entry_size, 8 if entry_size == 20 else 4)
+        return box(b'trak', bytes(trak))
+
+    def _moov(self):
+        video = self._inputs[0]
+        movie_timescale = video.movie_timescale
+        moov = video.moov
+        payload = b''
+        trex_boxes = b''
+        for track_id, track_input in enumerate(self._inputs, 1):
+            payload += self._trak(track_input, track_id, movie_timescale)
+            trex = find_box(track_input.moov, [b'mvex', b'trex'])
+            if not trex:
+                raise MP4MergeError('%s has no track extends box' % track_input.filename)
+            trex = bytearray(track_input.moov[trex[0]:trex[1]])
+            _write_uint(trex, 4, 4, track_id)
+            trex_boxes += box(b'trex', bytes(trex))
+
+        mvhd_start, mvhd_end = find_box(moov, [b'mvhd'])
+        mvhd = bytearray(moov[mvhd_start:mvhd_end])
+        time_size = 8 if mvhd[0] == 1 else 4
+        # The movie lasts as long as its longest track
+        duration = max(
+            i.movie_duration * movie_timescale // i.movie_timescale for i in self._inputs)
+        _write_uint(mvhd, 4 + 2 * time_size + 4, time_size, duration)
+        _write_uint(mvhd, len(mvhd) - 4, 4, len(self._inputs) + 1)  # next track id
+        moov_payload = box(b'mvhd', bytes(mvhd)) + payload + box(b'mvex', trex_boxes)
+        # Keep the other boxes of the video file (user data, protection...)
+        for box_type, start, end in iter_boxes(moov):
+            if box_type not in (b'mvhd', b'trak', b'mvex'):
+                moov_payload += box(box_type, moov[start:end])
+        return box(b'moov', moov_payload)
+
+    @staticmethod
+    def _track_fragments(track_id, track_input):
+        # Fragments sort by decode time, then track, then order in the file
+        for n, fragment in enumerate(track_input.fragments()):
+            yield (fragment[0], track_id, n) + fragment[1:]
+
+    def write(self, filename):
+        """Write the merged file to filename"""
+        with open(encodeFilename(filename), 'wb') as out:
+            ftyp = self._inputs[0].ftyp or self._inputs[1].ftyp
+            if ftyp:
+                out.write(ftyp)
+            out.write(self._moov())
+            fragments = heapq.merge(*[
+                self._track_fragments(track_id, track_input)
+                for track_id, track_input in enumerate(self._inputs, 1)])
+            for sequence_number, (_, track_id, _, moof, mfhd_offset, tfhd_offset, data_boxes) in enumerate(fragments, 1):
+                # moof keeps its size, the data offsets relative to it stay valid
+                _write_uint(moof, mfhd_offset, 4, sequence_number)
+                _write_uint(moof, tfhd_offset, 4, track_id)
+                out.write(moof)
+                track_input = self._inputs[track_id - 1]
+                for position, size in data_boxes:
+                    track_input.copy_box(position, size, out)
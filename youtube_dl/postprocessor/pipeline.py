@@ -0,0 +1,87 @@
+from __future__ import unicode_literals
+
+import collections
+import threading
+
+
+class PostProcessingPipeline(object):
+    """
+    Post-processing queue of YoutubeDL in pipelined mode: the finished
+    downloads are post-processed by worker threads while the next ones are
+    downloaded.
+
+    At most `workers` jobs run at once and as many wait for a worker,
+    submit() blocks beyond that so that the downloads do not get too far
+    ahead of the post-processing.
+
+    close() stops the idle workers, the busy ones once they are done.
+    """
+
+    def __init__(self, workers):
+        self._workers = workers
+        self._threads = []
+        self._jobs = collections.deque()
+        self._pending = 0
+        self._errors = []
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def submit(self, func, *args):
+        """Queue func(*args), then raise the error of a finished job if any"""
+        with self._cond:
+            while len(self._jobs) >= self._workers:
+                # Wait with a timeout so that KeyboardInterrupt is
+                # delivered on python 2 as well
+                self._cond.wait(1)
+            self._jobs.append((func, args))
+            self._pending += 1
+            if len(self._threads) < min(self._pending, self._workers):
+                thread = threading.Thread(target=self._work)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+            self._cond.notify_all()
+            self._raise_error()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._jobs:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                func, args = self._jobs.popleft()
+                self._cond.notify_all()
+            try:
+                func(*args)
+            except Exception as err:
+                with self._cond:
+                    self._errors.append(err)
+            finally:
+                with self._cond:
+                    self._pending -= 1
+                    self._cond.notify_all()
+
+    def wait(self):
+        """Wait for the queued jobs, then raise the error of the first failed one if any"""
+        with self._cond:
+            while self._pending:
+                self._cond.wait(1)
+            self._raise_error()
+
+    def close(self):
+        """Stop the workers once there is no job left"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def raise_error(self):
+        """Raise the error of the first failed job if any"""
+        with self._cond:
+            self._raise_error()
+
+    def _raise_error(self):
+        if self._errors:
+            err = self._errors[0]
+            del self._errors[:]
+            raise err
@@ -0,0 +1,213 @@
+from __future__ import unicode_literals
+
+import contextlib
+import io
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import signal
+import socket
+import stat
+import sys
+import threading
+
+from .utils import (
+    clean_batch_url,
+    DownloadError,
+    encodeFilename,
+    error_to_compat_str,
+    expand_path,
+    MaxDownloadsReached,
+    write_string,
+)
+from .YoutubeDL import YoutubeDL
+
+
+class ServiceYoutubeDL(YoutubeDL):
+    """
+    YoutubeDL kept alive by a worker process of the download service,
+    downloading one URL at a time and recording what happened to it
+    """
+
+    def __init__(self, params):
+        super(ServiceYoutubeDL, self).__init__(params)
+        self._job_videos = []
+        self._job_errors = []
+
+    def warm_up(self):
+        """Instantiate the extractors before the first URL comes in"""
+        self._candidate_ies('')
+        for ie in self._ies:
+            if isinstance(ie, type) and ie.ie_key() not in self._ies_instances:
+                instance = ie()
+                instance.set_downloader(self)
+                self._ies_instances[ie.ie_key()] = instance
+
+    def trouble(self, message=None, tb=None):
+        if message is not None:
+            self._job_errors.append(message)
+        return super(ServiceYoutubeDL, self).trouble(message, tb)
+
+    def process_info(self, info_dict):
+        super(ServiceYoutubeDL, self).process_info(info_dict)
+        self._job_videos.append({
+            'id': info_dict.get('id'),
+            'title': info_dict.get('title'),
+            'filename': info_dict.get('_filename'),
+        })
+
+    def run_job(self, url):
+        """Download url, return its result as a JSON serializable dict"""
+        self._download_retcode = 0
+        self._job_videos = []
+        self._job_errors = []
+        status = None
+        try:
+            self.download([url])
+        except MaxDownloadsReached:
+            status = 'max_downloads'
+        except DownloadError:
+            self._download_retcode = 1
+        except Exception as err:
+            self._job_errors.append(error_to_compat_str(err))
+            self._download_retcode = 1
+        if status is None:
+            status = 'error' if self._download_retcode else 'finished'
+        return {
+            'url': url,
+            'status': status,
+            'retcode': self._download_retcode,
+            'videos': self._job_videos,
+            'errors': self._job_errors,
+        }
+
+
+_worker_ydl = None
+
+
+def _init_worker(params):
+    global _worker_ydl
+    # Interruptions are handled by the service process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_ydl = ServiceYoutubeDL(params)
+    _worker_ydl.warm_up()
+    # Save the cookies and close the connections when the pool is closed
+    multiprocessing.util.Finalize(_worker_ydl, _worker_ydl.__exit__, args=(None, None, None), exitpriority=10)
+
+
+def _run_job(url):
+    return _worker_ydl.run_job(url)
+
+
+def _write_stdout(result):
+    write_string(json.dumps(result) + '\n', out=sys.stdout)
+    sys.stdout.flush()
+
+
+class DownloadService(object):
+    """
+    Download service: the URLs read from a source are dispatched to a pool
+    of worker processes, each keeping a YoutubeDL instance with its opener,
+    extractors and caches across URLs, and the result of each URL is written
+    as a line of JSON once it is processed.
+
+    The source is either '-' for stdin, the path of a file or FIFO (a FIFO
+    is reopened whenever its writer closes it) or 'unix:PATH' for a unix
+    socket; the clients of the socket get the results of their URLs on
+    their connection, the results of the other sources go to stdout.
+    """
+
+    def __init__(self, params, workers=1):
+        try:
+            # Forked workers do not have to import youtube_dl again
+            context = multiprocessing.get_context('fork')
+        except (AttributeError, ValueError):
+            # python 2 forks anyway, the params are pickled elsewhere
+            context = multiprocessing
+        self._pool = context.Pool(workers, _init_worker, (params, ))
+        self._retcode = 0
+        self._lock = threading.Lock()
+
+    def submit(self, url, write_result=_write_stdout):
+        """Queue the download of url, write_result is called with its result"""
+        def callback(result):
+            with self._lock:
+                self._retcode = max(self._retcode, result['retcode'])
+                write_result(result)
+        return self._pool.apply_async(_run_job, (url, ), callback=callback)
+
+    def serve_stream(self, stream, write_result=_write_stdout):
+        """Queue the URLs of the lines of stream, until its end"""
+        jobs = []
+        while True:
+            line = stream.readline()
+            if not line:
+                return jobs
+            url = clean_batch_url(line)
+            if url:
+                jobs.append(self.submit(url, write_result))
+
+    def _serve_path(self, path):
+        while True:
+            with io.open(encodeFilename(path), 'r', encoding='utf-8', errors='ignore') as stream:
+                self.serve_stream(stream)
+            if not stat.S_ISFIFO(os.stat(encodeFilename(path)).st_mode):
+                return
+
+    def _serve_connection(self, conn):
+        def write_result(result):
+            try:
+                conn.sendall((json.dumps(result) + '\n').encode('utf-8'))
+            except socket.error:
+                # The client went away, its URLs are downloaded all the same
+                pass
+
+        try:
+            with contextlib.closing(conn.makefile('rb')) as stream:
+                jobs = self.serve_stream(stream, write_result)
+            for job in jobs:
+                job.wait()
+        finally:
+            conn.close()
+
+    def _serve_socket(self, path):
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.remove(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(path)
+            server.listen(5)
+            while True:
+                conn, _ = server.accept()
+                thread = threading.Thread(target=self._serve_connection, args=(conn, ))
+                thread.daemon = True
+                thread.start()
+        finally:
+            server.close()
+            os.remove(path)
+
+    def serve(self, source, urls=()):
+        """
+        Download urls then the URLs of source, return the highest exit code
+        of the downloads once the source is exhausted
+        """
+        try:
+            for url in urls:
+                self.submit(url)
+            if source == '-':
+                self.serve_stream(sys.stdin)
+            elif source.startswith('unix:'):
+                self._serve_socket(expand_path(source[len('unix:'):]))
+            else:
+                self._serve_path(expand_path(source))
+            self.close()
+        except BaseException:
+            self._pool.terminate()
+            raise
+        return self._retcode
+
+    def close(self):
+        """Wait for the queued downloads and stop the workers"""
+        self._pool.close()
+        self._pool.join()
@@ -31,6 +31,7 @@ import ssl
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import traceback
 import unicodedata
@@ -1812,18 +1813,18 @@ def preferredencoding():
     return pref
 
 
-def write_json_file(obj, fn):
-    """ Encode obj as JSON and write it to fn, atomically if possible """
+def write_file_atomically(fn, write, mode='wb', encoding=None):
+    """ Call write with a temporary file then rename it to fn, if possible """
 
     fn = encodeFilename(fn)
     if sys.version_info < (3, 0) and sys.platform != 'win32':
-        encoding = get_filesystem_encoding()
+        fs_encoding = get_filesystem_encoding()
         # os.path.basename returns a bytes object, but NamedTemporaryFile
         # will fail if the filename contains non ascii characters unless we
         # use a unicode object#
-        path_basename = lambda f: os.path.basename(fn).decode(encoding)
+        path_basename = lambda f: os.path.basename(fn).decode(fs_encoding)
         # the same for os.path.dirname
-        path_dirname = lambda f: os.path.dirname(fn).decode(encoding)
+        path_dirname = lambda f: os.path.dirname(fn).decode(fs_encoding)
     else:
         path_basename = os.path.basename
         path_dirname = os.path.dirname
@@ -1833,23 +1834,16 @@ def write_json_file(obj, fn):
         'prefix': path_basename(fn) + '.',
         'dir': path_dirname(fn),
         'delete': False,
+        'mode': mode,
     }
-
-    # In Python 2.x, json.dump expects a bytestream.
-    # In Python 3.x, it writes to a character stream
-    if sys.version_info < (3, 0):
-        args['mode'] = 'wb'
-    else:
-        args.update({
-            'mode': 'w',
-            'encoding': 'utf-8',
-        })
+    if encoding is not None:
+        args['encoding'] = encoding
 
     tf = tempfile.NamedTemporaryFile(**compat_kwargs(args))
 
     try:
         with tf:
-            json.dump(obj, tf)
+            write(tf)
         if sys.platform == 'win32':
             # Need to remove existing file on Windows, else os.rename raises
             # WindowsError or FileExistsError.
@@ -1872,6 +1866,17 @@ def write_json_file(obj, fn):
         raise
 
 
+def write_json_file(obj, fn):
+    """ Encode obj as JSON and write it to fn, atomically if possible """
+
+    # In Python 2.x, json.dump expects a bytestream.
+    # In Python 3.x, it writes to a character stream
+    if sys.version_info < (3, 0):
+        write_file_atomically(fn, lambda f: json.dump(obj, f))
+    else:
+        write_file_atomically(fn, lambda f: json.dump(obj, f), mode='w', encoding='utf-8')
+
+
 if sys.version_info >= (2, 7):
     def find_xpath_attr(node, xpath, key, val=None):
         """ Find the xpath xpath[@key=val] """
@@ -2470,6 +2475,15 @@ class PostProcessingError(YoutubeDLError):
         self.msg = msg
 
 
+class DownloadCancelled(YoutubeDLError):
+    """Download Cancelled exception.
+
+    This exception is raised by FileDownloader objects whose download was
+    cancelled, e.g. because another format of the same video failed.
+    """
+    pass
+
+
 class MaxDownloadsReached(YoutubeDLError):
     """ --max-downloads limit has been reached. """
     pass
@@ -2596,7 +2610,169 @@ def handle_youtubedl_headers(headers):
     return filtered_headers
 
 
-class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
+class HTTPConnectionPool(object):
+    """
+    A pool of idle keep-alive HTTP(S) connections.
+
+    Connections are keyed by scheme, host, port and proxy. At most
+    max_per_host idle connections are kept for every key and connections
+    that have been idle for longer than idle_timeout seconds are closed
+    instead of being reused. stats counts opened, reused and expired
+    connections.
+    """
+
+    def __init__(self, max_per_host=6, idle_timeout=30):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.stats = {
+            'opened': 0,
+            'reused': 0,
+            'expired': 0,
+        }
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def acquire(self, key):
+        """Return an idle connection for key or None"""
+        now = time.time()
+        with self._lock:
+            conns = self._idle.get(key)
+            while conns:
+                conn, released_at = conns.pop()
+                if conn.sock is not None and now - released_at <= self.idle_timeout:
+                    self.stats['reused'] += 1
+                    return conn
+                self.stats['expired'] += 1
+                conn.close()
+        return None
+
+    def release(self, key, conn):
+        """Put a connection whose last response has been read completely back"""
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < self.max_per_host:
+                conns.append((conn, time.time()))
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+
+class _PooledHTTPResponse(compat_http_client.HTTPResponse):
+    # Called with whether the connection may be reused once the response
+    # is done with it
+    _ytdl_release = None
+    _ytdl_chunked_complete = False
+
+    def _read_and_discard_trailer(self):
+        compat_http_client.HTTPResponse._read_and_discard_trailer(self)
+        self._ytdl_chunked_complete = True
+
+    def _close_conn(self):
+        # The connection can only be reused if the whole body has been read
+        complete = self._ytdl_chunked_complete or self.length == 0
+        compat_http_client.HTTPResponse._close_conn(self)
+        release, self._ytdl_release = self._ytdl_release, None
+        if release:
+            release(complete)
+
+
+class _KeepAliveHandlerMixin(object):
+    """
+    Replacement of urllib's AbstractHTTPHandler.do_open() that takes
+    connections from a HTTPConnectionPool and puts them back once the
+    response has been read instead of closing them after every request.
+    Only used on python 3, python 2 always opens a new connection.
+    """
+
+    def do_open(self, http_class, req, pool_key=None, **http_conn_args):
+        pool = self._connection_pool
+        if pool is None or pool_key is None or sys.version_info < (3, 0):
+            return compat_urllib_request.AbstractHTTPHandler.do_open(
+                self, http_class, req, **http_conn_args)
+
+        host = req.host
+        if not host:
+            raise compat_urllib_error.URLError('no host given')
+
+        headers = dict(req.unredirected_hdrs)
+        headers.update(dict(
+            (k, v) for k, v in req.headers.items() if k not in headers))
+        headers = dict((name.title(), val) for name, val in headers.items())
+
+        tunnel_headers = {}
+        if req._tunnel_host:
+            proxy_auth_hdr = 'Proxy-Authorization'
+            if proxy_auth_hdr in headers:
+                tunnel_headers[proxy_auth_hdr] = headers.pop(proxy_auth_hdr)
+
+        request_kwargs = {}
+        if sys.version_info >= (3, 6):
+            request_kwargs['encode_chunked'] = req.has_header('Transfer-encoding')
+        # A pooled connection may have been closed by the server in the
+        # meantime, in that case the request is repeated on a new one
+        # provided its body can be sent again
+        can_resend = req.data is None or isinstance(req.data, bytes)
+
+        while True:
+            h = pool.acquire(pool_key)
+            reused = h is not None
+            if reused:
+                h.timeout = req.timeout
+                if h.sock is not None:
+                    h.sock.settimeout(req.timeout)
+            else:
+                h = http_class(host, timeout=req.timeout, **http_conn_args)
+                h.set_debuglevel(self._debuglevel)
+                if req._tunnel_host:
+                    h.set_tunnel(req._tunnel_host, headers=tunnel_headers)
+                pool.count('opened')
+            h.response_class = _PooledHTTPResponse
+            try:
+                try:
+                    h.request(
+                        req.get_method(), req.selector, req.data, headers,
+                        **request_kwargs)
+                except socket.error as err:
+                    if reused and can_resend:
+                        h.close()
+                        continue
+                    raise compat_urllib_error.URLError(err)
+                try:
+                    r = h.getresponse()
+                except (socket.error, compat_http_client.BadStatusLine):
+                    if reused and can_resend:
+                        h.close()
+                        continue
+                    raise
+            except BaseException:
+                h.close()
+                raise
+            break
+
+        if not r.will_close:
+            def release(reusable, h=h):
+                if reusable and h.sock is not None:
+                    pool.release(pool_key, h)
+                else:
+                    h.close()
+            r._ytdl_release = release
+
+        r.url = req.get_full_url()
+        r.msg = r.reason
+        return r
+
+
+class YoutubeDLHandler(_KeepAliveHandlerMixin, compat_urllib_request.HTTPHandler):
     """Handler for HTTP requests and responses.
 
     This class, when installed with an OpenerDirector, automatically adds
@@ -2612,9 +2788,13 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
 
     Andrew Rowls, the author of that code, agreed to release it to the
     public domain.
+
+    If a HTTPConnectionPool is passed as connection_pool, connections are
+    kept alive and reused across requests.
     """
 
     def __init__(self, params, *args, **kwargs):
+        self._connection_pool = kwargs.pop('connection_pool', None)
         compat_urllib_request.HTTPHandler.__init__(self, *args, **kwargs)
         self._params = params
 
@@ -2628,7 +2808,7 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
 
         return self.do_open(functools.partial(
             _create_http_connection, self, conn_class, False),
-            req)
+            req, pool_key=('http', req.host, getattr(req, '_tunnel_host', None), socks_proxy))
 
     @staticmethod
     def deflate(data):
@@ -2762,8 +2942,9 @@ def make_socks_conn_class(base_class, socks_proxy):
     return SocksConnection
 
 
-class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
+class YoutubeDLHTTPSHandler(_KeepAliveHandlerMixin, compat_urllib_request.HTTPSHandler):
     def __init__(self, params, https_conn_class=None, *args, **kwargs):
+        self._connection_pool = kwargs.pop('connection_pool', None)
         compat_urllib_request.HTTPSHandler.__init__(self, *args, **kwargs)
         self._https_conn_class = https_conn_class or compat_http_client.HTTPSConnection
         self._params = params
@@ -2784,7 +2965,7 @@ class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
 
         return self.do_open(functools.partial(
             _create_http_connection, self, conn_class, True),
-            req, **kwargs)
+            req, pool_key=('https', req.host, getattr(req, '_tunnel_host', None), socks_proxy), **kwargs)
 
 
 class YoutubeDLCookieJar(compat_cookiejar.MozillaCookieJar):
@@ -3387,12 +3568,12 @@ else:
 
 class locked_file(object):
     def __init__(self, filename, mode, encoding=None):
-        assert mode in ['r', 'a', 'w']
+        assert mode in ['r', 'a', 'w', 'rb', 'ab', 'wb']
         self.f = io.open(filename, mode, encoding=encoding)
         self.mode = mode
 
     def __enter__(self):
-        exclusive = self.mode != 'r'
+        exclusive = self.mode not in ('r', 'rb')
         try:
             _lock_file(self.f, exclusive)
         except IOError:
@@ -3415,6 +3596,67 @@ class locked_file(object):
     def read(self, *args):
         return self.f.read(*args)
 
+    def seek(self, *args):
+        return self.f.seek(*args)
+
+
+class DownloadArchive(object):
+    """
+    In-memory index of a download archive file.
+
+    The file is read once; afterwards only the lines appended to it since
+    (possibly by other youtube-dl processes sharing the file) are read, so
+    a lookup is a set membership test plus a stat() of the file.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._ids = set()
+        # Offset of the first byte of the file not indexed yet
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            size = os.path.getsize(self.filename)
+        except OSError as ose:
+            if ose.errno != errno.ENOENT:
+                raise
+            size = 0
+        if size < self._offset:
+            # The file has been truncated or replaced, start over
+            self._ids = set()
+            self._offset = 0
+        if size == self._offset:
+            return
+        try:
+            with locked_file(self.filename, 'rb') as archive_file:
+                archive_file.seek(self._offset)
+                data = archive_file.read()
+        except IOError as ioe:
+            if ioe.errno != errno.ENOENT:
+                raise
+            return
+        # A trailing incomplete line is matched as well but read again next
+        # time since another process may still be writing it
+        complete_len = data.rfind(b'\n') + 1
+        for line in data.decode('utf-8', 'replace').splitlines():
+            line = line.strip()
+            if line:
+                self._ids.add(line)
+        self._offset += complete_len
+
+    def __contains__(self, vid_id):
+        with self._lock:
+            self._refresh()
+            return vid_id in self._ids
+
+    def add(self, vid_id):
+        with self._lock:
+            with locked_file(self.filename, 'a', encoding='utf-8') as archive_file:
+                archive_file.write(vid_id + '\n')
+            self._ids.add(vid_id)
+
 
 def get_filesystem_encoding():
     encoding = sys.getfilesystemencoding()
@@ -3872,6 +4114,9 @@ class PagedList(object):
         # This is only useful for tests
         return len(self.getslice())
 
+    def getslice(self, start=0, end=None):
+        return list(self.iterslice(start, end))
+
 
 class OnDemandPagedList(PagedList):
     def __init__(self, pagefunc, pagesize, use_cache=True):
@@ -3881,8 +4126,7 @@ class OnDemandPagedList(PagedList):
         if use_cache:
             self._cache = {}
 
-    def getslice(self, start=0, end=None):
-        res = []
+    def iterslice(self, start=0, end=None):
         for pagenum in itertools.count(start // self._pagesize): # start // self.pagesize 값으로 카운트한 리스트
             firstid = pagenum * self._pagesize 
             nextfirstid = pagenum * self._pagesize + self._pagesize
@@ -3909,7 +4153,8 @@ class OnDemandPagedList(PagedList):
 
             if startv != 0 or endv is not None:
                 page_results = page_results[startv:endv]
-            res.extend(page_results)
+            for entry in page_results:
+                yield entry
 
             # A little optimization - if current page is not "full", ie. does
             # not contain page_size videos then we can assume that this page
@@ -3922,7 +4167,6 @@ class OnDemandPagedList(PagedList):
             # break out early as well
             if end == nextfirstid:
                 break
-        return res
 
 
 class InAdvancePagedList(PagedList):
@@ -3931,8 +4175,7 @@ class InAdvancePagedList(PagedList):
         self._pagecount = pagecount
         self._pagesize = pagesize
 
-    def getslice(self, start=0, end=None):
-        res = []
+    def iterslice(self, start=0, end=None):
         start_page = start // self._pagesize
         end_page = (
             self._pagecount if end is None else (end // self._pagesize + 1))
@@ -3947,11 +4190,11 @@ class InAdvancePagedList(PagedList):
                 if len(page) < only_more:
                     only_more -= len(page)
                 else:
-                    page = page[:only_more]
-                    res.extend(page)
+                    for entry in page[:only_more]:
+                        yield entry
                     break
-            res.extend(page)
-        return res
+            for entry in page:
+                yield entry
 
 
 def uppercase_escape(s):
@@ -3990,20 +4233,22 @@ def escape_url(url):
     ).geturl()
 
 
-def read_batch_urls(batch_fd):
-    def fixup(url):
-        if not isinstance(url, compat_str):
-            url = url.decode('utf-8', 'replace')
-        BOM_UTF8 = '\xef\xbb\xbf'
-        if url.startswith(BOM_UTF8):
-            url = url[len(BOM_UTF8):]
-        url = url.strip()
-        if url.startswith(('#', ';', ']')):
-            return False
-        return url
+def clean_batch_url(url):
+    """Return the URL of a line of a batch file, False for comments"""
+    if not isinstance(url, compat_str):
+        url = url.decode('utf-8', 'replace')
+    BOM_UTF8 = '\xef\xbb\xbf'
+    if url.startswith(BOM_UTF8):
+        url = url[len(BOM_UTF8):]
+    url = url.strip()
+    if url.startswith(('#', ';', ']')):
+        return False
+    return url
+
 
+def read_batch_urls(batch_fd):
     with contextlib.closing(batch_fd) as fd:
-        return [url for url in map(fixup, fd) if url]
+        return [url for url in map(clean_batch_url, fd) if url]
 
 
 def urlencode_postdata(*args, **kargs):
@@ -4501,14 +4746,18 @@ def match_str(filter_str, dct):
         _match_one(filter_part, dct) for filter_part in filter_str.split('&'))
 
 
+def _match_func(filter_str, info_dict):
+    if match_str(filter_str, info_dict):
+        return None
+    else:
+        video_title = info_dict.get('title', info_dict.get('id', 'video'))
+        return '%s does not pass filter %s, skipping ..' % (video_title, filter_str)
+
+
 def match_filter_func(filter_str):
-    def _match_func(info_dict):
-        if match_str(filter_str, info_dict):
-            return None
-        else:
-            video_title = info_dict.get('title', info_dict.get('id', 'video'))
-            return '%s does not pass filter %s, skipping ..' % (video_title, filter_str)
-    return _match_func
+    # A partial rather than a closure so that it can be pickled, e.g. for the
+    # worker processes of the download service
+    return functools.partial(_match_func, filter_str)
 
 
 def parse_dfxp_time_expr(time_expr):